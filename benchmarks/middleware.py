@@ -0,0 +1,92 @@
+"""Measure requests per second through the app with the middleware stack on and off.
+
+Runs in process, no server or Redis needed::
+
+    python -m benchmarks.middleware --requests 5000 --workers 16
+
+A small FastAPI app with a JSON route and a streaming route is served over
+httpx's ASGI transport, bare and behind ``RateLimitMiddleware`` and
+``CSRFMiddleware`` as set up in ``src.main``. The limiter is replaced by one
+answering without Redis, so only the middleware overhead is measured.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from src.controllers.misc_services import Rate
+from src.core.enums import RatePeriod
+from src.middleware.csrf import CSRFMiddleware
+from src.middleware.limiters import RateLimitMiddleware
+
+RATE = Rate(number=60, period=RatePeriod.MINUTE)
+
+
+async def instant_limiter(request, response, cost=1) -> dict[str, str]:
+    return RATE.headers | {"RateLimit-Remaining": "59"}
+
+
+def make_app(middleware: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json() -> ORJSONResponse:
+        return ORJSONResponse({"movies": [{"title": "Blade Runner"}] * 10})
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def lines():
+            for i in range(10):
+                yield b'{"title": "Blade Runner"}\n'
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    if middleware:
+        app.add_middleware(RateLimitMiddleware, rate_limiter=instant_limiter)
+        app.add_middleware(CSRFMiddleware)
+    return app
+
+
+async def requests_per_second(
+    app: FastAPI, path: str, requests: int, workers: int
+) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://localhost"
+    ) as client:
+
+        async def worker(count: int) -> None:
+            for _ in range(count):
+                response = await client.get(path)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(requests // workers) for _ in range(workers)))
+        return requests // workers * workers / (time.perf_counter() - started)
+
+
+async def run(requests: int, workers: int) -> None:
+    for path in ("/json", "/stream"):
+        for middleware in (False, True):
+            app = make_app(middleware)
+            await requests_per_second(app, path, workers, workers)  # warm up
+            rps = await requests_per_second(app, path, requests, workers)
+            stack = "on" if middleware else "off"
+            print(f"{path} middleware {stack}: {rps:.0f} requests/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+    # one log line per request would dominate the timings
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(args.requests, args.workers))
+
+
+if __name__ == "__main__":
+    main()
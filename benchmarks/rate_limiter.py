@@ -0,0 +1,117 @@
+"""Compare the multi round trip, Lua and hybrid sliding window rate limiters.
+
+Needs the Redis from ``REDIS_URL`` (read from the environment or ``.env``)::
+
+    python -m benchmarks.rate_limiter --requests 2000 --workers 32
+
+For each limiter it reports the mean and p99 latency of sequential calls,
+and how many requests a concurrent burst got admitted against a quota of
+``--limit`` per minute. The burst admits more than the quota when the check
+and the increment are not atomic: concurrent requests interleave between
+them on the async Redis pool just like requests of different workers do.
+The hybrid limiter also reports how many of its calls reached Redis.
+"""
+
+import argparse
+import asyncio
+import functools
+import statistics
+import time
+import uuid
+from starlette.requests import Request
+from starlette.responses import Response
+from src.controllers.misc_services import (
+    BaseRedisRateLimiter,
+    HybridSlidingWindowRateLimiter,
+    LuaSlidingWindowRateLimiter,
+    Rate,
+    SlidingWindowRateLimiter,
+)
+from src.core.enums import RatePeriod
+from src.core.exceptions import BackendError
+from src.database.connect import async_redis_client
+
+
+def make_request(ip: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/movies",
+            "headers": [(b"x-real-ip", ip.encode())],
+            "query_string": b"",
+            "client": (ip, 5000),
+            "server": ("benchmark", 80),
+            "scheme": "http",
+        }
+    )
+
+
+async def call(limiter: BaseRedisRateLimiter, ip: str) -> bool:
+    try:
+        await limiter(request=make_request(ip), response=Response())
+        return True
+    except BackendError:
+        return False
+
+
+async def latency(limiter: BaseRedisRateLimiter, requests: int) -> dict[str, float]:
+    timings = []
+    for i in range(requests):
+        started = time.perf_counter()
+        # 100 clients coming back, so the hybrid limiter can spend its leases
+        await call(limiter, ip=f"10.0.0.{i % 100}")
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p99_ms": round(timings[int(len(timings) * 0.99) - 1], 3),
+    }
+
+
+async def burst(limiter: BaseRedisRateLimiter, requests: int, workers: int) -> int:
+    semaphore = asyncio.Semaphore(workers)
+
+    async def bounded_call() -> bool:
+        async with semaphore:
+            return await call(limiter, ip="10.1.0.1")
+
+    return sum(await asyncio.gather(*(bounded_call() for _ in range(requests))))
+
+
+async def run(requests: int, workers: int, limit: int, lease_size: int) -> None:
+    limiters = {
+        "sliding window (GET, GET, INCR+EXPIRE)": SlidingWindowRateLimiter,
+        "lua sliding window (EVALSHA)": LuaSlidingWindowRateLimiter,
+        f"hybrid sliding window (lease {lease_size})": functools.partial(
+            HybridSlidingWindowRateLimiter, lease_size=lease_size
+        ),
+    }
+    for name, limiter_class in limiters.items():
+        prefix = f"benchmark:{uuid.uuid4().hex}"
+        timed = limiter_class(
+            rate=Rate(number=10**9, period=RatePeriod.MINUTE), key_prefix=prefix
+        )
+        quota = limiter_class(
+            rate=Rate(number=limit, period=RatePeriod.MINUTE),
+            key_prefix=prefix,
+        )
+        report = await latency(timed, requests)
+        admitted = await burst(quota, max(requests, limit * 2), workers)
+        stats = getattr(timed, "stats", dict)()
+        print(f"{name}: {report} admitted={admitted}/{limit} {stats}")
+    await async_redis_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--lease-size", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.workers, args.limit, args.lease_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,84 @@
+import argparse
 import uvicorn
 from .main import app
+from .core.config import settings
+from .controllers.embedding_services import get_embedding_backend
+from .controllers.index_services import (
+    LocalVectorIndex,
+    build_snapshot,
+    quantization_report,
+)
+from .controllers.cache_services import index_version
+from .controllers.jobs_services import ingestion_job
+from .controllers.movies_services import collection
+from .database.search_indexes import ensure_search_indexes
 
 
 def run():
     uvicorn.run(app, host="0.0.0.0", port=5000, use_colors=True)
+
+
+def ingest():
+    parser = argparse.ArgumentParser(description="Embed movie plots into MongoDB")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument(
+        "--limit", type=int, default=0, help="Documents to scan, 0 for all"
+    )
+    parser.add_argument(
+        "--rehash", action="store_true", help="Re-check plot digests of all documents"
+    )
+    args = parser.parse_args()
+    updated = ingestion_job.run(
+        batch_size=args.batch_size, limit=args.limit, rehash=args.rehash
+    )
+    if updated is None:
+        raise SystemExit("Ingestion is already running on another worker")
+    print(f"Embedded {len(updated)} documents")
+
+
+def build_index():
+    parser = argparse.ArgumentParser(description="Snapshot embeddings for local search")
+    parser.add_argument("--path", default=settings.LOCAL_INDEX_DIR)
+    parser.add_argument(
+        "--nlist", type=int, default=settings.LOCAL_INDEX_NLIST, help="IVF lists"
+    )
+    args = parser.parse_args()
+    count = build_snapshot(
+        collection,
+        args.path,
+        model_id=get_embedding_backend().model_id,
+        nlist=args.nlist,
+    )
+    index_version.bump()
+    print(f"Indexed {count} documents into {args.path}")
+
+
+def index_report():
+    parser = argparse.ArgumentParser(
+        description="Recall@k and memory of the local index quantization modes"
+    )
+    parser.add_argument("--path", default=settings.LOCAL_INDEX_DIR)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument(
+        "--rescore-factor", type=int, default=settings.LOCAL_INDEX_RESCORE_FACTOR
+    )
+    args = parser.parse_args()
+    report = quantization_report(
+        LocalVectorIndex(args.path),
+        k=args.k,
+        queries=args.queries,
+        rescore_factor=args.rescore_factor,
+    )
+    columns = list(report[0])
+    print(" | ".join(columns))
+    for row in report:
+        print(" | ".join(str(row[column]) for column in columns))
+
+
+def search_indexes():
+    argparse.ArgumentParser(
+        description="Create or update the Atlas Search indexes used by /movies"
+    ).parse_args()
+    for name in ensure_search_indexes(collection):
+        print(f"Submitted search index {name}")
@@ -0,0 +1,118 @@
+import asyncio
+import math
+import time
+import typing
+from typing import Any, AsyncIterator, Dict, List, Optional
+import orjson
+from ..core.config import settings
+from ..core.enums import SearchMode
+from ..middleware.logging import logger
+from .generation_services import get_generator
+from .movies_services import SEARCH_NUM_CANDIDATES, perform_search_async
+
+PROMPT_TEMPLATE = (
+    "Answer the question using only the movie plots below. "
+    "Cite movies by their number.\n\n{context}\n\nQuestion: {question}\nAnswer:"
+)
+MIN_PLOT_TOKENS = 16
+SOURCE_FIELDS = ("_id", "title", "score")
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (about 4 characters per token for English)."""
+    return math.ceil(len(text) / 4)
+
+
+def build_context(
+    hits: List[Dict[str, typing.Any]], budget: int
+) -> tuple[str, List[Dict[str, typing.Any]]]:
+    """Numbered plots of ``hits`` in rank order, within ``budget`` tokens.
+
+    The last plot that fits only partly is cut at a word boundary, or left out
+    when less than ``MIN_PLOT_TOKENS`` of it would remain.
+
+    :return: the context block and the hits it cites
+    """
+    lines: List[str] = []
+    sources: List[Dict[str, typing.Any]] = []
+    remaining = budget
+    for hit in hits:
+        header = f"[{len(sources) + 1}] {hit.get('title') or 'Untitled'}: "
+        plot = hit.get("plot") or ""
+        available = remaining - approx_tokens(header)
+        if available < min(MIN_PLOT_TOKENS, approx_tokens(plot)):
+            break
+        if approx_tokens(plot) > available:
+            plot = plot[: available * 4].rsplit(" ", 1)[0] + "..."
+        line = header + plot
+        lines.append(line)
+        sources.append({key: hit.get(key) for key in SOURCE_FIELDS})
+        remaining -= approx_tokens(line) + 1
+    return "\n".join(lines), sources
+
+
+def server_sent_event(event: str, data: Any) -> bytes:
+    """One Server-Sent Event with a JSON payload."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def answer_question(
+    question: str,
+    k: int = 4,
+    mode: SearchMode = SearchMode.VECTOR,
+    filters: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[bytes]:
+    """Retrieve plots for ``question`` and return an SSE stream of the answer.
+
+    The generator warms up while retrieval and prompt assembly run. Both
+    happen before the iterator is returned, so their failures surface as a
+    normal error response. The stream sends a ``sources`` event, one ``token``
+    event per generated token and a ``done`` event with the timings, among
+    them the time to first token measured from the start of the request.
+    """
+    started = time.perf_counter()
+    generator = get_generator()
+    warmup = asyncio.create_task(generator.warmup())
+    try:
+        hits = await perform_search_async(
+            question, k, max(SEARCH_NUM_CANDIDATES, k), 0, mode, filters
+        )
+        context, sources = build_context(hits, settings.ANSWER_CONTEXT_TOKENS)
+        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+        retrieval_ms = (time.perf_counter() - started) * 1000
+    except BaseException:
+        warmup.cancel()
+        raise
+    try:
+        await warmup
+    except Exception as err:
+        logger.error("%s - %s", err, "Generator warmup failed, generating anyway")
+
+    async def events() -> AsyncIterator[bytes]:
+        yield server_sent_event("sources", sources)
+        first_token_at = None
+        tokens = 0
+        try:
+            async for text in generator.stream(prompt, settings.ANSWER_MAX_TOKENS):
+                first_token_at = first_token_at or time.perf_counter()
+                tokens += 1
+                yield server_sent_event("token", {"text": text})
+        except Exception as err:
+            logger.error("%s - %s", err, "Error while generating the answer")
+            yield server_sent_event("error", {"message": "Answer generation failed"})
+            return
+        finished = time.perf_counter()
+        ttft_ms = ((first_token_at or finished) - started) * 1000
+        logger.info("%s - %s", round(ttft_ms, 1), "Answer time to first token (ms)")
+        yield server_sent_event(
+            "done",
+            {
+                "model": generator.model_id,
+                "tokens": tokens,
+                "retrieval_ms": round(retrieval_ms, 3),
+                "ttft_ms": round(ttft_ms, 3),
+                "total_ms": round((finished - started) * 1000, 3),
+            },
+        )
+
+    return events()
@@ -0,0 +1,192 @@
+import asyncio
+import math
+import time
+from typing import Any, Dict, Optional
+import httpx
+from fastapi import status as http_status
+from ..core.config import settings
+from ..core.exceptions import BackendError
+from ..middleware.logging import logger
+
+
+class CircuitBreaker:
+    """Fail fast while a dependency keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds. Then a single trial call
+    goes through: its success closes the circuit, its failure opens it again.
+
+    Examples:
+        >>> breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        >>> breaker.record_failure(); breaker.record_failure()
+        >>> breaker.state
+        'open'
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        """``closed``, ``open`` or ``half_open`` (trial call allowed)."""
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self._reset_timeout:
+            return "open"
+        return "half_open"
+
+    def retry_after(self) -> int:
+        """Seconds until the circuit lets a trial call through."""
+        if self._opened_at is None:
+            return 0
+        remaining = self._reset_timeout - (time.monotonic() - self._opened_at)
+        return max(math.ceil(remaining), 1)
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; claims the trial when half open."""
+        match self.state:
+            case "closed":
+                return True
+            case "half_open" if not self._trial_running:
+                self._trial_running = True
+                return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def abandon(self) -> None:
+        """Forget a call that ended without telling success from failure."""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or self.failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+        self._trial_running = False
+
+
+class Auth0Client:
+    """Async client for the Auth0 authentication API.
+
+    Connections are pooled and kept alive, every call has connect and read
+    timeouts and an overall deadline, and at most ``max_concurrency`` calls
+    are in flight; callers beyond that wait up to the connect timeout.
+    Timeouts, transport errors and 5xx/429 answers count as failures of the
+    circuit breaker, and while it is open calls fail at once with a 503.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        client_secret: str,
+        audience: str = "",
+        connect_timeout: float = 3.0,
+        read_timeout: float = 5.0,
+        max_concurrency: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._audience = audience
+        self._pool_timeout = connect_timeout
+        self._deadline = connect_timeout + read_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30)
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=httpx.Timeout(
+                read_timeout, connect=connect_timeout, pool=connect_timeout
+            ),
+            transport=transport,
+        )
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Return the circuit breaker guarding Auth0."""
+        return self._breaker
+
+    async def password_grant(self, username: str, password: str) -> httpx.Response:
+        """Exchange user credentials for tokens at ``/oauth/token``.
+
+        :raises BackendError: 503 while Auth0 is unavailable
+        """
+        data: Dict[str, Any] = {
+            "client_id": self._client_id,
+            "client_secret": self._client_secret,
+            "username": username,
+            "password": password,
+            "grant_type": "password",
+        }
+        if self._audience:
+            data["audience"] = self._audience
+        return await self.post("/oauth/token", data=data)
+
+    async def post(self, path: str, **kwargs: Any) -> httpx.Response:
+        """POST to Auth0 through the circuit breaker and the concurrency limit."""
+        if not self._breaker.allow():
+            raise self.unavailable()
+        try:
+            response = await self.send(path, **kwargs)
+        except (TimeoutError, httpx.HTTPError) as err:
+            logger.error("%s - %s", repr(err), "Auth0 request failed")
+            self._breaker.record_failure()
+            raise self.unavailable()
+        except BaseException:
+            # cancelled by the caller: says nothing about the health of Auth0
+            self._breaker.abandon()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            logger.error("%s - %s", response.status_code, "Auth0 request failed")
+            self._breaker.record_failure()
+            raise self.unavailable()
+        self._breaker.record_success()
+        return response
+
+    async def send(self, path: str, **kwargs: Any) -> httpx.Response:
+        # a saturated limit means Auth0 is not keeping up, like a timeout
+        await asyncio.wait_for(self._semaphore.acquire(), self._pool_timeout)
+        try:
+            # the read timeout applies to each read, the deadline to the call
+            return await asyncio.wait_for(
+                self._http.post(path, **kwargs), self._deadline
+            )
+        finally:
+            self._semaphore.release()
+
+    def unavailable(self) -> BackendError:
+        return BackendError(
+            message="Authentication service unavailable, try again later",
+            code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(self._breaker.retry_after() or 1)},
+        )
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+
+auth0_client = Auth0Client(
+    base_url=f"https://{settings.AUTH0_DOMAIN}",
+    client_id=settings.AUTH0_CLIENT_ID,
+    client_secret=settings.AUTH0_CLIENT_SECRET,
+    audience=settings.AUTH0_AUDIENCE,
+    connect_timeout=settings.AUTH0_CONNECT_TIMEOUT,
+    read_timeout=settings.AUTH0_READ_TIMEOUT,
+    max_concurrency=settings.AUTH0_MAX_CONCURRENCY,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.AUTH0_BREAKER_FAILURES,
+        reset_timeout=settings.AUTH0_BREAKER_RESET,
+    ),
+)
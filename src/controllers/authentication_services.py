@@ -1,16 +1,17 @@
 from typing import List
-import requests
-from ..database.connect import redis_client
-from datetime import timedelta
 from fastapi.responses import JSONResponse
 from ..core.config import settings
 from ..middleware.logging import logger
 from fastapi import status
 from redis.exceptions import RedisError
-import pickle
+from ..core.exceptions import BackendError
+from ..core.enums import AuthMode
+from .auth0_services import auth0_client
+from .session_services import session_store
+from .token_services import token_denylist
 
 
-def login_api(email: str, password: str) -> JSONResponse:
+async def login_api(email: str, password: str) -> JSONResponse:
     """Login API to grant access to user
 
     :param email: email of the user
@@ -23,18 +24,7 @@ def login_api(email: str, password: str) -> JSONResponse:
 
     logger.info("%s - %s", email, "Login function execution starts")
     try:
-        data = {
-            "client_id": settings.AUTH0_CLIENT_ID,
-            "client_secret": settings.AUTH0_CLIENT_SECRET,
-            "username": email,
-            "password": password,
-            "grant_type": "password",
-        }
-
-        response = requests.post(
-            f"https://{settings.AUTH0_DOMAIN}/oauth/token", data=data
-        )
-        print(response.status_code)
+        response = await auth0_client.password_grant(email, password)
         if response.status_code == 403:
             logger.error("%s - %s", email, "Wrong email or password")
             return JSONResponse(
@@ -50,8 +40,8 @@ def login_api(email: str, password: str) -> JSONResponse:
         access_token = response.json()["access_token"]
         cache = {"email": email}
         try:
-            redis_client.set(access_token, pickle.dumps(cache))
-            redis_client.expire(access_token, timedelta(seconds=21600))
+            if settings.AUTH_MODE == AuthMode.SESSION:
+                await session_store.create(access_token, cache)
         except RedisError as err:
             print(err)
             logger.error("%s - %s", email, "Error while storing token to redis")
@@ -63,13 +53,20 @@ def login_api(email: str, password: str) -> JSONResponse:
         res2.set_cookie("Authorization", f"Bearer {access_token}")
         logger.info("%s - %s", email, "Login function execution complete")
         return res2
+    except BackendError as err:
+        logger.error("%s - %s", email, err.message)
+        return JSONResponse(
+            content={"message": err.message},
+            status_code=err.code,
+            headers=err.headers,
+        )
     except Exception as e:
         print(e)
         logger.error("%s - %s", email, "Login API failed")
         return JSONResponse(content={"message": "Exception occurred"}, status_code=500)
 
 
-def logout_api(auth: List) -> JSONResponse:
+async def logout_api(auth: List) -> JSONResponse:
     """Logout API to remove access of user
 
     :param auth: List of Access token and Email
@@ -80,7 +77,10 @@ def logout_api(auth: List) -> JSONResponse:
     logger.info("%s - %s", auth[1]["email"], "Logout function execution starts")
     try:
         response = JSONResponse(content={"message": "Logged out successfully"})
-        redis_client.delete(auth[0])
+        if settings.AUTH_MODE == AuthMode.JWT:
+            await token_denylist.revoke(auth[0], auth[1]["exp"])
+        else:
+            await session_store.revoke(auth[0])
         response.delete_cookie("Authorization")
         logger.info("%s - %s", auth[1]["email"], "Logout function execution complete")
         return response
@@ -0,0 +1,421 @@
+import asyncio
+import hashlib
+import json
+import struct
+import threading
+import time
+import typing
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+from ..core.config import settings
+from ..database.connect import async_redis_client, redis_client
+from ..middleware.logging import logger
+from .embedding_services import BaseEmbeddingBackend
+
+# Cached search results are stored as the creation time and the number of
+# hits followed by the body.
+RESULT_HEADER = struct.Struct("<dI")
+# Serialized search hits and how many there are.
+SearchResult = tuple[bytes, int]
+
+
+class TTLCache:
+    """Bounded in-process LRU mapping whose entries expire after ``ttl`` seconds.
+
+    Examples:
+        >>> cache = TTLCache(maxsize=2, ttl=60)
+        >>> cache.set("a", 1)
+        >>> cache.get("a")
+        1
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: OrderedDict[str, tuple[float, typing.Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        """Return a live entry and mark it as most recently used."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: typing.Any) -> None:
+        """Store an entry, evicting the least recently used one when full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self._ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> typing.Any:
+        """Drop an entry if present."""
+        with self._lock:
+            item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class CacheStats:
+    """Hit/miss counters of a cache, per tier."""
+
+    def __init__(self) -> None:
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def dict(self) -> Dict[str, typing.Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0,
+        }
+
+
+def normalize_query(text: str) -> str:
+    """Case-fold and collapse whitespace so equivalent queries share a key."""
+    return " ".join(text.casefold().split())
+
+
+def pack_vector(vector: List[float]) -> bytes:
+    """Pack a vector as little-endian float32 bytes."""
+    return np.asarray(vector, dtype="<f4").tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """Inverse of :func:`pack_vector`."""
+    return np.frombuffer(data, dtype="<f4").tolist()
+
+
+class EmbeddingCache:
+    """Two-tier cache of query embeddings: in-process LRU in front of Redis.
+
+    Keys combine the embedding model id with a digest of the normalized query,
+    and the Redis tier keeps vectors as packed float32 bytes. Redis failures
+    are logged and treated as misses so the cache never fails a search.
+    :meth:`embed` goes through ``redis`` and :meth:`aembed` through the
+    ``async_redis`` pool.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        async_redis: AsyncRedis,
+        maxsize: int,
+        ttl: float,
+        redis_ttl: int,
+        key_prefix: str = "embedding",
+    ) -> None:
+        self._redis = redis
+        self._async_redis = async_redis
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._redis_ttl = redis_ttl
+        self._key_prefix = key_prefix
+        self.stats = CacheStats()
+
+    def key(self, text: str, model_id: str) -> str:
+        """Construct key for Redis.
+
+        Examples:
+            key="embedding:sentence-transformers/all-MiniLM-L6-v2:9f86d081884c7d65..."
+        """
+        digest = hashlib.sha256(normalize_query(text).encode()).hexdigest()
+        return f"{self._key_prefix}:{model_id}:{digest}"
+
+    def embed(
+        self, texts: List[str], backend: BaseEmbeddingBackend
+    ) -> List[List[float]]:
+        """Return embeddings for ``texts``, calling the backend only for misses."""
+        keys = [self.key(text, backend.model_id) for text in texts]
+        vectors = self._local_lookup(keys)
+
+        pending = [i for i, vector in enumerate(vectors) if vector is None]
+        if pending:
+            found = self._redis_get([keys[i] for i in pending])
+            self._fill_from_redis(vectors, keys, pending, found)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = backend.embed([texts[i] for i in missing])
+            self._redis_set(self._fill_from_backend(vectors, keys, missing, embedded))
+        return vectors
+
+    async def aembed(
+        self, texts: List[str], backend: BaseEmbeddingBackend
+    ) -> List[List[float]]:
+        """Async counterpart of :meth:`embed` for the event loop."""
+        keys = [self.key(text, backend.model_id) for text in texts]
+        vectors = self._local_lookup(keys)
+
+        pending = [i for i, vector in enumerate(vectors) if vector is None]
+        if pending:
+            found = await self._redis_aget([keys[i] for i in pending])
+            self._fill_from_redis(vectors, keys, pending, found)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = await backend.aembed([texts[i] for i in missing])
+            await self._redis_aset(
+                self._fill_from_backend(vectors, keys, missing, embedded)
+            )
+        return vectors
+
+    def _local_lookup(self, keys: List[str]) -> List[Optional[List[float]]]:
+        vectors = [self._local.get(key) for key in keys]
+        self.stats.local_hits += sum(vector is not None for vector in vectors)
+        return vectors
+
+    def _fill_from_redis(
+        self,
+        vectors: List[Optional[List[float]]],
+        keys: List[str],
+        pending: List[int],
+        found: List[Optional[bytes]],
+    ) -> None:
+        for i, data in zip(pending, found):
+            if data is not None:
+                vectors[i] = unpack_vector(data)
+                self._local.set(keys[i], vectors[i])
+                self.stats.redis_hits += 1
+
+    def _fill_from_backend(
+        self,
+        vectors: List[Optional[List[float]]],
+        keys: List[str],
+        missing: List[int],
+        embedded: List[List[float]],
+    ) -> Dict[str, bytes]:
+        self.stats.misses += len(missing)
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+            self._local.set(keys[i], vector)
+        return {keys[i]: pack_vector(vectors[i]) for i in missing}
+
+    def _redis_get(self, keys: List[str]) -> List[Optional[bytes]]:
+        try:
+            return self._redis.mget(keys)
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while reading embeddings from redis")
+            return [None] * len(keys)
+
+    def _redis_set(self, items: Dict[str, bytes]) -> None:
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, data in items.items():
+                pipe.set(name=key, value=data, ex=self._redis_ttl)
+            pipe.execute()
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while storing embeddings to redis")
+
+    async def _redis_aget(self, keys: List[str]) -> List[Optional[bytes]]:
+        try:
+            return await self._async_redis.mget(keys)
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while reading embeddings from redis")
+            return [None] * len(keys)
+
+    async def _redis_aset(self, items: Dict[str, bytes]) -> None:
+        try:
+            pipe = self._async_redis.pipeline(transaction=False)
+            for key, data in items.items():
+                pipe.set(name=key, value=data, ex=self._redis_ttl)
+            await pipe.execute()
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while storing embeddings to redis")
+
+
+class IndexVersion:
+    """Counter bumped whenever stored vectors change.
+
+    Result cache keys embed the version, so a bump invalidates every cached
+    result at once without scanning keys. Workers re-read it at most once per
+    ``ttl`` seconds, with :meth:`acurrent` on the event loop.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        async_redis: AsyncRedis,
+        ttl: float,
+        key: str = "index:version",
+    ) -> None:
+        self._redis = redis
+        self._async_redis = async_redis
+        self._local = TTLCache(maxsize=1, ttl=ttl)
+        self._key = key
+
+    def current(self) -> int:
+        version = self._local.get(self._key)
+        if version is None:
+            try:
+                version = int(self._redis.get(self._key) or 0)
+            except RedisError as err:
+                logger.error("%s - %s", err, "Error while reading index version")
+                return 0
+            self._local.set(self._key, version)
+        return version
+
+    async def acurrent(self) -> int:
+        """Async counterpart of :meth:`current`."""
+        version = self._local.get(self._key)
+        if version is None:
+            try:
+                version = int(await self._async_redis.get(self._key) or 0)
+            except RedisError as err:
+                logger.error("%s - %s", err, "Error while reading index version")
+                return 0
+            self._local.set(self._key, version)
+        return version
+
+    def bump(self) -> int:
+        version = self._redis.incr(self._key)
+        self._local.clear()
+        return version
+
+
+class SearchResultCache:
+    """Cache of complete search results with stale-while-revalidate.
+
+    Entries are fresh for ``ttl`` seconds. For ``stale_ttl`` seconds after
+    that they are still served, while a single background task (guarded by a
+    Redis ``SET NX``) recomputes them, so hot queries never wait on search.
+    Redis is only reached through the async pool.
+    """
+
+    def __init__(
+        self,
+        redis: AsyncRedis,
+        version: IndexVersion,
+        ttl: int,
+        stale_ttl: int,
+        key_prefix: str = "results",
+    ) -> None:
+        self._redis = redis
+        self._version = version
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._key_prefix = key_prefix
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.stats = CacheStats()
+
+    def key(self, query: str, params: Dict[str, typing.Any], version: int) -> str:
+        """Construct key for Redis.
+
+        Examples:
+            key="results:v12:3b1e9c0f..."
+        """
+        fingerprint = json.dumps(
+            {"query": normalize_query(query), **params}, sort_keys=True, default=str
+        )
+        digest = hashlib.sha256(fingerprint.encode()).hexdigest()
+        return f"{self._key_prefix}:v{version}:{digest}"
+
+    async def get_or_search(
+        self,
+        query: str,
+        params: Dict[str, typing.Any],
+        search: Callable[[], Awaitable[SearchResult]],
+    ) -> SearchResult:
+        """Serve the body and hit count of ``search()``, computing them on a miss."""
+        version = await self._version.acurrent()
+        key = self.key(query, params, version)
+        entry = await self._redis_get(key)
+        if entry is not None:
+            created_at, result = entry
+            self.stats.redis_hits += 1
+            if time.time() - created_at > self._ttl:
+                self.stats.stale_hits += 1
+                self._revalidate(key, search)
+            return result
+
+        self.stats.misses += 1
+        result = await search()
+        await self._redis_set(key, result)
+        return result
+
+    def _revalidate(
+        self, key: str, search: Callable[[], Awaitable[SearchResult]]
+    ) -> None:
+        task = asyncio.create_task(self._refresh(key, search))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(
+        self, key: str, search: Callable[[], Awaitable[SearchResult]]
+    ) -> None:
+        try:
+            claimed = await self._redis.set(f"{key}:refresh", 1, nx=True, ex=self._ttl)
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while claiming a result refresh")
+            return
+        if not claimed:
+            return
+        try:
+            await self._redis_set(key, await search())
+        except Exception:
+            logger.exception("%s - %s", key, "Background revalidation failed")
+
+    async def _redis_get(self, key: str) -> Optional[tuple[float, SearchResult]]:
+        try:
+            data = await self._redis.get(key)
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while reading results from redis")
+            return None
+        if not data:
+            return None
+        created_at, count = RESULT_HEADER.unpack_from(data)
+        return created_at, (data[RESULT_HEADER.size :], count)
+
+    async def _redis_set(self, key: str, result: SearchResult) -> None:
+        payload, count = result
+        try:
+            await self._redis.set(
+                name=key,
+                value=RESULT_HEADER.pack(time.time(), count) + payload,
+                ex=self._ttl + self._stale_ttl,
+            )
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while storing results to redis")
+
+
+embedding_cache = EmbeddingCache(
+    redis=redis_client,
+    async_redis=async_redis_client,
+    maxsize=settings.EMBEDDING_CACHE_SIZE,
+    ttl=settings.EMBEDDING_CACHE_TTL,
+    redis_ttl=settings.EMBEDDING_CACHE_REDIS_TTL,
+)
+
+index_version = IndexVersion(
+    redis=redis_client,
+    async_redis=async_redis_client,
+    ttl=settings.INDEX_VERSION_TTL,
+)
+result_cache = SearchResultCache(
+    redis=async_redis_client,
+    version=index_version,
+    ttl=settings.RESULT_CACHE_TTL,
+    stale_ttl=settings.RESULT_CACHE_STALE_TTL,
+)
@@ -0,0 +1,165 @@
+import abc
+import functools
+import os
+from typing import List
+import httpx
+import numpy as np
+import requests
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.enums import EmbeddingBackend
+from ..database.connect import http_client
+
+HUGGINGFACE_PIPELINE_URL = (
+    "https://api-inference.huggingface.co/pipeline/feature-extraction/{model_id}"
+)
+
+
+class BaseEmbeddingBackend(abc.ABC):
+    """Base realization for an engine turning texts into sentence embeddings."""
+
+    def __init__(self, model_id: str) -> None:
+        self._model_id = model_id
+
+    @property
+    def model_id(self) -> str:
+        """Return the id of the model producing the vectors."""
+        return self._model_id
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts, keeping the input order."""
+        raise NotImplementedError
+
+    def embed_one(self, text: str) -> List[float]:
+        """Embed a single text."""
+        return self.embed([text])[0]
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        """Embed without blocking the event loop (threadpool by default)."""
+        return await run_in_threadpool(self.embed, texts)
+
+
+class HuggingFaceEmbeddingBackend(BaseEmbeddingBackend):
+    """Embeddings from the HuggingFace hosted feature-extraction pipeline."""
+
+    def __init__(self, model_id: str, api_key: str) -> None:
+        super().__init__(model_id=model_id)
+        self._url = HUGGINGFACE_PIPELINE_URL.format(model_id=model_id)
+        self._headers = {"Authorization": f"Bearer {api_key}"}
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = requests.post(
+            self._url, headers=self._headers, json={"inputs": texts}
+        )
+
+        return self.parse_response(response)
+
+    async def aembed(self, texts: List[str]) -> List[List[float]]:
+        response = await http_client.post(
+            self._url, headers=self._headers, json={"inputs": texts}
+        )
+        return self.parse_response(response)
+
+    @staticmethod
+    def parse_response(
+        response: requests.Response | httpx.Response,
+    ) -> List[List[float]]:
+        if response.status_code != 200:
+            raise ValueError(
+                f"Request failed with status code {response.status_code}: {response.text}"
+            )
+
+        return response.json()
+
+
+class LocalMiniLMEmbeddingBackend(BaseEmbeddingBackend):
+    """In-process all-MiniLM-L6-v2 running on CPU with ONNX Runtime.
+
+    The model directory is expected to hold ``tokenizer.json`` and the exported
+    ``model.onnx`` (either at the root or under ``onnx/``, like the HuggingFace
+    repository snapshot). Token embeddings are mean pooled over the attention
+    mask and L2 normalised, which is what the sentence-transformers pipeline
+    behind the hosted API does, so vectors match ``plot_embedding_hf``.
+    """
+
+    def __init__(self, model_id: str, model_dir: str, max_seq_length: int) -> None:
+        super().__init__(model_id=model_id)
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as err:
+            raise RuntimeError(
+                "Local embedding backend requires the 'local' extra "
+                "(onnxruntime, tokenizers) to be installed"
+            ) from err
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_seq_length)
+        self._tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        self._session = onnxruntime.InferenceSession(
+            self.model_path(model_dir),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {node.name for node in self._session.get_inputs()}
+
+    @staticmethod
+    def model_path(model_dir: str) -> str:
+        """Locate the ONNX graph inside the model directory."""
+        for candidate in ("model.onnx", os.path.join("onnx", "model.onnx")):
+            path = os.path.join(model_dir, candidate)
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No model.onnx found in {model_dir}")
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        encodings = self._tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {
+            name: value for name, value in feeds.items() if name in self._input_names
+        }
+        token_embeddings = self._session.run(None, feeds)[0]
+        return mean_pooling(token_embeddings, feeds["attention_mask"]).tolist()
+
+
+def mean_pooling(
+    token_embeddings: np.ndarray, attention_mask: np.ndarray
+) -> np.ndarray:
+    """Average token embeddings over the attention mask and L2 normalise them."""
+    mask = attention_mask[..., np.newaxis].astype(token_embeddings.dtype)
+    summed = (token_embeddings * mask).sum(axis=1)
+    counts = np.clip(mask.sum(axis=1), a_min=1e-9, a_max=None)
+    pooled = summed / counts
+    norms = np.clip(
+        np.linalg.norm(pooled, axis=1, keepdims=True), a_min=1e-12, a_max=None
+    )
+    return pooled / norms
+
+
+@functools.lru_cache()
+def get_embedding_backend() -> BaseEmbeddingBackend:
+    """Build the embedding engine configured in settings (once per process)."""
+    match settings.EMBEDDING_BACKEND:
+        case EmbeddingBackend.LOCAL:
+            return LocalMiniLMEmbeddingBackend(
+                model_id=settings.EMBEDDING_MODEL_ID,
+                model_dir=settings.EMBEDDING_MODEL_DIR,
+                max_seq_length=settings.EMBEDDING_MAX_SEQ_LENGTH,
+            )
+        case EmbeddingBackend.HUGGINGFACE:
+            return HuggingFaceEmbeddingBackend(
+                model_id=settings.EMBEDDING_MODEL_ID,
+                api_key=settings.HUGGINGFACE_API_KEY,
+            )
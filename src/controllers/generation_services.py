@@ -0,0 +1,138 @@
+import abc
+import asyncio
+import functools
+import re
+import time
+from typing import AsyncIterator, Optional
+import orjson
+from ..core.config import settings
+from ..core.enums import GeneratorBackend
+from ..database.connect import http_client
+
+HUGGINGFACE_MODEL_URL = "https://api-inference.huggingface.co/models/{model_id}"
+
+
+class BaseGenerator(abc.ABC):
+    """Base realization for an engine streaming text completions."""
+
+    def __init__(self, model_id: str) -> None:
+        self._model_id = model_id
+
+    @property
+    def model_id(self) -> str:
+        """Return the id of the model writing the answers."""
+        return self._model_id
+
+    async def warmup(self) -> None:
+        """Get the model ready to answer; a no-op unless the engine needs one."""
+
+    @abc.abstractmethod
+    def stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        """Yield the completion of ``prompt`` token by token."""
+        raise NotImplementedError
+
+
+class HuggingFaceGenerator(BaseGenerator):
+    """Completions streamed from the HuggingFace hosted text-generation API.
+
+    Warming up loads the model if it is cold and opens a pooled connection to
+    the API, so the first real request does not pay for either. Concurrent
+    requests share one warmup call instead of each sending their own.
+    """
+
+    def __init__(self, model_id: str, api_key: str, warmup_ttl: int) -> None:
+        super().__init__(model_id=model_id)
+        self._url = HUGGINGFACE_MODEL_URL.format(model_id=model_id)
+        self._headers = {"Authorization": f"Bearer {api_key}"}
+        self._warmup_ttl = warmup_ttl
+        self._warm_until = 0.0
+        self._warming: Optional[asyncio.Task[None]] = None
+
+    async def warmup(self) -> None:
+        if time.monotonic() < self._warm_until:
+            return
+        if self._warming is None or self._warming.done():
+            self._warming = asyncio.create_task(self._warm())
+        # shielded: a request giving up does not cancel the others' warmup
+        await asyncio.shield(self._warming)
+
+    async def _warm(self) -> None:
+        response = await http_client.post(
+            self._url,
+            headers=self._headers,
+            json={
+                "inputs": "Hello",
+                "parameters": {"max_new_tokens": 1},
+                "options": {"wait_for_model": True},
+            },
+        )
+        if response.status_code != 200:
+            raise ValueError(
+                f"Warmup failed with status code {response.status_code}: "
+                f"{response.text}"
+            )
+        self._warm_until = time.monotonic() + self._warmup_ttl
+
+    async def stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        payload = {
+            "inputs": prompt,
+            "parameters": {"max_new_tokens": max_tokens, "return_full_text": False},
+            "stream": True,
+        }
+        async with http_client.stream(
+            "POST", self._url, headers=self._headers, json=payload
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ValueError(
+                    f"Request failed with status code {response.status_code}: "
+                    f"{response.text}"
+                )
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                token = orjson.loads(line[len("data:") :])["token"]
+                if not token.get("special"):
+                    yield token["text"]
+
+
+class LocalStandInGenerator(BaseGenerator):
+    """Deterministic stand-in for tests and offline development.
+
+    It writes no real answer: it streams the words of the context section of
+    the prompt back, optionally with a warmup and per-token delay to mimic a
+    model.
+    """
+
+    def __init__(
+        self,
+        model_id: str = "local-stand-in",
+        warmup_delay: float = 0.0,
+        token_delay: float = 0.0,
+    ) -> None:
+        super().__init__(model_id=model_id)
+        self._warmup_delay = warmup_delay
+        self._token_delay = token_delay
+
+    async def warmup(self) -> None:
+        await asyncio.sleep(self._warmup_delay)
+
+    async def stream(self, prompt: str, max_tokens: int) -> AsyncIterator[str]:
+        context = prompt.split("\n\n")[1] if "\n\n" in prompt else prompt
+        for word in re.findall(r"\S+\s*", context)[:max_tokens]:
+            await asyncio.sleep(self._token_delay)
+            yield word
+
+
+@functools.lru_cache()
+def get_generator() -> BaseGenerator:
+    """Build the generator configured in settings (once per process)."""
+    match settings.GENERATOR_BACKEND:
+        case GeneratorBackend.LOCAL:
+            return LocalStandInGenerator()
+        case GeneratorBackend.HUGGINGFACE:
+            return HuggingFaceGenerator(
+                model_id=settings.GENERATOR_MODEL_ID,
+                api_key=settings.HUGGINGFACE_API_KEY,
+                warmup_ttl=settings.GENERATOR_WARMUP_TTL,
+            )
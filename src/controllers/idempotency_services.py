@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+import orjson
+from redis.asyncio import Redis as AsyncRedis
+from ..core.config import settings
+from ..database.connect import async_redis_client
+
+# A record is the header below (format version, state, request fingerprint,
+# status, length of the JSON headers), the JSON headers and the body.
+RECORD_HEADER = struct.Struct("<BB16sHI")
+RECORD_VERSION = 1
+IN_FLIGHT = 0
+COMPLETED = 1
+KEY_PREFIX = "idempotency:"
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class IdempotencyRecord:
+    """A claimed request and, once completed, its response."""
+
+    def __init__(
+        self,
+        fingerprint: bytes,
+        status: int = 0,
+        headers: Optional[Headers] = None,
+        body: bytes = b"",
+        completed: bool = False,
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.status = status
+        self.headers = headers or []
+        self.body = body
+        self.completed = completed
+
+    def encode(self) -> bytes:
+        meta = orjson.dumps(
+            [[k.decode("latin-1"), v.decode("latin-1")] for k, v in self.headers]
+        )
+        state = COMPLETED if self.completed else IN_FLIGHT
+        header = RECORD_HEADER.pack(
+            RECORD_VERSION, state, self.fingerprint, self.status, len(meta)
+        )
+        return header + meta + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> "IdempotencyRecord":
+        version, state, fingerprint, status, size = RECORD_HEADER.unpack_from(data)
+        if version != RECORD_VERSION:
+            raise ValueError("Unknown idempotency record format")
+        start = RECORD_HEADER.size
+        headers = [
+            (k.encode("latin-1"), v.encode("latin-1"))
+            for k, v in orjson.loads(data[start : start + size])
+        ]
+        return cls(
+            fingerprint=fingerprint,
+            status=status,
+            headers=headers,
+            body=data[start + size :],
+            completed=state == COMPLETED,
+        )
+
+
+def request_fingerprint(method: str, path: str, query: bytes, body: bytes) -> bytes:
+    """Digest telling apart different requests sent with the same request id."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (method.encode(), path.encode(), query, body):
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.digest()
+
+
+class IdempotencyStore:
+    """Responses of mutating requests, kept by request id for replay.
+
+    The first request with an id claims it with SET NX, holding the claim for
+    at most ``lock_ttl`` seconds, and stores its response for ``ttl``
+    seconds when done. A duplicate waits for the claim to complete (on an
+    in-process event when the owner runs in the same worker, by polling
+    Redis otherwise) and gets the stored response.
+    """
+
+    def __init__(
+        self,
+        redis: AsyncRedis,
+        ttl: int,
+        lock_ttl: int,
+        wait_timeout: float,
+        poll_interval: float = 0.05,
+    ) -> None:
+        self._redis = redis
+        self._ttl = ttl
+        self._lock_ttl = lock_ttl
+        self._wait_timeout = wait_timeout
+        self._poll_interval = poll_interval
+        self._owned: Dict[str, asyncio.Event] = {}
+
+    @property
+    def wait_timeout(self) -> float:
+        """Return how long a duplicate waits for the first request, in seconds."""
+        return self._wait_timeout
+
+    @staticmethod
+    def key(scope: str, request_id: str) -> str:
+        return f"{KEY_PREFIX}{scope}:{request_id}"
+
+    async def claim(
+        self, key: str, fingerprint: bytes
+    ) -> Tuple[bool, Optional[IdempotencyRecord]]:
+        """Claim ``key``; otherwise return the record holding it.
+
+        The record is ``None`` if the claim vanished in between.
+        """
+        claimed = await self._redis.set(
+            key, IdempotencyRecord(fingerprint).encode(), nx=True, ex=self._lock_ttl
+        )
+        if claimed:
+            self._owned[key] = asyncio.Event()
+            return True, None
+        data = await self._redis.get(key)
+        return False, IdempotencyRecord.decode(data) if data is not None else None
+
+    async def complete(self, key: str, record: IdempotencyRecord) -> None:
+        """Store the response of a claimed request and wake up its duplicates."""
+        record.completed = True
+        try:
+            await self._redis.set(key, record.encode(), ex=self._ttl)
+        finally:
+            self._done(key)
+
+    async def release(self, key: str) -> None:
+        """Give up a claim without a response, so the request can be retried."""
+        try:
+            await self._redis.delete(key)
+        finally:
+            self._done(key)
+
+    def _done(self, key: str) -> None:
+        if (event := self._owned.pop(key, None)) is not None:
+            event.set()
+
+    async def wait(
+        self, key: str, deadline: Optional[float] = None
+    ) -> Optional[IdempotencyRecord]:
+        """Wait for the claim on ``key`` to complete.
+
+        :param deadline: :func:`time.monotonic` time to give up at, by default
+            ``wait_timeout`` from now
+        :return: the completed record, or ``None`` if the claim was released
+            or did not complete before the deadline
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self._wait_timeout
+        if (event := self._owned.get(key)) is not None:
+            try:
+                await asyncio.wait_for(event.wait(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                return None
+        while True:
+            data = await self._redis.get(key)
+            if data is None:
+                return None
+            record = IdempotencyRecord.decode(data)
+            if record.completed or time.monotonic() >= deadline:
+                return record if record.completed else None
+            await asyncio.sleep(self._poll_interval)
+
+
+idempotency_store = IdempotencyStore(
+    redis=async_redis_client,
+    ttl=settings.IDEMPOTENCY_TTL,
+    lock_ttl=settings.IDEMPOTENCY_LOCK_TTL,
+    wait_timeout=settings.IDEMPOTENCY_WAIT_TIMEOUT,
+)
@@ -0,0 +1,556 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from fastapi import status as http_status
+from pymongo.collection import Collection
+from ..core.config import settings
+from ..core.enums import LocalIndexMode, Quantization
+from ..core.exceptions import BackendError
+from ..middleware.logging import logger
+from .embedding_services import get_embedding_backend
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.json"
+DOCS_FILE = "docs.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ORDER_FILE = "ivf_order.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+INT8_CODES_FILE = "codes_int8.npy"
+INT8_SCALES_FILE = "scales_int8.npy"
+BINARY_CODES_FILE = "codes_binary.npy"
+ATTRIBUTES_FILE = "attributes.json"
+
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(
+    axis=1, dtype=np.int32
+)
+CHUNK_ROWS = 16384
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2 normalise vectors along the last axis."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.clip(norms, a_min=1e-12, a_max=None)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` highest scores, best first, in O(n + k log k)."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-dimension scalar quantization to int8 codes and scales."""
+    scales = np.abs(vectors).max(axis=0) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """One sign bit per dimension, packed eight to a byte."""
+    return np.packbits(vectors > 0, axis=-1)
+
+
+def int8_scores(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products against int8 codes, a chunk of rows at a time."""
+    scaled_query = query * scales
+    return np.concatenate(
+        [
+            codes[start : start + CHUNK_ROWS].astype(np.float32) @ scaled_query
+            for start in range(0, max(len(codes), 1), CHUNK_ROWS)
+        ]
+    )
+
+
+def binary_scores(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Agreeing minus disagreeing sign bits (negated Hamming distance)."""
+    query_bits = quantize_binary(query)
+    scores = []
+    for start in range(0, max(len(codes), 1), CHUNK_ROWS):
+        chunk = np.bitwise_xor(codes[start : start + CHUNK_ROWS], query_bits)
+        scores.append(query.shape[-1] - 2 * POPCOUNT[chunk].sum(axis=1))
+    return np.concatenate(scores)
+
+
+def train_ivf(
+    vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means coarse quantizer over normalised vectors.
+
+    Returns the ``(nlist, dim)`` centroids and the list id of every row.
+    """
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), 50_000)
+    sample = vectors[rng.choice(len(vectors), size=sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+
+    assignment = np.concatenate(
+        [
+            np.argmax(chunk @ centroids.T, axis=1)
+            for chunk in np.array_split(vectors, max(1, len(vectors) // 8192))
+        ]
+    )
+    return centroids.astype(np.float32), assignment
+
+
+def filter_attributes(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of a movie that search filters apply to, with unusable values dropped.
+
+    Examples:
+        >>> filter_attributes({"year": "1999è", "imdb": {"rating": ""}})
+        {'year': None, 'rating': None, 'genres': [], 'languages': []}
+    """
+    year = doc.get("year")
+    rating = (doc.get("imdb") or {}).get("rating")
+    return {
+        "year": year if isinstance(year, int) else None,
+        "rating": float(rating) if isinstance(rating, (int, float)) else None,
+        "genres": list(doc.get("genres") or []),
+        "languages": list(doc.get("languages") or []),
+    }
+
+
+def write_snapshot(
+    path: str, docs: Iterable[Dict[str, Any]], model_id: str, nlist: int = 0
+) -> int:
+    """Write documents carrying ``plot_embedding_hf`` as a local index snapshot.
+
+    Vectors go to a contiguous little-endian float32 file that workers map
+    read-only, so the operating system shares one copy of it between them.
+    The snapshot is written next to ``path`` and swapped in atomically.
+
+    :param path: snapshot directory
+    :type path: str
+    :param docs: movies with ``_id``, ``title``, ``plot`` and ``plot_embedding_hf``,
+        and optionally the filter fields ``year``, ``imdb.rating``, ``genres`` and
+        ``languages``
+    :type docs: Iterable[Dict[str, Any]]
+    :param model_id: embedding model the vectors were produced with
+    :type model_id: str
+    :param nlist: number of IVF lists to train, ``0`` for ``sqrt(count)``
+    :type nlist: int
+    :return: number of indexed documents
+    :rtype: int
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".index-")
+
+    metadata = []
+    attributes: Dict[str, List[Any]] = {
+        "year": [],
+        "rating": [],
+        "genres": [],
+        "languages": [],
+    }
+    dim = 0
+    with open(os.path.join(staging, VECTORS_FILE), "wb") as file:
+        for doc in docs:
+            vector = normalize_rows(
+                np.asarray(doc["plot_embedding_hf"], dtype=np.float32)
+            )
+            dim = dim or vector.shape[0]
+            file.write(vector.astype("<f4").tobytes())
+            metadata.append(
+                {"_id": str(doc["_id"]), "title": doc.get("title"), "plot": doc["plot"]}
+            )
+            for field, value in filter_attributes(doc).items():
+                attributes[field].append(value)
+    with open(os.path.join(staging, DOCS_FILE), "w") as file:
+        json.dump(metadata, file)
+    with open(os.path.join(staging, ATTRIBUTES_FILE), "w") as file:
+        json.dump(attributes, file)
+
+    count = len(metadata)
+    if count:
+        vectors = np.memmap(
+            os.path.join(staging, VECTORS_FILE),
+            dtype="<f4",
+            mode="r",
+            shape=(count, dim),
+        )
+        nlist = min(nlist or int(np.sqrt(count)), count)
+        centroids, assignment = train_ivf(np.asarray(vectors), nlist=nlist)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        np.save(os.path.join(staging, IVF_CENTROIDS_FILE), centroids)
+        np.save(os.path.join(staging, IVF_ORDER_FILE), order.astype(np.int64))
+        np.save(os.path.join(staging, IVF_OFFSETS_FILE), offsets.astype(np.int64))
+        codes, scales = quantize_int8(np.asarray(vectors))
+        np.save(os.path.join(staging, INT8_CODES_FILE), codes)
+        np.save(os.path.join(staging, INT8_SCALES_FILE), scales)
+        np.save(os.path.join(staging, BINARY_CODES_FILE), quantize_binary(vectors))
+        del vectors
+
+    with open(os.path.join(staging, META_FILE), "w") as file:
+        json.dump(
+            {"count": count, "dim": dim, "model": model_id, "created_at": time.time()},
+            file,
+        )
+
+    swap_snapshot(staging, path)
+    return count
+
+
+def swap_snapshot(staging: str, path: str) -> None:
+    """Point the ``path`` symlink at ``staging`` and delete the old snapshot.
+
+    Replacing a symlink is atomic, so readers always find a complete
+    snapshot at ``path``, and a crash keeps either the old or the new one.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and previous is None:
+        # a snapshot written before snapshots were symlinked: moved aside once
+        previous = tempfile.mkdtemp(dir=parent, prefix=".index-")
+        os.replace(path, previous)
+    link = staging + ".link"
+    os.symlink(os.path.basename(staging), link)
+    os.replace(link, path)
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def build_snapshot(
+    collection: Collection, path: str, model_id: str, nlist: int = 0
+) -> int:
+    """Export every embedded movie of ``collection`` to a local index snapshot."""
+    cursor = collection.find(
+        {"plot_embedding_hf": {"$exists": True}},
+        projection={
+            "title": 1,
+            "plot": 1,
+            "plot_embedding_hf": 1,
+            "year": 1,
+            "imdb.rating": 1,
+            "genres": 1,
+            "languages": 1,
+        },
+        sort=[("_id", 1)],
+    )
+    count = write_snapshot(path, cursor, model_id=model_id, nlist=nlist)
+    logger.info("%s - %s", count, "Documents written to the local vector index")
+    return count
+
+
+class LocalVectorIndex:
+    """In-process vector search over a memory-mapped snapshot.
+
+    ``exact`` mode scores every row with one matrix-vector product and keeps
+    the top ``limit`` with ``argpartition``. ``ivf`` mode only scores the rows
+    of the ``nprobe`` lists closest to the query. With int8 or binary
+    quantization the coarse pass runs on the compact codes and only the best
+    ``limit * rescore_factor`` rows are rescored with the float32 vectors.
+    Filters are applied first, as a boolean row mask built from per-value
+    bitmaps, so only eligible rows are ever scored.
+    """
+
+    def __init__(self, path: str) -> None:
+        # resolve the symlink once, so a swap while loading cannot mix snapshots
+        path = os.path.realpath(path)
+        with open(os.path.join(path, META_FILE)) as file:
+            self.meta = json.load(file)
+        with open(os.path.join(path, DOCS_FILE)) as file:
+            self.docs: List[Dict[str, typing.Any]] = json.load(file)
+        self.rows = {doc["_id"]: row for row, doc in enumerate(self.docs)}
+
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = (
+            np.memmap(
+                os.path.join(path, VECTORS_FILE),
+                dtype="<f4",
+                mode="r",
+                shape=(count, dim),
+            )
+            if count
+            else np.empty((0, dim), dtype="<f4")
+        )
+        self.ivf_centroids: Optional[np.ndarray] = None
+        if os.path.exists(os.path.join(path, IVF_CENTROIDS_FILE)):
+            self.ivf_centroids = np.load(os.path.join(path, IVF_CENTROIDS_FILE))
+            self.ivf_order = np.load(os.path.join(path, IVF_ORDER_FILE), mmap_mode="r")
+            self.ivf_offsets = np.load(os.path.join(path, IVF_OFFSETS_FILE))
+        self.codes: Dict[Quantization, np.ndarray] = {}
+        if os.path.exists(os.path.join(path, INT8_CODES_FILE)):
+            self.codes[Quantization.INT8] = np.load(os.path.join(path, INT8_CODES_FILE))
+            self.int8_scales = np.load(os.path.join(path, INT8_SCALES_FILE))
+            self.codes[Quantization.BINARY] = np.load(
+                os.path.join(path, BINARY_CODES_FILE)
+            )
+        self.attributes: Optional[Dict[str, List[Any]]] = None
+        if os.path.exists(os.path.join(path, ATTRIBUTES_FILE)):
+            with open(os.path.join(path, ATTRIBUTES_FILE)) as file:
+                self.attributes = json.load(file)
+            self.years = np.array(
+                [np.nan if y is None else y for y in self.attributes["year"]],
+                dtype=np.float32,
+            )
+            self.ratings = np.array(
+                [np.nan if r is None else r for r in self.attributes["rating"]],
+                dtype=np.float32,
+            )
+        self._bitmaps: Dict[tuple[str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def bitmap(self, field: str, value: str) -> np.ndarray:
+        """Rows whose list ``field`` (genres, languages) contains ``value``."""
+        key = (field, value)
+        if key not in self._bitmaps:
+            bitmap = np.zeros(len(self), dtype=bool)
+            rows = [
+                row
+                for row, values in enumerate(self.attributes[field])
+                if value in values
+            ]
+            bitmap[rows] = True
+            self._bitmaps[key] = bitmap
+        return self._bitmaps[key]
+
+    def filter_mask(
+        self, filters: Optional[Dict[str, typing.Any]]
+    ) -> Optional[np.ndarray]:
+        """Boolean mask of the rows matching every filter, ``None`` if unfiltered.
+
+        Supported filters are ``year_from``, ``year_to``, ``min_rating`` and the
+        any-of lists ``genres`` and ``languages``.
+
+        :raises BackendError: 503 if the snapshot was built without filter fields
+        """
+        if not filters:
+            return None
+        if self.attributes is None:
+            raise BackendError(
+                message="Filtered search needs an index rebuild, try again later",
+                code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        mask = np.ones(len(self), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if filters.get("year_from") is not None:
+                mask &= self.years >= filters["year_from"]
+            if filters.get("year_to") is not None:
+                mask &= self.years <= filters["year_to"]
+            if filters.get("min_rating") is not None:
+                mask &= self.ratings >= filters["min_rating"]
+        for field in ("genres", "languages"):
+            if filters.get(field):
+                mask &= np.logical_or.reduce(
+                    [self.bitmap(field, value) for value in filters[field]]
+                )
+        return mask
+
+    def ivf_candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids stored in the ``nprobe`` lists closest to the query."""
+        lists = top_k(self.ivf_centroids @ query, nprobe)
+        return np.sort(
+            np.concatenate(
+                [
+                    self.ivf_order[self.ivf_offsets[i] : self.ivf_offsets[i + 1]]
+                    for i in lists
+                ]
+            )
+        )
+
+    def coarse_scores(
+        self, query: np.ndarray, rows: Optional[np.ndarray], quantization: Quantization
+    ) -> np.ndarray:
+        """Approximate scores of ``rows`` (all rows if ``None``) from the codes."""
+        codes = self.codes[quantization]
+        if rows is not None:
+            codes = codes[rows]
+        if quantization == Quantization.INT8:
+            return int8_scores(codes, self.int8_scales, query)
+        return binary_scores(codes, query)
+
+    def search_rows(
+        self,
+        query_vector: List[float],
+        limit: int,
+        mode: LocalIndexMode = LocalIndexMode.EXACT,
+        nprobe: int = 8,
+        quantization: Quantization = Quantization.NONE,
+        rescore_factor: int = 4,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Row ids of the ``limit`` nearest vectors, best first, and their cosines.
+
+        With a ``mask`` only the rows it selects are scored. When the probed IVF
+        lists hold fewer than ``limit`` eligible rows, every eligible row is.
+        """
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        rows = None
+        if mode == LocalIndexMode.IVF and self.ivf_centroids is not None:
+            rows = self.ivf_candidates(query, nprobe)
+        if mask is not None:
+            rows = rows[mask[rows]] if rows is not None else None
+            if rows is None or rows.shape[0] < limit:
+                rows = np.flatnonzero(mask)
+        if quantization != Quantization.NONE and quantization in self.codes:
+            shortlist = top_k(
+                self.coarse_scores(query, rows, quantization), limit * rescore_factor
+            )
+            rows = shortlist if rows is None else rows[shortlist]
+        if rows is None:
+            scores = self.vectors @ query
+            best = top_k(scores, limit)
+            return best, scores[best]
+        rows = np.sort(rows)
+        scores = self.vectors[rows] @ query
+        best = top_k(scores, limit)
+        return rows[best], scores[best]
+
+    def search(
+        self,
+        query_vector: List[float],
+        limit: int,
+        mode: LocalIndexMode = LocalIndexMode.EXACT,
+        nprobe: int = 8,
+        quantization: Quantization = Quantization.NONE,
+        rescore_factor: int = 4,
+        filters: Optional[Dict[str, typing.Any]] = None,
+    ) -> List[Dict[str, typing.Any]]:
+        """Return the ``limit`` nearest movies with their Atlas-style cosine score.
+
+        Like ``vectorSearchScore`` the score is ``(1 + cos) / 2``.
+        """
+        rows, scores = self.search_rows(
+            query_vector,
+            limit=limit,
+            mode=mode,
+            nprobe=nprobe,
+            quantization=quantization,
+            rescore_factor=rescore_factor,
+            mask=self.filter_mask(filters),
+        )
+        return [
+            {**self.docs[row], "score": (1 + score) / 2}
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def memory_report(self) -> Dict[Quantization, int]:
+        """Bytes needed by the coarse pass of every quantization mode."""
+        report = {Quantization.NONE: self.vectors.nbytes}
+        report.update({name: codes.nbytes for name, codes in self.codes.items()})
+        return report
+
+
+def quantization_report(
+    index: LocalVectorIndex,
+    k: int = 10,
+    queries: int = 200,
+    rescore_factor: int = 4,
+    seed: int = 0,
+) -> List[Dict[str, typing.Any]]:
+    """Recall@k and memory of every quantization mode against exact search.
+
+    Stored plot vectors are used as queries, which is close to real traffic
+    since plots and queries share the embedding model.
+    """
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(index), size=min(queries, len(index)), replace=False)
+    memory = index.memory_report()
+    report = []
+    for quantization in memory:
+        recalls, latencies = [], []
+        for row in sample:
+            query = np.asarray(index.vectors[row])
+            expected = set(index.search_rows(query, limit=k)[0].tolist())
+            started = time.perf_counter()
+            found, _ = index.search_rows(
+                query, limit=k, quantization=quantization, rescore_factor=rescore_factor
+            )
+            latencies.append(time.perf_counter() - started)
+            recalls.append(len(expected.intersection(found.tolist())) / len(expected))
+        report.append(
+            {
+                "quantization": quantization.value,
+                f"recall@{k}": round(float(np.mean(recalls)), 4),
+                "coarse_bytes": memory[quantization],
+                "bytes_per_vector": memory[quantization] // max(len(index), 1),
+                "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+            }
+        )
+    return report
+
+
+class LocalIndexLoader:
+    """The snapshot at ``path``, reloaded when ``build-index`` swaps in a new one.
+
+    Every call stats the snapshot metadata through the symlink, so a swap is
+    seen on the next search, and the snapshot is loaded again when its
+    ``created_at`` changed. Snapshots built with another embedding model than
+    ``model_id()`` are refused, as their vectors cannot be compared with the
+    query's.
+    """
+
+    def __init__(self, path: str, model_id: Callable[[], str]) -> None:
+        self._path = path
+        self._model_id = model_id
+        self._index: Optional[LocalVectorIndex] = None
+        self._signature: Optional[tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> LocalVectorIndex:
+        """Return the current snapshot.
+
+        :raises BackendError: 503 if there is no snapshot or it was built with
+            another embedding model
+        """
+        try:
+            stat = os.stat(os.path.join(self._path, META_FILE))
+        except FileNotFoundError:
+            raise BackendError(
+                message="The local vector index is not built yet, try again later",
+                code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._load(signature)
+        return self._index
+
+    def _load(self, signature: tuple[int, int]) -> None:
+        path = os.path.realpath(self._path)
+        with open(os.path.join(path, META_FILE)) as file:
+            meta = json.load(file)
+        model_id = self._model_id()
+        if meta.get("model") != model_id:
+            raise BackendError(
+                message=(
+                    f"The local vector index was built with '{meta.get('model')}' "
+                    f"and needs a rebuild for '{model_id}', try again later"
+                ),
+                code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        if self._index is None or self._index.meta["created_at"] != meta["created_at"]:
+            self._index = LocalVectorIndex(path)
+            logger.info("%s - %s", path, "Local vector index loaded")
+        self._signature = signature
+
+
+local_index = LocalIndexLoader(
+    settings.LOCAL_INDEX_DIR, model_id=lambda: get_embedding_backend().model_id
+)
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Return the configured snapshot, reloaded after every rebuild."""
+    return local_index.get()
@@ -0,0 +1,130 @@
+import json
+import os
+import socket
+import threading
+import time
+import typing
+from typing import Dict, List, Optional
+from redis import Redis
+from redis.exceptions import LockError, RedisError
+from ..core.config import settings
+from ..database.connect import redis_client
+from ..middleware.logging import logger
+from .embedding_services import get_embedding_backend
+from .movies_services import count_pending_embeddings, persist_vectors_to_db
+
+
+class IngestionCancelled(Exception):
+    """Raised between batches when the ingestion job is asked to stop."""
+
+
+class IngestionJob:
+    """Vector ingestion guarded by a Redis leader lock.
+
+    Only the worker holding the lock ingests; the others return immediately.
+    The lock is refreshed after every batch and progress is published to Redis
+    so that any worker can report it.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        lock_timeout: int,
+        lock_name: str = "lock:ingestion",
+        progress_key: str = "ingestion:progress",
+    ) -> None:
+        self._redis = redis
+        self._lock_timeout = lock_timeout
+        self._lock_name = lock_name
+        self._progress_key = progress_key
+        self._stopping = threading.Event()
+
+    @property
+    def owner(self) -> str:
+        """Identify the worker running the job."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def run(
+        self,
+        batch_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        rehash: bool = False,
+    ) -> Optional[List[Optional[str]]]:
+        """Run ingestion if no other worker is; ``None`` when the lock is taken."""
+        lock = self._redis.lock(
+            self._lock_name, timeout=self._lock_timeout, blocking=False
+        )
+        if not lock.acquire(blocking=False):
+            logger.info("%s - %s", self.owner, "Ingestion already running elsewhere")
+            return None
+
+        model_id = get_embedding_backend().model_id
+        total = count_pending_embeddings(model_id, rehash=rehash, limit=limit)
+        started_at = time.time()
+        progress = {
+            "status": "running",
+            "owner": self.owner,
+            "model": model_id,
+            "started_at": started_at,
+            "total": total,
+            "scanned": 0,
+            "embedded": 0,
+            "remaining": total,
+            "docs_per_sec": 0.0,
+        }
+        self.publish(progress)
+
+        def on_batch(scanned: int, embedded: int) -> None:
+            elapsed = max(time.time() - started_at, 1e-6)
+            progress.update(
+                scanned=scanned,
+                embedded=embedded,
+                remaining=max(total - scanned, 0),
+                docs_per_sec=round(scanned / elapsed, 2),
+            )
+            self.publish(progress)
+            lock.reacquire()
+            if self._stopping.is_set():
+                raise IngestionCancelled()
+
+        try:
+            updated = persist_vectors_to_db(
+                batch_size=batch_size, limit=limit, rehash=rehash, progress=on_batch
+            )
+            progress["status"] = "completed"
+            return updated
+        except IngestionCancelled:
+            progress["status"] = "cancelled"
+            logger.info("%s - %s", self.owner, "Ingestion stopped at a checkpoint")
+            return None
+        except Exception:
+            progress["status"] = "failed"
+            logger.exception("%s - %s", self.owner, "Ingestion failed")
+            raise
+        finally:
+            progress["finished_at"] = time.time()
+            self.publish(progress)
+            try:
+                lock.release()
+            except LockError:
+                logger.error("%s - %s", self.owner, "Ingestion lock was lost")
+
+    def stop(self) -> None:
+        """Ask a running job to stop after the current batch."""
+        self._stopping.set()
+
+    def publish(self, progress: Dict[str, typing.Any]) -> None:
+        try:
+            self._redis.set(self._progress_key, json.dumps(progress))
+        except RedisError as err:
+            logger.error("%s - %s", err, "Error while storing ingestion progress")
+
+    def progress(self) -> Dict[str, typing.Any]:
+        """Return the progress of the current or last run, from any worker."""
+        data = self._redis.get(self._progress_key)
+        return json.loads(data) if data else {"status": "idle"}
+
+
+ingestion_job = IngestionJob(
+    redis=redis_client, lock_timeout=settings.INGESTION_LOCK_TIMEOUT
+)
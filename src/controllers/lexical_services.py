@@ -0,0 +1,118 @@
+import functools
+import math
+import re
+import typing
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from .index_services import LocalVectorIndex, get_local_index, top_k
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens."""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over movie titles and plots.
+
+    Title tokens are counted ``title_weight`` times so exact title and name
+    matches outrank passing mentions in a plot.
+    """
+
+    def __init__(
+        self,
+        docs: Sequence[Dict[str, typing.Any]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        title_weight: int = 3,
+    ) -> None:
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = np.zeros(len(docs), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            terms = Counter(tokenize(doc.get("plot") or ""))
+            for token in tokenize(doc.get("title") or ""):
+                terms[token] += title_weight
+            lengths[row] = sum(terms.values())
+            for token, frequency in terms.items():
+                postings[token][row] = frequency
+
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(docs) else 0.0
+        self.postings = {
+            token: (
+                np.fromiter(rows.keys(), dtype=np.int64, count=len(rows)),
+                np.fromiter(rows.values(), dtype=np.float32, count=len(rows)),
+            )
+            for token, rows in postings.items()
+        }
+        self.idf = {
+            token: math.log(1 + (len(docs) - len(rows) + 0.5) / (len(rows) + 0.5))
+            for token, rows in postings.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for ``query``."""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            rows, frequencies = self.postings[token]
+            norm = self.k1 * (
+                1 - self.b + self.b * self.lengths[rows] / self.average_length
+            )
+            scores[rows] += (
+                self.idf[token] * frequencies * (self.k1 + 1) / (frequencies + norm)
+            )
+        return scores
+
+    def search(
+        self, query: str, limit: int, mask: Optional[np.ndarray] = None
+    ) -> List[Dict[str, typing.Any]]:
+        """Return the ``limit`` best matching movies with their BM25 score.
+
+        Rows left out of ``mask`` are never returned.
+        """
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        return [
+            {**self.docs[row], "score": float(scores[row])}
+            for row in top_k(scores, limit).tolist()
+            if scores[row] > 0
+        ]
+
+
+@functools.lru_cache(maxsize=1)
+def bm25_index_for(index: LocalVectorIndex) -> BM25Index:
+    """Build the BM25 index over a snapshot, once per snapshot."""
+    return BM25Index(index.docs)
+
+
+def get_bm25_index() -> BM25Index:
+    """Return the BM25 index over the current local snapshot."""
+    return bm25_index_for(get_local_index())
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Dict[str, typing.Any]]], limit: int, k: int = 60
+) -> List[Dict[str, typing.Any]]:
+    """Merge ranked hit lists by summing ``1 / (k + rank)`` per movie.
+
+    Examples:
+        >>> reciprocal_rank_fusion([[{"_id": "a"}], [{"_id": "b"}, {"_id": "a"}]], 1)
+        [{'_id': 'a', 'score': 0.03252247488101534}]
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    hits: Dict[str, Dict[str, typing.Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            fused[hit["_id"]] += 1 / (k + rank)
+            hits.setdefault(hit["_id"], hit)
+    best = sorted(fused, key=fused.__getitem__, reverse=True)[:limit]
+    return [{**hits[movie_id], "score": fused[movie_id]} for movie_id in best]
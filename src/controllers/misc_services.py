@@ -1,15 +1,20 @@
 import abc
+import asyncio
 import functools
 import typing
 import zoneinfo
 import pendulum
 from fastapi import Depends, Request, Response
-from ..core.enums import RatePeriod
+from ..core.config import settings
+from ..core.enums import RateLimitMode, RatePeriod
 from redis import Redis
-from ..database.connect import redis_client
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import NoScriptError
+from ..database.connect import async_redis_client, redis_client
 from datetime import datetime, timedelta
 from ..core.exceptions import BackendError
 from fastapi import status as http_status
+from .cache_services import TTLCache
 
 # This Sliding Window functionality was referred from this link.
 # Link: https://github.com/Kostiantyn-Salnykov/fastapi_quickstart/blob/main/apps/CORE/deps/limiters.py
@@ -103,6 +108,7 @@ class BaseRedisRateLimiter(abc.ABC):
         request: Request,
         response: Response,
         redis_client: Redis = Depends(redis_client),
+        cost: int = 1,
     ) -> None:
         raise NotImplementedError
 
@@ -180,13 +186,14 @@ class SlidingWindowRateLimiter(BaseRedisRateLimiter):
         self,
         request: Request,
         response: Response,
+        cost: int = 1,
     ) -> None:
+        """Count ``cost`` requests against the quota (batches weigh more than 1)."""
         now = self.now()
         key = self.key(request=request, now=now)
-        print(key)
         # === Redis logic starts ===
-        count = int(redis_client.get(name=key) or 0)
-        if int(count) >= self.rate.number:
+        count = int(await async_redis_client.get(name=key) or 0)
+        if int(count) + cost - 1 >= self.rate.number:
             rate_limit_headers = self.get_and_update_headers(
                 request=request, response=response, hits=count
             )
@@ -197,7 +204,7 @@ class SlidingWindowRateLimiter(BaseRedisRateLimiter):
             )
 
         prev_key = self.key(request=request, now=now, previous=True)
-        prev_count = int(redis_client.get(name=prev_key) or 0)
+        prev_count = int(await async_redis_client.get(name=prev_key) or 0)
         prev_percentage = (now.timestamp() % self.rate.seconds) / self.rate.seconds
         weight_count = prev_count * (1 - prev_percentage) + count
 
@@ -207,7 +214,7 @@ class SlidingWindowRateLimiter(BaseRedisRateLimiter):
             hits=count,
             weight_count=weight_count,
         )
-        if weight_count >= self.rate.number:
+        if weight_count + cost - 1 >= self.rate.number:
             raise BackendError(
                 message=f"Request limit exceeded for this quota, overloaded {weight_count:0.3f}/{self.rate.number} for the latest window ({self.rate.window_period}).",
                 headers=rate_limit_headers,
@@ -218,10 +225,10 @@ class SlidingWindowRateLimiter(BaseRedisRateLimiter):
             self.current_window_start(now=now)
             + timedelta(seconds=self.rate.seconds * 2)
         ) - now
-        pipe = redis_client.pipeline(transaction=False)
-        pipe.incr(name=key)
+        pipe = async_redis_client.pipeline(transaction=False)
+        pipe.incr(name=key, amount=cost)
         pipe.expire(name=key, time=expiration.seconds)
-        pipe.execute()
+        await pipe.execute()
         return rate_limit_headers
         # === Redis Logic ends ===
 
@@ -256,3 +263,287 @@ class SlidingWindowRateLimiter(BaseRedisRateLimiter):
         response.headers.update(result_headers)
         # print(response.headers)
         return result_headers
+
+
+SLIDING_WINDOW_SCRIPT = """
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local weight = previous * tonumber(ARGV[3]) + count
+if count + cost - 1 >= limit then
+    return {0, count, tostring(weight), redis.call('TTL', KEYS[1])}
+end
+if weight + cost - 1 >= limit then
+    return {-1, count, tostring(weight), redis.call('TTL', KEYS[1])}
+end
+count = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, count, tostring(weight), tonumber(ARGV[4])}
+"""
+
+
+class LuaScript:
+    """Server-side script loaded once with SCRIPT LOAD and run with EVALSHA.
+
+    The script is loaded again if Redis lost it (restart, SCRIPT FLUSH).
+    """
+
+    def __init__(self, source: str) -> None:
+        self._source = source
+        self._sha: str | None = None
+
+    async def __call__(
+        self, redis: AsyncRedis, keys: list[str], args: list[typing.Any]
+    ) -> typing.Any:
+        if self._sha is None:
+            self._sha = await redis.script_load(self._source)
+        try:
+            return await redis.evalsha(self._sha, len(keys), *keys, *args)
+        except NoScriptError:
+            self._sha = await redis.script_load(self._source)
+            return await redis.evalsha(self._sha, len(keys), *keys, *args)
+
+
+class LuaSlidingWindowRateLimiter(SlidingWindowRateLimiter):
+    """Sliding window computed atomically by a server-side Lua script.
+
+    Reading both windows, checking the quota and incrementing happen in a
+    single EVALSHA round trip, so concurrent workers cannot overshoot the
+    quota between the check and the increment.
+    """
+
+    def __init__(
+        self,
+        rate: Rate,
+        key_prefix: str = "limiter",
+        redis: AsyncRedis = async_redis_client,
+    ) -> None:
+        super().__init__(rate=rate, key_prefix=key_prefix)
+        self._redis = redis
+        self._script = LuaScript(SLIDING_WINDOW_SCRIPT)
+
+    async def evaluate(
+        self, keys: list[str], args: list[typing.Any]
+    ) -> tuple[int, int, float, int]:
+        """Run the script, returning (decision, count, weighted count, TTL).
+
+        The decision is 1 when allowed, 0 when rejected by the current window
+        count and -1 when rejected by the weighted count.
+        """
+        decision, count, weight_count, ttl = await self._script(self._redis, keys, args)
+        return int(decision), int(count), float(weight_count), int(ttl)
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Count ``cost`` requests against the quota in one round trip."""
+        now = self.now()
+        decision, count, weight_count, _ = await self.evaluate(
+            *self.script_arguments(request=request, now=now, cost=cost)
+        )
+        return self.respond(
+            request=request,
+            response=response,
+            decision=decision,
+            hits=count - cost,
+            weight_count=weight_count,
+            count=count,
+        )
+
+    def script_arguments(
+        self, request: Request, now: pendulum.DateTime, cost: int
+    ) -> tuple[list[str], list[typing.Any]]:
+        """KEYS and ARGV of the sliding window script."""
+        prev_percentage = (now.timestamp() % self.rate.seconds) / self.rate.seconds
+        expiration = (
+            self.current_window_start(now=now)
+            + timedelta(seconds=self.rate.seconds * 2)
+        ) - now
+        keys = [
+            self.key(request=request, now=now),
+            self.key(request=request, now=now, previous=True),
+        ]
+        return keys, [self.rate.number, cost, 1 - prev_percentage, expiration.seconds]
+
+    def respond(
+        self,
+        *,
+        request: Request,
+        response: Response,
+        decision: int,
+        hits: int,
+        weight_count: float,
+        count: int,
+    ) -> dict[str, str]:
+        """Headers of an allowed request, or the 429 of a rejected one.
+
+        ``hits`` is the window count before an allowed request and ``count``
+        the one reported by the script.
+        """
+        if decision == 0:
+            raise BackendError(
+                message=f"Request limit exceeded for this quota: '{self.rate}'.",
+                headers=self.get_and_update_headers(
+                    request=request, response=response, hits=count
+                ),
+                code=http_status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+        rate_limit_headers = self.get_and_update_headers(
+            request=request,
+            response=response,
+            hits=hits if decision == 1 else count,
+            weight_count=weight_count,
+        )
+        if decision == -1:
+            raise BackendError(
+                message=f"Request limit exceeded for this quota, overloaded {weight_count:0.3f}/{self.rate.number} for the latest window ({self.rate.window_period}).",
+                headers=rate_limit_headers,
+                code=http_status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+        return rate_limit_headers
+
+
+class QuotaLease:
+    """Quota of one window leased from Redis and spent in process."""
+
+    def __init__(self, remaining: int, count: int, weight_count: float) -> None:
+        self.remaining = remaining
+        self.count = count
+        self.weight_count = weight_count
+        self.strict = False
+
+
+class HybridSlidingWindowRateLimiter(LuaSlidingWindowRateLimiter):
+    """Sliding window that leases blocks of quota instead of counting each hit.
+
+    A request without local quota runs the Lua script once for
+    ``lease_size`` requests and the rest of the block is spent in process. When
+    the client gets within one block of its limit, the limiter falls back to
+    strict mode: one script call per request, as in
+    :class:`LuaSlidingWindowRateLimiter`.
+
+    Leased quota is counted in Redis up front, so workers never admit more
+    than the limit together. Unused leases are still counted, so a client may
+    be limited up to ``lease_size - 1`` requests per worker early. A larger
+    ``lease_size`` means fewer Redis calls and a less exact limit.
+    """
+
+    def __init__(
+        self,
+        rate: Rate,
+        key_prefix: str = "limiter",
+        redis: AsyncRedis = async_redis_client,
+        lease_size: int = 10,
+        max_keys: int = 10000,
+    ) -> None:
+        super().__init__(rate=rate, key_prefix=key_prefix, redis=redis)
+        self._lease_size = lease_size
+        self._leases = TTLCache(maxsize=max_keys, ttl=rate.seconds)
+        self._locks = TTLCache(maxsize=max_keys, ttl=rate.seconds)
+        self.local_hits = 0
+        self.redis_calls = 0
+
+    def stats(self) -> dict[str, int]:
+        """Requests served from local leases and script calls made."""
+        return {"local_hits": self.local_hits, "redis_calls": self.redis_calls}
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Spend ``cost`` from the local lease, leasing a new block when needed."""
+        now = self.now()
+        key = self.key(request=request, now=now)
+        if (headers := self.spend(key, request, response, cost)) is not None:
+            return headers
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks.set(key, lock)
+        async with lock:
+            # another request may have leased while this one waited
+            if (headers := self.spend(key, request, response, cost)) is not None:
+                return headers
+            lease = self._leases.get(key)
+            strict = lease is not None and lease.strict
+            size = cost if strict else max(cost, self._lease_size)
+            result = await self.lease(request, now, size)
+            if result[0] != 1 and size > cost:
+                strict = True
+                size = cost
+                result = await self.lease(request, now, size)
+            decision, count, weight_count, _ = result
+            if decision == 1:
+                lease = QuotaLease(
+                    remaining=size - cost,
+                    count=count - size + cost,
+                    weight_count=weight_count + cost,
+                )
+                lease.strict = (
+                    strict
+                    or self.rate.number - (weight_count + size) < self._lease_size
+                )
+            else:
+                # over the limit: stay strict until the window rolls over
+                lease = QuotaLease(remaining=0, count=count, weight_count=weight_count)
+                lease.strict = True
+            self._leases.set(key, lease)
+        return self.respond(
+            request=request,
+            response=response,
+            decision=decision,
+            hits=count - size,
+            weight_count=weight_count,
+            count=count,
+        )
+
+    def spend(
+        self, key: str, request: Request, response: Response, cost: int
+    ) -> dict[str, str] | None:
+        """Serve the request from the local lease, ``None`` if it cannot."""
+        lease = self._leases.get(key)
+        if lease is None or lease.remaining < cost:
+            return None
+        lease.remaining -= cost
+        self.local_hits += 1
+        headers = self.get_and_update_headers(
+            request=request,
+            response=response,
+            hits=lease.count,
+            weight_count=lease.weight_count,
+        )
+        lease.count += cost
+        lease.weight_count += cost
+        return headers
+
+    async def lease(
+        self, request: Request, now: pendulum.DateTime, size: int
+    ) -> tuple[int, int, float, int]:
+        """Count ``size`` requests in Redis at once."""
+        self.redis_calls += 1
+        return await self.evaluate(
+            *self.script_arguments(request=request, now=now, cost=size)
+        )
+
+
+def build_rate_limiter(rate: Rate) -> LuaSlidingWindowRateLimiter:
+    """Limiter for ``rate`` in the configured ``RATE_LIMIT_MODE``."""
+    match settings.RATE_LIMIT_MODE:
+        case RateLimitMode.HYBRID:
+            return HybridSlidingWindowRateLimiter(
+                rate=rate,
+                lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+                max_keys=settings.RATE_LIMIT_LOCAL_KEYS,
+            )
+        case RateLimitMode.STRICT:
+            return LuaSlidingWindowRateLimiter(rate=rate)
+
+
+default_rate_limiter = build_rate_limiter(Rate(number=60, period=RatePeriod.MINUTE))
@@ -1,54 +1,660 @@
-from ..database.connect import client
+from ..database.connect import async_client, client
+from .embedding_services import get_embedding_backend
+from .cache_services import (
+    SearchResult,
+    embedding_cache,
+    index_version,
+    normalize_query,
+    result_cache,
+)
+from .index_services import get_local_index
+from .lexical_services import get_bm25_index, reciprocal_rank_fusion
+from .rerank_services import get_reranker, rerank_hits
 from ..core.config import settings
-import requests
-from typing import List, Dict, Union, Optional
-from bson.json_util import dumps
-import json
+from ..core.enums import SearchMode, VectorSearchEngine
+from ..core.exceptions import BackendError
+from starlette.concurrency import run_in_threadpool
+from ..middleware.logging import logger
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+from bson import ObjectId
+from pymongo import UpdateOne
+import asyncio
+import base64
+import hashlib
+import itertools
+import numpy as np
+import orjson
 
 db = client.sample_mflix
 collection = db.movies
+async_collection = async_client.sample_mflix.movies
+checkpoints = db.ingestion_checkpoints
 
-embedding_url = "https://api-inference.huggingface.co/pipeline/feature-extraction/sentence-transformers/all-MiniLM-L6-v2"
+CHECKPOINT_ID = "plot_embedding_hf"
+SEARCH_LIMIT = 4
+SEARCH_NUM_CANDIDATES = 100
+# upper bound of numCandidates and limit in Atlas $vectorSearch
+MAX_NUM_CANDIDATES = 10000
+STREAM_BATCH_SIZE = 16
+MOVIE_PROJECTION = {
+    "_id": 1,
+    "title": 1,
+    "plot": 1,
+    "score": {"$meta": "vectorSearchScore"},
+}
 
 
 def generate_embedding(text: str) -> List[float]:
-    response = requests.post(
-        embedding_url,
-        headers={"Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}"},
-        json={"inputs": text},
+    return get_embedding_backend().embed_one(text)
+
+
+def batched(iterable: Iterator[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most ``size`` items."""
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def plot_hash(plot: str) -> str:
+    """Digest of the plot text an embedding was computed from."""
+    return hashlib.sha256(plot.encode()).hexdigest()
+
+
+def needs_embedding(doc: Dict[str, Any], model_id: str) -> bool:
+    """Whether a document has no vector, or one for another text or model."""
+    return (
+        not doc.get("plot_embedding_hf")
+        or doc.get("plot_embedding_model") != model_id
+        or doc.get("plot_embedding_hash") != plot_hash(doc["plot"])
+    )
+
+
+def stale_embeddings_filter(model_id: str, rehash: bool) -> Dict[str, Any]:
+    """Select documents whose embedding is missing or made by another model.
+
+    With ``rehash`` every plot is selected, so edited plots are found by
+    comparing their digest with ``plot_embedding_hash``.
+    """
+    query: Dict[str, Any] = {"plot": {"$exists": True}}
+    if not rehash:
+        query["$or"] = [
+            {"plot_embedding_hf": {"$exists": False}},
+            {"plot_embedding_hash": {"$exists": False}},
+            {"plot_embedding_model": {"$ne": model_id}},
+        ]
+    return query
+
+
+def pending_embeddings_filter(model_id: str, rehash: bool) -> Dict[str, Any]:
+    """:func:`stale_embeddings_filter` from the saved checkpoint onwards."""
+    query = stale_embeddings_filter(model_id=model_id, rehash=rehash)
+    checkpoint = checkpoints.find_one(
+        {"_id": CHECKPOINT_ID, "model": model_id, "rehash": rehash}
     )
+    if checkpoint:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+    return query
+
+
+def count_pending_embeddings(
+    model_id: str, rehash: bool = False, limit: Optional[int] = None
+) -> int:
+    """Number of documents the next :func:`persist_vectors_to_db` call scans.
+
+    :param model_id: id of the embedding model
+    :type model_id: str
+    :param rehash: as for :func:`persist_vectors_to_db`
+    :type rehash: bool
+    :param limit: as for :func:`persist_vectors_to_db`
+    :type limit: Optional[int]
+    :return: documents left after the checkpoint, at most ``limit``
+    :rtype: int
+    """
+    limit = settings.INGESTION_LIMIT if limit is None else limit
+    query = pending_embeddings_filter(model_id=model_id, rehash=rehash)
+    if limit:
+        return collection.count_documents(query, limit=limit)
+    return collection.count_documents(query)
+
+
+def persist_vectors_to_db(
+    batch_size: Optional[int] = None,
+    limit: Optional[int] = None,
+    rehash: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Optional[str]]:
+    """Embed missing or stale movie plots and store them in ``plot_embedding_hf``.
+
+    Documents are scanned in ``_id`` order and the last ``_id`` of every
+    written batch is saved as a checkpoint, so an interrupted run resumes
+    where it stopped. Next to the vector the plot digest and the model id are
+    stored, which makes a run over unchanged data a no-op.
+
+    :param batch_size: number of plots per embedding call and bulk write
+    :type batch_size: Optional[int]
+    :param limit: maximum number of documents to scan, ``0`` for all of them
+    :type limit: Optional[int]
+    :param rehash: compare plot digests of every document, not only stale ones
+    :type rehash: bool
+    :param progress: called after every batch with the scanned and embedded counts
+    :type progress: Optional[Callable[[int, int], None]]
+    :return: ids of the documents which got a new embedding
+    :rtype: List[Optional[str]]
+    """
+    batch_size = batch_size or settings.INGESTION_BATCH_SIZE
+    limit = settings.INGESTION_LIMIT if limit is None else limit
+    backend = get_embedding_backend()
+
+    query = pending_embeddings_filter(model_id=backend.model_id, rehash=rehash)
+    if "_id" in query:
+        logger.info("%s - %s", query["_id"]["$gt"], "Resuming ingestion after")
+
+    cursor = collection.find(
+        query,
+        projection={
+            "plot": 1,
+            "plot_embedding_hash": 1,
+            "plot_embedding_model": 1,
+            "plot_embedding_hf": {"$slice": 1},
+        },
+        sort=[("_id", 1)],
+        batch_size=batch_size,
+    ).limit(limit)
+    scanned = 0
+    updated = []
+    for batch in batched(cursor, batch_size):
+        scanned += len(batch)
+        stale = [doc for doc in batch if needs_embedding(doc, backend.model_id)]
+        if stale:
+            embeddings = backend.embed([doc["plot"] for doc in stale])
+            collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"]},
+                        {
+                            "$set": {
+                                "plot_embedding_hf": vector,
+                                "plot_embedding_hash": plot_hash(doc["plot"]),
+                                "plot_embedding_model": backend.model_id,
+                            }
+                        },
+                    )
+                    for doc, vector in zip(stale, embeddings)
+                ],
+                ordered=False,
+            )
+            updated.extend(str(doc["_id"]) for doc in stale)
+            index_version.bump()
+        checkpoints.update_one(
+            {"_id": CHECKPOINT_ID},
+            {
+                "$set": {
+                    "last_id": batch[-1]["_id"],
+                    "model": backend.model_id,
+                    "rehash": rehash,
+                }
+            },
+            upsert=True,
+        )
+        logger.info("%s/%s - %s", len(updated), scanned, "Documents embedded/scanned")
+        if progress:
+            progress(scanned, len(updated))
+
+    if not limit or scanned < limit:
+        checkpoints.delete_one({"_id": CHECKPOINT_ID})
+    return updated
+
+
+def embed_query(query: str) -> List[float]:
+    """Embed a search query through the two-tier embedding cache."""
+    return embedding_cache.embed([query], get_embedding_backend())[0]
+
 
-    if response.status_code != 200:
-        raise ValueError(
-            f"Request failed with status code {response.status_code}: {response.text}"
+async def embed_query_async(query: str) -> List[float]:
+    """Async counterpart of :func:`embed_query`."""
+    return (await embedding_cache.aembed([query], get_embedding_backend()))[0]
+
+
+def encode_cursor(query: str, offset: int) -> str:
+    """Opaque pagination cursor pointing at ``offset`` for this query."""
+    data = orjson.dumps({"q": query_digest(query), "o": offset})
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(
+    query: str, cursor: Optional[str], num_candidates: int = SEARCH_NUM_CANDIDATES
+) -> int:
+    """Offset stored in a cursor from :func:`encode_cursor`, 0 without one.
+
+    Cursors are not signed, so the offset must point inside the
+    ``num_candidates`` neighbours: a forged one cannot make the search rank
+    more than that.
+    """
+    if not cursor:
+        return 0
+    try:
+        data = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset = int(data["o"])
+        valid = data["q"] == query_digest(query) and 0 <= offset < min(
+            num_candidates, MAX_NUM_CANDIDATES
         )
+    except (ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise BackendError(message="Invalid pagination cursor for this query.")
+    return offset
+
 
-    return response.json()
+def query_digest(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode()).hexdigest()[:16]
 
 
-def persist_vectors_to_db() -> List[Optional[str]]:
-    for doc in collection.find({"plot": {"$exists": True}}).limit(50):
-        doc["plot_embedding_hf"] = generate_embedding(doc["plot"])
-        collection.replace_one({"_id": doc["_id"]}, doc)
-    return []
+def vector_search_filter(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Compile search filters to a ``$vectorSearch`` pre-filter.
 
+    Every field must be indexed with the ``filter`` type, see
+    ``src/database/search_indexes.py``.
 
-def perform_vector_search(query: str) -> List[Dict[str, Union[float, int, str]]]:
+    Examples:
+        >>> vector_search_filter({"year_from": 1990, "genres": ["Drama"]})
+        {'$and': [{'year': {'$gte': 1990}}, {'genres': {'$in': ['Drama']}}]}
+    """
+    clauses = []
+    filters = filters or {}
+    if filters.get("year_from") is not None:
+        clauses.append({"year": {"$gte": filters["year_from"]}})
+    if filters.get("year_to") is not None:
+        clauses.append({"year": {"$lte": filters["year_to"]}})
+    if filters.get("min_rating") is not None:
+        clauses.append({"imdb.rating": {"$gte": filters["min_rating"]}})
+    for field in ("genres", "languages"):
+        if filters.get(field):
+            clauses.append({field: {"$in": list(filters[field])}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def vector_search_pipeline(
+    query_vector: List[float],
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Aggregation pipeline running ``$vectorSearch`` on the plot embeddings.
+
+    Pages are served by asking Atlas for ``offset + limit`` hits and skipping
+    the first ``offset`` of them. Filters are applied before the approximate
+    search, so every candidate is an eligible movie.
+    """
+    stage: Dict[str, Any] = {
+        "queryVector": query_vector,
+        "path": "plot_embedding_hf",
+        "numCandidates": max(num_candidates, offset + limit),
+        "limit": offset + limit,
+        "index": settings.ATLAS_VECTOR_INDEX,
+    }
+    pre_filter = vector_search_filter(filters)
+    if pre_filter is not None:
+        stage["filter"] = pre_filter
+    pipeline: List[Dict[str, Any]] = [{"$vectorSearch": stage}]
+    if offset:
+        pipeline.append({"$skip": offset})
+    pipeline.append({"$project": MOVIE_PROJECTION})
+    return pipeline
+
+
+def to_movie(doc: Dict[str, Any]) -> Dict[str, Union[float, str]]:
+    """Turn a projected search hit into a JSON-ready ``Movie`` dict."""
+    doc["_id"] = str(doc["_id"])
+    return doc
+
+
+def local_vector_search(
+    query_vector: List[float],
+    limit: int = SEARCH_LIMIT,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Union[float, int, str]]]:
+    """Same contract as the Atlas search, served from the local index snapshot."""
+    return get_local_index().search(
+        query_vector,
+        limit=offset + limit,
+        mode=settings.LOCAL_INDEX_MODE,
+        nprobe=settings.LOCAL_INDEX_NPROBE,
+        quantization=settings.LOCAL_INDEX_QUANTIZATION,
+        rescore_factor=settings.LOCAL_INDEX_RESCORE_FACTOR,
+        filters=filters,
+    )[offset:]
+
+
+def perform_vector_search(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Union[float, int, str]]]:
+    query_vector = embed_query(query)
+    if settings.VECTOR_SEARCH_ENGINE == VectorSearchEngine.LOCAL:
+        return local_vector_search(
+            query_vector, limit=limit, offset=offset, filters=filters
+        )
     cursor_results = collection.aggregate(
-        [
+        vector_search_pipeline(query_vector, limit, num_candidates, offset, filters)
+    )
+    return [to_movie(doc) for doc in cursor_results]
+
+
+async def iter_vector_search(
+    query_vector: List[float],
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[Dict[str, Union[float, int, str]]]:
+    """Yield hits as they come off the aggregation cursor."""
+    if settings.VECTOR_SEARCH_ENGINE == VectorSearchEngine.LOCAL:
+        hits = await run_in_threadpool(
+            local_vector_search,
+            query_vector,
+            limit=limit,
+            offset=offset,
+            filters=filters,
+        )
+        for hit in hits:
+            yield hit
+        return
+    cursor = async_collection.aggregate(
+        vector_search_pipeline(query_vector, limit, num_candidates, offset, filters),
+        batchSize=min(limit, STREAM_BATCH_SIZE),
+    )
+    async for doc in cursor:
+        yield to_movie(doc)
+
+
+async def perform_vector_search_async(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Union[float, int, str]]]:
+    """Non-blocking :func:`perform_vector_search` on async HTTP and Mongo clients."""
+    query_vector = await embed_query_async(query)
+    hits = iter_vector_search(query_vector, limit, num_candidates, offset, filters)
+    return [hit async for hit in hits]
+
+
+def text_search_filter(filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Compile search filters to ``$search`` compound ``filter`` clauses."""
+    clauses: List[Dict[str, Any]] = []
+    filters = filters or {}
+    years = {
+        bound: filters[key]
+        for bound, key in (("gte", "year_from"), ("lte", "year_to"))
+        if filters.get(key) is not None
+    }
+    if years:
+        clauses.append({"range": {"path": "year", **years}})
+    if filters.get("min_rating") is not None:
+        clauses.append({"range": {"path": "imdb.rating", "gte": filters["min_rating"]}})
+    for field in ("genres", "languages"):
+        if filters.get(field):
+            clauses.append({"in": {"path": field, "value": list(filters[field])}})
+    return clauses
+
+
+def text_search_pipeline(
+    query: str, limit: int, filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Aggregation pipeline running an Atlas ``$search`` over titles and plots."""
+    compound: Dict[str, Any] = {
+        "should": [
             {
-                "$vectorSearch": {
-                    "queryVector": generate_embedding(query),
-                    "path": "plot_embedding_hf",
-                    "numCandidates": 100,
-                    "limit": 4,
-                    "index": "PlotSemanticSearch",
+                "text": {
+                    "query": query,
+                    "path": "title",
+                    "score": {"boost": {"value": 3}},
                 }
             },
-            {"$project": {"title": 1, "plot": 1}},
+            {"text": {"query": query, "path": "plot"}},
         ]
+    }
+    clauses = text_search_filter(filters)
+    if clauses:
+        compound.update(filter=clauses, minimumShouldMatch=1)
+    return [
+        {"$search": {"index": settings.ATLAS_SEARCH_INDEX, "compound": compound}},
+        {"$limit": limit},
+        {"$project": {**MOVIE_PROJECTION, "score": {"$meta": "searchScore"}}},
+    ]
+
+
+async def lexical_search(
+    query: str, limit: int, filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Keyword search: Atlas ``$search``, or BM25 over the local snapshot."""
+    if settings.VECTOR_SEARCH_ENGINE == VectorSearchEngine.LOCAL:
+        mask = get_local_index().filter_mask(filters)
+        return await run_in_threadpool(get_bm25_index().search, query, limit, mask)
+    cursor = async_collection.aggregate(text_search_pipeline(query, limit, filters))
+    return [to_movie(doc) async for doc in cursor]
+
+
+async def hybrid_search(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Keyword and vector search run concurrently, merged with RRF.
+
+    Both branches go ``HYBRID_BRANCH_LIMIT`` deep (or the page depth if
+    larger), so latency is that of the slower branch.
+    """
+    depth = max(offset + limit, settings.HYBRID_BRANCH_LIMIT)
+    vector_hits, lexical_hits = await asyncio.gather(
+        perform_vector_search_async(
+            query, depth, max(num_candidates, depth), filters=filters
+        ),
+        lexical_search(query, depth, filters),
+    )
+    fused = reciprocal_rank_fusion(
+        [vector_hits, lexical_hits], limit=offset + limit, k=settings.RRF_K
+    )
+    return fused[offset:]
+
+
+async def perform_search_async(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    mode: SearchMode = SearchMode.VECTOR,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Run the retrievers of ``mode``."""
+    if mode == SearchMode.HYBRID:
+        return await hybrid_search(query, limit, num_candidates, offset, filters)
+    return await perform_vector_search_async(
+        query, limit, num_candidates, offset, filters
     )
-    return json.loads(dumps(cursor_results))
+
+
+async def candidate_vectors(hits: List[Dict[str, Any]], dim: int) -> np.ndarray:
+    """Full-precision plot vectors of ``hits``, zeros where one is missing.
+
+    Keyword-only hits of a hybrid search may have no embedding yet.
+    """
+    vectors = np.zeros((len(hits), dim), dtype=np.float32)
+    if settings.VECTOR_SEARCH_ENGINE == VectorSearchEngine.LOCAL:
+        index = get_local_index()
+        for position, hit in enumerate(hits):
+            row = index.rows.get(hit["_id"])
+            if row is not None:
+                vectors[position] = index.vectors[row]
+        return vectors
+    cursor = async_collection.find(
+        {"_id": {"$in": [ObjectId(hit["_id"]) for hit in hits]}},
+        {"plot_embedding_hf": 1},
+    )
+    found = {str(doc["_id"]): doc.get("plot_embedding_hf") async for doc in cursor}
+    for position, hit in enumerate(hits):
+        if len(found.get(hit["_id"]) or ()) == dim:
+            vectors[position] = found[hit["_id"]]
+    return vectors
+
+
+async def reranked_search(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    mode: SearchMode = SearchMode.VECTOR,
+    timings: Optional[Dict[str, Any]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """First-stage search ``RERANK_TOP_N`` deep, reordered by the reranker.
+
+    Reranking gets ``RERANK_BUDGET_MS``; past that the first-stage order is
+    served. The time spent and the outcome are written to ``timings``.
+    """
+    depth = max(offset + limit, settings.RERANK_TOP_N)
+    hits = await perform_search_async(
+        query, depth, max(num_candidates, depth), 0, mode, filters
+    )
+
+    async def load_vectors(hits: List[Dict[str, Any]]) -> tuple:
+        # Served from the embedding cache: the first stage just embedded it.
+        query_vector = np.asarray(await embed_query_async(query), dtype=np.float32)
+        return query_vector, await candidate_vectors(hits, query_vector.shape[0])
+
+    hits, report = await rerank_hits(
+        get_reranker(), query, hits, settings.RERANK_BUDGET_MS, load_vectors
+    )
+    if timings is not None:
+        timings.update(report)
+    return hits[offset : offset + limit]
+
+
+async def search_movies(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    mode: SearchMode = SearchMode.VECTOR,
+    rerank: bool = False,
+    timings: Optional[Dict[str, Any]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> SearchResult:
+    """Search served as JSON bytes through the versioned result cache.
+
+    Hits are serialized once with orjson, and cached bodies are returned as
+    they are stored, along with the number of hits so callers never parse
+    them back. ``timings`` is only filled when the search actually ran.
+    """
+
+    async def search() -> SearchResult:
+        if rerank:
+            hits = await reranked_search(
+                query, limit, num_candidates, offset, mode, timings, filters
+            )
+        else:
+            hits = await perform_search_async(
+                query, limit, num_candidates, offset, mode, filters
+            )
+        return orjson.dumps(hits), len(hits)
+
+    if not settings.RESULT_CACHE_ENABLED:
+        return await search()
+    params = {
+        "limit": limit,
+        "num_candidates": num_candidates,
+        "offset": offset,
+        "mode": mode.value,
+        "rerank": settings.RERANK_BACKEND.value if rerank else None,
+        "filters": filters or None,
+        "engine": settings.VECTOR_SEARCH_ENGINE.value,
+    }
+    return await result_cache.get_or_search(query, params, search)
+
+
+async def search_movies_batch(
+    queries: List[str],
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+) -> bytes:
+    """Search many queries with one embedding call and a bounded fan-out.
+
+    :param queries: queries to search, duplicates are searched once
+    :type queries: List[str]
+    :return: JSON object mapping every query to its hits
+    :rtype: bytes
+    """
+    unique = list(dict.fromkeys(queries))
+    vectors = await embedding_cache.aembed(unique, get_embedding_backend())
+    semaphore = asyncio.Semaphore(settings.BATCH_SEARCH_CONCURRENCY)
+
+    async def search(query_vector: List[float]) -> List[Dict[str, Any]]:
+        async with semaphore:
+            hits = iter_vector_search(query_vector, limit, num_candidates)
+            return [hit async for hit in hits]
+
+    results = await asyncio.gather(*(search(vector) for vector in vectors))
+    return orjson.dumps(dict(zip(unique, results)))
+
+
+async def stream_movies(
+    query: str,
+    limit: int = SEARCH_LIMIT,
+    num_candidates: int = SEARCH_NUM_CANDIDATES,
+    offset: int = 0,
+    mode: SearchMode = SearchMode.VECTOR,
+    rerank: bool = False,
+    timings: Optional[Dict[str, Any]] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[bytes]:
+    """Embed the query, then return an iterator of NDJSON lines, one per hit.
+
+    Embedding happens before the iterator is returned so that its failures
+    surface as a normal error response rather than a truncated stream.
+    Hybrid and reranked results only exist once every candidate is scored, so
+    they are streamed at once.
+    """
+    if rerank or mode == SearchMode.HYBRID:
+        if rerank:
+            ranked = await reranked_search(
+                query, limit, num_candidates, offset, mode, timings, filters
+            )
+        else:
+            ranked = await hybrid_search(query, limit, num_candidates, offset, filters)
+
+        async def ranked_lines() -> AsyncIterator[bytes]:
+            for hit in ranked:
+                yield orjson.dumps(hit) + b"\n"
+
+        return ranked_lines()
+
+    query_vector = await embed_query_async(query)
+
+    async def lines() -> AsyncIterator[bytes]:
+        hits = iter_vector_search(query_vector, limit, num_candidates, offset, filters)
+        async for hit in hits:
+            yield orjson.dumps(hit) + b"\n"
+
+    return lines()
 
 
 # for document in results:
@@ -0,0 +1,462 @@
+import abc
+import asyncio
+import typing
+from fastapi import Request, Response
+from fastapi import status as http_status
+from redis.asyncio import Redis as AsyncRedis
+from ..core.config import settings
+from ..core.enums import RateLimitAlgorithm, RateLimitMode, RateLimitScope, RatePeriod
+from ..core.exceptions import BackendError
+from ..database.connect import async_redis_client
+from .cache_services import TTLCache
+from .misc_services import (
+    BaseRedisRateLimiter,
+    LuaScript,
+    Rate,
+    default_rate_limiter,
+)
+
+# Both scripts read the clock from Redis, so every worker agrees on it, and
+# work in integer microseconds since the epoch (exact in a Lua double).
+# They return {allowed, remaining, retry after, reset after}, times in µs.
+
+GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - interval * burst
+if allow_at > now then
+    return {0, 0, allow_at - now, tat - now}
+end
+local reset = new_tat - now
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', math.ceil(reset / 1000))
+return {1, math.floor((now - allow_at) / interval), 0, reset}
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+local refilled = math.floor((now - ts) / interval)
+tokens = tokens + refilled
+ts = ts + refilled * interval
+if tokens >= burst then
+    tokens = burst
+    ts = now
+end
+local reset = (burst - tokens) * interval - (now - ts)
+if tokens < cost then
+    return {0, tokens, (cost - tokens) * interval - (now - ts), reset}
+end
+tokens = tokens - cost
+reset = reset + cost * interval
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', string.format('%d', ts))
+redis.call('PEXPIRE', KEYS[1], math.ceil(reset / 1000))
+return {1, tokens, 0, reset}
+"""
+
+
+def client_ip(request: Request) -> str:
+    """Client IP, as forwarded by the proxy when there is one."""
+    return request.headers.get("X-Real-IP") or request.client.host
+
+
+def ip_identity(request: Request) -> str:
+    return "ip:" + client_ip(request)
+
+
+def user_identity(request: Request) -> str:
+    """User verified by the auth dependency, or the client IP without one.
+
+    Only set once the token is verified (session email or JWT ``sub``), so
+    made-up tokens and new logins never get a fresh quota.
+    """
+    user = getattr(request.state, "user", None)
+    return f"user:{user}" if user else ip_identity(request)
+
+
+IDENTITIES: dict[RateLimitScope, typing.Callable[[Request], str]] = {
+    RateLimitScope.IP: ip_identity,
+    RateLimitScope.USER: user_identity,
+}
+
+
+class RateLimitPolicy:
+    """Rate, burst and algorithm of a limit, and who it counts requests for.
+
+    Examples:
+        >>> policy = RateLimitPolicy("search", Rate(60, RatePeriod.MINUTE), burst=20)
+        >>> policy.interval, policy.burst, policy.algorithm.value
+        (1000000, 20, 'gcra')
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: Rate,
+        burst: int | None = None,
+        algorithm: RateLimitAlgorithm = RateLimitAlgorithm.GCRA,
+        scope: RateLimitScope = RateLimitScope.IP,
+    ) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst or rate.number
+        self.algorithm = algorithm
+        self.scope = scope
+        # one request is allowed every ``interval`` microseconds
+        self.interval = rate.seconds * 1_000_000 // rate.number
+
+    def __str__(self) -> str:
+        return f"{self.rate}, burst {self.burst}"
+
+    def __repr__(self) -> str:
+        return (
+            f'{self.__class__.__name__}(name="{self.name}", rate={self.rate}, '
+            f'burst={self.burst}, algorithm="{self.algorithm.value}", '
+            f'scope="{self.scope.value}")'
+        )
+
+
+class PolicyRateLimiter(abc.ABC):
+    """Limiter applying a :class:`RateLimitPolicy` in one EVALSHA round trip.
+
+    Everything that does not depend on the request (the key prefix, the
+    script arguments and the static headers) is computed once, so a request
+    costs an identity lookup, a string concatenation and the round trip.
+    """
+
+    script: str
+
+    def __init__(
+        self,
+        policy: RateLimitPolicy,
+        key_prefix: str = "limiter",
+        redis: AsyncRedis = async_redis_client,
+    ) -> None:
+        self._policy = policy
+        self._prefix = f"{key_prefix}:{policy.name}:"
+        self._identity = IDENTITIES[policy.scope]
+        self._redis = redis
+        self._script = LuaScript(self.script)
+        self._headers = {
+            "RateLimit-Limit": str(policy.rate.number),
+            "RateLimit-Policy": (
+                f"{policy.rate.number};w={policy.rate.seconds};"
+                f'burst={policy.burst};comment="{policy.algorithm.value}"'
+            ),
+        }
+
+    @property
+    def policy(self) -> RateLimitPolicy:
+        """Return the policy applied by the limiter."""
+        return self._policy
+
+    def key(self, request: Request) -> str:
+        """Redis key of the client, e.g. ``limiter:/movies:search:ip:127.0.0.1``."""
+        return self._prefix + self._identity(request)
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Count ``cost`` requests against the policy.
+
+        :raises BackendError: 429 over the quota, 400 if ``cost`` exceeds the
+            burst, as such a request could never be allowed
+        """
+        self.check_cost(cost)
+        return self.respond(response, *await self.evaluate(self.key(request), cost))
+
+    def check_cost(self, cost: int) -> None:
+        """Refuse with 400 a request costing more than the burst."""
+        if cost > self._policy.burst:
+            raise BackendError(
+                message=f"Request costs more than this quota allows: '{self._policy}'.",
+                headers=self._headers,
+            )
+
+    async def evaluate(self, key: str, cost: int) -> tuple[int, int, int, int]:
+        """Run the script for ``key``: (allowed, remaining, retry after, reset)."""
+        return await self._script(
+            self._redis,
+            [key],
+            [self._policy.interval, self._policy.burst, cost],
+        )
+
+    def respond(
+        self,
+        response: Response,
+        allowed: int,
+        remaining: int,
+        retry_after: int,
+        reset: int,
+    ) -> dict[str, str]:
+        """Headers of an allowed request, or the 429 of a rejected one."""
+        headers = self._headers | {
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(-(-reset // 1_000_000)),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(-(-retry_after // 1_000_000))
+            raise BackendError(
+                message=f"Request limit exceeded for this quota: '{self._policy}'.",
+                headers=headers,
+                code=http_status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+        response.headers.update(headers)
+        return headers
+
+
+class GCRARateLimiter(PolicyRateLimiter):
+    """Generic cell rate algorithm: one timestamp per client.
+
+    Requests are spaced ``interval`` apart on a theoretical arrival time and a
+    client may run up to ``burst`` intervals ahead of the clock.
+    """
+
+    script = GCRA_SCRIPT
+
+
+class TokenBucketRateLimiter(PolicyRateLimiter):
+    """Bucket of ``burst`` tokens refilled with one token every ``interval``."""
+
+    script = TOKEN_BUCKET_SCRIPT
+
+
+class PolicyLease:
+    """Requests of a policy leased from Redis and spent in process."""
+
+    def __init__(self, remaining: int, headroom: int, reset: int) -> None:
+        self.remaining = remaining
+        # what the script left the client after the lease, and its reset
+        self.headroom = headroom
+        self.reset = reset
+
+
+class HybridPolicyRateLimiter:
+    """Policy limiter leasing blocks of requests instead of counting each hit.
+
+    The policy counterpart of
+    :class:`~src.controllers.misc_services.HybridSlidingWindowRateLimiter`,
+    with the same trade-off: a request without local quota runs the script
+    once for ``lease_size`` requests (at most the burst) and the rest of the
+    block is spent in process. Clients within one block of their limit are
+    counted one script call per request. Leased requests are counted in
+    Redis up front, so workers never admit more than the policy together,
+    but unused leases may limit a client up to ``lease_size - 1`` requests
+    per worker early.
+    """
+
+    def __init__(
+        self,
+        limiter: PolicyRateLimiter,
+        lease_size: int = 10,
+        max_keys: int = 10000,
+    ) -> None:
+        self._limiter = limiter
+        self._lease_size = min(lease_size, limiter.policy.burst)
+        self._leases = TTLCache(maxsize=max_keys, ttl=limiter.policy.rate.seconds)
+        self._locks = TTLCache(maxsize=max_keys, ttl=limiter.policy.rate.seconds)
+        self.local_hits = 0
+        self.redis_calls = 0
+
+    @property
+    def policy(self) -> RateLimitPolicy:
+        """Return the policy applied by the limiter."""
+        return self._limiter.policy
+
+    def stats(self) -> dict[str, int]:
+        """Requests served from local leases and script calls made."""
+        return {"local_hits": self.local_hits, "redis_calls": self.redis_calls}
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Spend ``cost`` from the local lease, leasing a new block when needed."""
+        self._limiter.check_cost(cost)
+        key = self._limiter.key(request)
+        if (headers := self.spend(key, response, cost)) is not None:
+            return headers
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks.set(key, lock)
+        async with lock:
+            # another request may have leased while this one waited
+            if (headers := self.spend(key, response, cost)) is not None:
+                return headers
+            lease = self._leases.get(key)
+            strict = lease is not None and lease.headroom < self._lease_size
+            size = cost if strict else max(cost, self._lease_size)
+            self.redis_calls += 1
+            result = await self._limiter.evaluate(key, size)
+            if not result[0] and size > cost:
+                size = cost
+                self.redis_calls += 1
+                result = await self._limiter.evaluate(key, size)
+            allowed, remaining, retry_after, reset = result
+            leased = size - cost if allowed else 0
+            self._leases.set(
+                key, PolicyLease(remaining=leased, headroom=remaining, reset=reset)
+            )
+        return self._limiter.respond(
+            response, allowed, remaining + leased, retry_after, reset
+        )
+
+    def spend(self, key: str, response: Response, cost: int) -> dict[str, str] | None:
+        """Serve the request from the local lease, ``None`` if it cannot."""
+        lease = self._leases.get(key)
+        if lease is None or lease.remaining < cost:
+            return None
+        lease.remaining -= cost
+        self.local_hits += 1
+        return self._limiter.respond(
+            response, 1, lease.headroom + lease.remaining, 0, lease.reset
+        )
+
+
+def build_policy_limiter(
+    policy: RateLimitPolicy, key_prefix: str = "limiter"
+) -> PolicyRateLimiter | HybridPolicyRateLimiter:
+    """Limiter running the algorithm of ``policy`` in the ``RATE_LIMIT_MODE``."""
+    match policy.algorithm:
+        case RateLimitAlgorithm.GCRA:
+            limiter = GCRARateLimiter(policy=policy, key_prefix=key_prefix)
+        case RateLimitAlgorithm.TOKEN_BUCKET:
+            limiter = TokenBucketRateLimiter(policy=policy, key_prefix=key_prefix)
+    match settings.RATE_LIMIT_MODE:
+        case RateLimitMode.HYBRID:
+            return HybridPolicyRateLimiter(
+                limiter,
+                lease_size=settings.RATE_LIMIT_LEASE_SIZE,
+                max_keys=settings.RATE_LIMIT_LOCAL_KEYS,
+            )
+        case RateLimitMode.STRICT:
+            return limiter
+
+
+Limiter = BaseRedisRateLimiter | PolicyRateLimiter | HybridPolicyRateLimiter
+
+
+class RateLimitRegistry:
+    """Limiters by route path, with a default one for the other routes.
+
+    Requests are counted twice: by IP before they reach the app (the route's
+    IP policy, or the default limiter as a floor for routes limited per
+    user), then by user with :meth:`charge_user` once the route verified the
+    token. Each route gets its own limiters, so routes sharing a policy still
+    keep separate quotas. Paths are matched exactly.
+    """
+
+    def __init__(self, default: Limiter, key_prefix: str = "limiter") -> None:
+        self._default = default
+        self._key_prefix = key_prefix
+        self._routes: dict[str, Limiter] = {}
+        self._users: dict[str, Limiter] = {}
+
+    def register(self, path: str, policy: RateLimitPolicy) -> None:
+        """Apply ``policy`` to requests for ``path``."""
+        limiter = build_policy_limiter(policy, key_prefix=f"{self._key_prefix}:{path}")
+        if policy.scope == RateLimitScope.USER:
+            self._users[path] = limiter
+        else:
+            self._routes[path] = limiter
+
+    def limiter_for(self, path: str) -> Limiter:
+        """Return the limiter counting requests for ``path`` by IP."""
+        return self._routes.get(path, self._default)
+
+    def user_limiter_for(self, path: str) -> Limiter | None:
+        """Return the limiter counting requests for ``path`` by user, if any."""
+        return self._users.get(path)
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Count ``cost`` requests by IP with the limiter of the requested route."""
+        limiter = self.limiter_for(request.scope["path"])
+        return await limiter(request=request, response=response, cost=cost)
+
+    async def charge_user(
+        self,
+        request: Request,
+        response: Response,
+        cost: int = 1,
+    ) -> dict[str, str]:
+        """Count ``cost`` requests against the per-user policy of the route.
+
+        Called after the token was verified. The headers are kept in
+        ``request.state.rate_limit_headers`` for the middleware to send.
+        """
+        limiter = self.user_limiter_for(request.scope["path"])
+        if limiter is None:
+            return {}
+        headers = await limiter(request=request, response=response, cost=cost)
+        request.state.rate_limit_headers = headers
+        return headers
+
+
+rate_limit_registry = RateLimitRegistry(default=default_rate_limiter)
+rate_limit_registry.register(
+    "/movies",
+    RateLimitPolicy(
+        "search",
+        Rate(number=60, period=RatePeriod.MINUTE),
+        burst=20,
+        scope=RateLimitScope.USER,
+    ),
+)
+# a batch costs one request per query, so the burst must fit the largest one
+rate_limit_registry.register(
+    "/movies/batch",
+    RateLimitPolicy(
+        "search",
+        Rate(number=60, period=RatePeriod.MINUTE),
+        burst=max(20, settings.BATCH_SEARCH_MAX_QUERIES),
+        scope=RateLimitScope.USER,
+    ),
+)
+rate_limit_registry.register(
+    "/movies/answer",
+    RateLimitPolicy(
+        "answer",
+        Rate(number=10, period=RatePeriod.MINUTE),
+        burst=3,
+        scope=RateLimitScope.USER,
+    ),
+)
+rate_limit_registry.register(
+    "/login",
+    RateLimitPolicy("login", Rate(number=10, period=RatePeriod.MINUTE), burst=5),
+)
+rate_limit_registry.register(
+    "/logout",
+    RateLimitPolicy(
+        "logout",
+        Rate(number=120, period=RatePeriod.MINUTE),
+        burst=30,
+        algorithm=RateLimitAlgorithm.TOKEN_BUCKET,
+        scope=RateLimitScope.USER,
+    ),
+)
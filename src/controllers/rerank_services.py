@@ -0,0 +1,154 @@
+import abc
+import asyncio
+import functools
+import os
+import time
+import typing
+from typing import Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+from ..core.config import settings
+from ..core.enums import RerankBackend
+from ..middleware.logging import logger
+from .embedding_services import LocalMiniLMEmbeddingBackend
+from .index_services import normalize_rows
+
+VectorLoader = Callable[
+    [List[Dict[str, typing.Any]]], Awaitable[tuple[np.ndarray, np.ndarray]]
+]
+
+
+class BaseReranker(abc.ABC):
+    """Second-stage scorer for first-stage search candidates."""
+
+    needs_vectors: bool = False
+
+    @abc.abstractmethod
+    def score(
+        self,
+        query: str,
+        hits: List[Dict[str, typing.Any]],
+        query_vector: Optional[np.ndarray] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Relevance of every hit, higher is better."""
+        raise NotImplementedError
+
+
+class CosineReranker(BaseReranker):
+    """Exact cosine similarity on the full-precision plot vectors.
+
+    Cheap, and it restores the true order after approximate (IVF or
+    quantized) first-stage retrieval.
+    """
+
+    needs_vectors = True
+
+    def score(
+        self,
+        query: str,
+        hits: List[Dict[str, typing.Any]],
+        query_vector: Optional[np.ndarray] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        return normalize_rows(vectors) @ normalize_rows(query_vector)
+
+
+class CrossEncoderReranker(BaseReranker):
+    """ONNX cross-encoder (e.g. ms-marco-MiniLM-L-6-v2) over query/plot pairs.
+
+    The model directory is laid out like the one of
+    :class:`LocalMiniLMEmbeddingBackend`. Slower than cosine rescoring but it
+    reads the query and the plot together.
+    """
+
+    def __init__(self, model_dir: str, max_seq_length: int) -> None:
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as err:
+            raise RuntimeError(
+                "Cross-encoder reranker requires the 'local' extra "
+                "(onnxruntime, tokenizers) to be installed"
+            ) from err
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=max_seq_length)
+        self._tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        self._session = onnxruntime.InferenceSession(
+            LocalMiniLMEmbeddingBackend.model_path(model_dir),
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {node.name for node in self._session.get_inputs()}
+
+    def score(
+        self,
+        query: str,
+        hits: List[Dict[str, typing.Any]],
+        query_vector: Optional[np.ndarray] = None,
+        vectors: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(
+            [(query, hit.get("plot") or "") for hit in hits]
+        )
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {
+            name: value for name, value in feeds.items() if name in self._input_names
+        }
+        return self._session.run(None, feeds)[0][:, 0]
+
+
+@functools.lru_cache()
+def get_reranker() -> BaseReranker:
+    """Build the reranker configured in settings (once per process)."""
+    match settings.RERANK_BACKEND:
+        case RerankBackend.CROSS_ENCODER:
+            return CrossEncoderReranker(
+                model_dir=settings.RERANKER_MODEL_DIR,
+                max_seq_length=settings.RERANKER_MAX_SEQ_LENGTH,
+            )
+        case RerankBackend.COSINE:
+            return CosineReranker()
+
+
+async def rerank_hits(
+    reranker: BaseReranker,
+    query: str,
+    hits: List[Dict[str, typing.Any]],
+    budget_ms: float,
+    load_vectors: Optional[VectorLoader] = None,
+) -> tuple[List[Dict[str, typing.Any]], Dict[str, typing.Any]]:
+    """Reorder ``hits`` by the reranker score within a time budget.
+
+    When scoring does not finish within ``budget_ms`` the first-stage order is
+    returned unchanged. The report holds the time spent and the outcome.
+    """
+    started = time.perf_counter()
+
+    async def scores() -> np.ndarray:
+        query_vector = vectors = None
+        if reranker.needs_vectors:
+            query_vector, vectors = await load_vectors(hits)
+        return await run_in_threadpool(
+            reranker.score, query, hits, query_vector, vectors
+        )
+
+    status = "applied"
+    try:
+        if hits:
+            relevance = await asyncio.wait_for(scores(), timeout=budget_ms / 1000)
+            order = np.argsort(-relevance, kind="stable")
+            hits = [{**hits[i], "score": float(relevance[i])} for i in order]
+    except asyncio.TimeoutError:
+        status = "timeout"
+        logger.info("%s - %s", query, "Rerank budget exceeded, keeping first stage")
+    return hits, {
+        "rerank_ms": round((time.perf_counter() - started) * 1000, 3),
+        "rerank_status": status,
+    }
@@ -0,0 +1,129 @@
+import asyncio
+import typing
+from typing import Any, Dict, Optional
+import orjson
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+from ..core.config import settings
+from ..database.connect import async_redis_client
+from ..middleware.logging import logger
+from .cache_services import TTLCache
+
+# Sessions are stored as a format version byte followed by the JSON body.
+SESSION_FORMAT_VERSION = 1
+SESSION_KEY_PREFIX = "session:"
+REVOKED_CHANNEL = "sessions:revoked"
+
+
+def encode_session(session: Dict[str, Any]) -> bytes:
+    """Serialize a session for Redis.
+
+    Examples:
+        >>> encode_session({"email": "user@example.com"})
+        b'\\x01{"email":"user@example.com"}'
+    """
+    return bytes((SESSION_FORMAT_VERSION,)) + orjson.dumps(session)
+
+
+def decode_session(data: bytes) -> Dict[str, Any]:
+    """Inverse of :func:`encode_session`.
+
+    Raises ``ValueError`` for any other format, such as sessions pickled by
+    older releases: they are never unpickled, their users log in again.
+    """
+    if not data or data[0] != SESSION_FORMAT_VERSION:
+        raise ValueError("Unknown session format")
+    session = orjson.loads(data[1:])
+    if not isinstance(session, dict):
+        raise ValueError("Unknown session format")
+    return session
+
+
+class SessionStore:
+    """Bearer token sessions in Redis, cached in process for ``local_ttl``.
+
+    Revoking a token publishes it on ``REVOKED_CHANNEL``, and every worker
+    running :meth:`listen` drops its cached copy. The local cache is only
+    used while subscribed, so a worker that may have missed a revocation
+    goes back to reading Redis until it has resubscribed.
+    """
+
+    def __init__(
+        self,
+        redis: AsyncRedis,
+        ttl: int,
+        local_size: int,
+        local_ttl: float,
+        channel: str = REVOKED_CHANNEL,
+    ) -> None:
+        self._redis = redis
+        self._ttl = ttl
+        self._local = TTLCache(maxsize=local_size, ttl=local_ttl)
+        self._channel = channel
+        self.listening = False
+        self.local_hits = 0
+        self.redis_reads = 0
+
+    def stats(self) -> Dict[str, typing.Any]:
+        """Lookups served in process and lookups that read Redis."""
+        return {
+            "local_hits": self.local_hits,
+            "redis_reads": self.redis_reads,
+            "listening": self.listening,
+        }
+
+    async def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Return the session of ``token``, ``None`` if it expired or was revoked."""
+        if self.listening and (session := self._local.get(token)) is not None:
+            self.local_hits += 1
+            return dict(session)
+        self.redis_reads += 1
+        data = await self._redis.get(SESSION_KEY_PREFIX + token)
+        if data is None:
+            return None
+        session = decode_session(data)
+        if self.listening:
+            self._local.set(token, session)
+        return dict(session)
+
+    async def create(self, token: str, session: Dict[str, Any]) -> None:
+        """Store a new session for ``token``, expiring after ``ttl`` seconds."""
+        await self._redis.set(
+            SESSION_KEY_PREFIX + token, encode_session(session), ex=self._ttl
+        )
+
+    async def revoke(self, token: str) -> None:
+        """Delete the session of ``token`` on every worker."""
+        self._local.pop(token)
+        await self._redis.delete(SESSION_KEY_PREFIX + token)
+        await self._redis.publish(self._channel, token)
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """Drop revoked tokens from the local cache until cancelled.
+
+        Revocations published while disconnected are lost, so the local cache
+        is cleared on every (re)subscription.
+        """
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._channel)
+                self._local.clear()
+                self.listening = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._local.pop(message["data"].decode())
+            except RedisError as err:
+                logger.error("%s - %s", err, "Session revocation listener failed")
+            finally:
+                self.listening = False
+                await pubsub.aclose()
+            await asyncio.sleep(retry_delay)
+
+
+session_store = SessionStore(
+    redis=async_redis_client,
+    ttl=settings.SESSION_TTL,
+    local_size=settings.SESSION_CACHE_SIZE,
+    local_ttl=settings.SESSION_CACHE_TTL,
+)
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import time
+import typing
+from typing import Any, Awaitable, Callable, Dict, Optional
+import jwt
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+from ..core.config import settings
+from ..database.connect import async_redis_client, http_client
+from ..middleware.logging import logger
+
+DENYLIST_KEY_PREFIX = "denylist:"
+DENYLIST_CHANNEL = "tokens:revoked"
+
+
+def token_digest(token: str) -> str:
+    """Short stable id of a token, so raw tokens are never stored."""
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def jwks_loader(url: str) -> Callable[[], Awaitable[Dict[str, Any]]]:
+    """Fetch a JWKS document from ``url`` on the shared HTTP pool."""
+
+    async def load() -> Dict[str, Any]:
+        response = await http_client.get(url)
+        if response.status_code != 200:
+            raise ValueError(
+                f"JWKS request failed with status code {response.status_code}: "
+                f"{response.text}"
+            )
+        return response.json()
+
+    return load
+
+
+class JWKSCache:
+    """Signing keys of the identity provider, kept in memory.
+
+    :meth:`run` refreshes them every ``refresh_interval`` seconds. A token
+    signed with an unknown key id triggers an early refresh, so rotated keys
+    are picked up at once; those refreshes are at least ``cooldown`` seconds
+    apart so tokens with made-up key ids cannot flood the provider. A failed
+    refresh keeps the keys already known.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[Dict[str, Any]]],
+        refresh_interval: float,
+        cooldown: float,
+    ) -> None:
+        self._load = load
+        self._refresh_interval = refresh_interval
+        self._cooldown = cooldown
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._refreshed_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+
+    async def refresh(self) -> None:
+        """Replace the keys with the current JWKS document."""
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+        jwk_set = jwt.PyJWKSet.from_dict(await self._load())
+        self._keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+
+    async def get(self, kid: str) -> Optional[jwt.PyJWK]:
+        """Return the key ``kid``, refreshing once if it is unknown."""
+        if (key := self._keys.get(kid)) is not None:
+            return key
+        async with self._lock:
+            # another request may have refreshed while this one waited
+            if kid not in self._keys and (
+                time.monotonic() - self._refreshed_at >= self._cooldown
+            ):
+                try:
+                    await self.refresh()
+                except Exception as err:
+                    logger.error("%s - %s", err, "JWKS refresh failed")
+        return self._keys.get(kid)
+
+    async def run(self) -> None:
+        """Refresh the keys periodically until cancelled."""
+        while True:
+            async with self._lock:
+                try:
+                    await self.refresh()
+                except Exception as err:
+                    logger.error("%s - %s", err, "JWKS refresh failed")
+            await asyncio.sleep(self._refresh_interval)
+
+
+class TokenDenylist:
+    """Access tokens revoked before their expiry, mirrored in process.
+
+    Each entry lives in Redis until the token would have expired anyway, so
+    the list stays small. Workers load it when they subscribe and follow
+    revocations over pub/sub, so checking a token needs no I/O. The mirror is
+    only trusted while subscribed: a worker that may have missed a revocation
+    looks tokens up in Redis until it has resubscribed and reloaded. ``leeway``
+    must match the verifier's: a token is accepted that long after its expiry.
+    """
+
+    def __init__(
+        self, redis: AsyncRedis, channel: str = DENYLIST_CHANNEL, leeway: int = 0
+    ) -> None:
+        self._redis = redis
+        self._channel = channel
+        self._leeway = leeway
+        self._revoked: Dict[str, float] = {}
+        self.listening = False
+
+    async def is_revoked(self, token: str) -> bool:
+        """Whether ``token`` was revoked and has not expired since."""
+        digest = token_digest(token)
+        if self.listening:
+            expires_at = self._revoked.get(digest)
+        else:
+            value = await self._redis.get(DENYLIST_KEY_PREFIX + digest)
+            expires_at = None if value is None else float(value)
+        return expires_at is not None and expires_at > time.time()
+
+    async def revoke(self, token: str, expires_at: float) -> None:
+        """Deny ``token`` on every worker until it expires.
+
+        :param expires_at: ``exp`` claim of the token, in epoch seconds
+        """
+        digest = token_digest(token)
+        expires_at += self._leeway
+        self._revoked[digest] = expires_at
+        ttl = int(expires_at - time.time()) + 1
+        if ttl > 0:
+            await self._redis.set(DENYLIST_KEY_PREFIX + digest, expires_at, ex=ttl)
+            await self._redis.publish(self._channel, f"{digest}:{expires_at}")
+
+    async def load(self) -> None:
+        """Read every revoked token from Redis."""
+        revoked: Dict[str, float] = {}
+        async for key in self._redis.scan_iter(match=DENYLIST_KEY_PREFIX + "*"):
+            value = await self._redis.get(key)
+            if value is not None:
+                revoked[key.decode().removeprefix(DENYLIST_KEY_PREFIX)] = float(value)
+        self._revoked = revoked
+
+    def prune(self) -> None:
+        """Forget tokens that expired since they were revoked."""
+        now = time.time()
+        self._revoked = {d: exp for d, exp in self._revoked.items() if exp > now}
+
+    async def listen(self, retry_delay: float = 1.0) -> None:
+        """Follow revocations until cancelled, reloading after reconnects.
+
+        Revocations published while disconnected are lost, so the mirror is
+        reloaded on every (re)subscription before it is trusted again.
+        """
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self._channel)
+                await self.load()
+                self.listening = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        digest, _, expires_at = message["data"].decode().partition(":")
+                        self._revoked[digest] = float(expires_at)
+                        self.prune()
+            except RedisError as err:
+                logger.error("%s - %s", err, "Token denylist listener failed")
+            finally:
+                self.listening = False
+                await pubsub.aclose()
+            await asyncio.sleep(retry_delay)
+
+
+class TokenVerifier:
+    """Verify access tokens locally: signature, expiry, audience and issuer."""
+
+    def __init__(
+        self,
+        jwks: JWKSCache,
+        denylist: TokenDenylist,
+        audience: str,
+        issuer: str,
+        algorithms: typing.Sequence[str] = ("RS256",),
+        leeway: int = 0,
+    ) -> None:
+        self._jwks = jwks
+        self._denylist = denylist
+        self._audience = audience
+        self._issuer = issuer
+        self._algorithms = list(algorithms)
+        self._leeway = leeway
+
+    async def verify(self, token: str) -> Dict[str, typing.Any]:
+        """Return the claims of ``token``.
+
+        :raises jwt.InvalidTokenError: if the token is invalid, expired, issued
+            for another audience or revoked
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = await self._jwks.get(kid) if kid else None
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=self._algorithms,
+            audience=self._audience,
+            issuer=self._issuer,
+            leeway=self._leeway,
+            options={"require": ["exp", "sub"]},
+        )
+        if await self._denylist.is_revoked(token):
+            raise jwt.InvalidTokenError("Token revoked")
+        return claims
+
+
+jwks_cache = JWKSCache(
+    load=jwks_loader(f"https://{settings.AUTH0_DOMAIN}/.well-known/jwks.json"),
+    refresh_interval=settings.JWKS_REFRESH_INTERVAL,
+    cooldown=settings.JWKS_REFRESH_COOLDOWN,
+)
+token_denylist = TokenDenylist(redis=async_redis_client, leeway=settings.JWT_LEEWAY)
+token_verifier = TokenVerifier(
+    jwks=jwks_cache,
+    denylist=token_denylist,
+    audience=settings.AUTH0_AUDIENCE,
+    issuer=f"https://{settings.AUTH0_DOMAIN}/",
+    leeway=settings.JWT_LEEWAY,
+)
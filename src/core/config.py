@@ -1,6 +1,17 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import warnings
 import importlib.metadata
+from .enums import (
+    AuthMode,
+    EmbeddingBackend,
+    GeneratorBackend,
+    LocalIndexMode,
+    Quantization,
+    RateLimitMode,
+    RerankBackend,
+    VectorSearchEngine,
+)
 
 try:
     current_version = importlib.metadata.version("genai-rag-semantic-movies")
@@ -21,12 +32,83 @@ class Settings(BaseSettings):
     AUTH0_DOMAIN: str
     AUTH0_CLIENT_ID: str
     AUTH0_CLIENT_SECRET: str
+    AUTH0_AUDIENCE: str = ""
+    AUTH0_CONNECT_TIMEOUT: float = 3.0
+    AUTH0_READ_TIMEOUT: float = 5.0
+    AUTH0_MAX_CONCURRENCY: int = 20
+    AUTH0_BREAKER_FAILURES: int = 5
+    AUTH0_BREAKER_RESET: float = 30.0
+    AUTH_MODE: AuthMode = AuthMode.SESSION
+    JWKS_REFRESH_INTERVAL: int = 3600
+    JWKS_REFRESH_COOLDOWN: float = 30.0
+    JWT_LEEWAY: int = 30
     TEST_LOGIN: str
     TEST_PASSWORD: str
+    MONGO_MAX_POOL_SIZE: int = 100
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_POOL_TIMEOUT: float = 5.0
+    # hybrid leases quota blocks in every limiter, per-route policies included
+    RATE_LIMIT_MODE: RateLimitMode = RateLimitMode.STRICT
+    RATE_LIMIT_LEASE_SIZE: int = 10
+    RATE_LIMIT_LOCAL_KEYS: int = 10000
+    SESSION_TTL: int = 21600
+    SESSION_CACHE_SIZE: int = 10000
+    SESSION_CACHE_TTL: float = 30.0
+    IDEMPOTENCY_TTL: int = 86400
+    IDEMPOTENCY_LOCK_TTL: int = 60
+    IDEMPOTENCY_WAIT_TIMEOUT: float = 10.0
+    IDEMPOTENCY_MAX_BODY: int = 1048576
+    HTTP_POOL_SIZE: int = 100
+    HTTP_TIMEOUT: float = 10.0
+    EMBEDDING_BACKEND: EmbeddingBackend = EmbeddingBackend.HUGGINGFACE
+    EMBEDDING_MODEL_ID: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MODEL_DIR: str = "models/all-MiniLM-L6-v2"
+    EMBEDDING_MAX_SEQ_LENGTH: int = 256
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_TTL: int = 300
+    EMBEDDING_CACHE_REDIS_TTL: int = 86400
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL: int = 60
+    RESULT_CACHE_STALE_TTL: int = 300
+    INDEX_VERSION_TTL: float = 1.0
+    VECTOR_SEARCH_ENGINE: VectorSearchEngine = VectorSearchEngine.ATLAS
+    LOCAL_INDEX_DIR: str = "data/index"
+    LOCAL_INDEX_MODE: LocalIndexMode = LocalIndexMode.EXACT
+    LOCAL_INDEX_NLIST: int = 0
+    LOCAL_INDEX_NPROBE: int = 8
+    LOCAL_INDEX_QUANTIZATION: Quantization = Quantization.NONE
+    LOCAL_INDEX_RESCORE_FACTOR: int = 4
+    ATLAS_VECTOR_INDEX: str = "PlotSemanticSearch"
+    ATLAS_SEARCH_INDEX: str = "MovieTextSearch"
+    HYBRID_BRANCH_LIMIT: int = 20
+    RRF_K: int = 60
+    RERANK_BACKEND: RerankBackend = RerankBackend.COSINE
+    RERANK_TOP_N: int = 20
+    RERANK_BUDGET_MS: float = 50.0
+    RERANKER_MODEL_DIR: str = "models/ms-marco-MiniLM-L-6-v2"
+    RERANKER_MAX_SEQ_LENGTH: int = 512
+    GENERATOR_BACKEND: GeneratorBackend = GeneratorBackend.HUGGINGFACE
+    GENERATOR_MODEL_ID: str = "mistralai/Mistral-7B-Instruct-v0.2"
+    GENERATOR_WARMUP_TTL: int = 300
+    ANSWER_CONTEXT_TOKENS: int = 1024
+    ANSWER_MAX_TOKENS: int = 256
+    BATCH_SEARCH_MAX_QUERIES: int = 64
+    BATCH_SEARCH_CONCURRENCY: int = 8
+    INGESTION_BATCH_SIZE: int = 32
+    INGESTION_LIMIT: int = 50
+    INGESTION_ON_STARTUP: bool = True
+    INGESTION_LOCK_TIMEOUT: int = 60
 
     model_config = SettingsConfigDict(
         env_file=".env", extra="ignore", env_file_encoding="utf-8"
     )
 
+    @model_validator(mode="after")
+    def check_jwt_audience(self) -> "Settings":
+        # without an audience every access token would fail verification
+        if self.AUTH_MODE == AuthMode.JWT and not self.AUTH0_AUDIENCE:
+            raise ValueError("AUTH0_AUDIENCE must be set when AUTH_MODE is jwt")
+        return self
+
 
 settings = Settings()
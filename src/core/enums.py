@@ -18,3 +18,81 @@ class RatePeriod(str, enum.Enum):
     HOUR = "hours"
     DAY = "days"
     WEEK = "weeks"
+
+
+class EmbeddingBackend(str, enum.Enum):
+    """Available engines for generating sentence embeddings."""
+
+    HUGGINGFACE = "huggingface"
+    LOCAL = "local"
+
+
+class VectorSearchEngine(str, enum.Enum):
+    """Where vector search runs."""
+
+    ATLAS = "atlas"
+    LOCAL = "local"
+
+
+class LocalIndexMode(str, enum.Enum):
+    """Search strategy of the local vector index."""
+
+    EXACT = "exact"
+    IVF = "ivf"
+
+
+class Quantization(str, enum.Enum):
+    """Compact encodings used for the coarse pass of the local vector index."""
+
+    NONE = "none"
+    INT8 = "int8"
+    BINARY = "binary"
+
+
+class SearchMode(str, enum.Enum):
+    """Retrievers used to answer a search."""
+
+    VECTOR = "vector"
+    HYBRID = "hybrid"
+
+
+class RerankBackend(str, enum.Enum):
+    """Second-stage scorer applied to the first-stage candidates."""
+
+    COSINE = "cosine"
+    CROSS_ENCODER = "cross_encoder"
+
+
+class GeneratorBackend(str, enum.Enum):
+    """Engines available for writing answers from retrieved plots."""
+
+    HUGGINGFACE = "huggingface"
+    LOCAL = "local"
+
+
+class RateLimitMode(str, enum.Enum):
+    """How the sliding window limiter talks to Redis."""
+
+    STRICT = "strict"
+    HYBRID = "hybrid"
+
+
+class RateLimitAlgorithm(str, enum.Enum):
+    """Algorithms available to per-route rate limit policies."""
+
+    GCRA = "gcra"
+    TOKEN_BUCKET = "token_bucket"
+
+
+class RateLimitScope(str, enum.Enum):
+    """Who a rate limit policy counts requests for."""
+
+    IP = "ip"
+    USER = "user"
+
+
+class AuthMode(str, enum.Enum):
+    """How bearer tokens are authenticated."""
+
+    SESSION = "session"
+    JWT = "jwt"
@@ -1,6 +1,9 @@
 from dotenv import load_dotenv
+import httpx
 import redis
+import redis.asyncio
 from ..core.config import settings
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 # from sqlalchemy import create_engine
 
@@ -26,4 +29,24 @@ load_dotenv()
 # get_db = init_connection_engine()
 
 redis_client = redis.Redis.from_url(settings.REDIS_URL)
+# Requests wait for a free connection (up to REDIS_POOL_TIMEOUT) instead of
+# blocking the event loop or opening unbounded connections.
+async_redis_client = redis.asyncio.Redis(
+    connection_pool=redis.asyncio.BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+    )
+)
 client = MongoClient(f"{settings.KMONGO_URL}/?retryWrites=true&w=majority")
+async_client = AsyncIOMotorClient(
+    f"{settings.KMONGO_URL}/?retryWrites=true&w=majority",
+    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+)
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.HTTP_POOL_SIZE,
+        max_keepalive_connections=settings.HTTP_POOL_SIZE,
+    ),
+    timeout=httpx.Timeout(settings.HTTP_TIMEOUT),
+)
@@ -0,0 +1,73 @@
+from typing import Any, Dict, List
+from pymongo.collection import Collection
+from pymongo.operations import SearchIndexModel
+from ..core.config import settings
+from ..middleware.logging import logger
+
+# all-MiniLM-L6-v2, served by both embedding backends
+EMBEDDING_DIMENSIONS = 384
+
+# Fields the /movies filters apply to; `$vectorSearch` can only pre-filter on
+# fields indexed with the `filter` type.
+FILTER_FIELDS = ["year", "imdb.rating", "genres", "languages"]
+
+PLOT_SEMANTIC_SEARCH: Dict[str, Any] = {
+    "fields": [
+        {
+            "type": "vector",
+            "path": "plot_embedding_hf",
+            "numDimensions": EMBEDDING_DIMENSIONS,
+            "similarity": "cosine",
+        },
+        *({"type": "filter", "path": path} for path in FILTER_FIELDS),
+    ]
+}
+
+MOVIE_TEXT_SEARCH: Dict[str, Any] = {
+    "mappings": {
+        "dynamic": False,
+        "fields": {
+            "title": {"type": "string"},
+            "plot": {"type": "string"},
+            "year": {"type": "number"},
+            "imdb": {"type": "document", "fields": {"rating": {"type": "number"}}},
+            "genres": {"type": "token"},
+            "languages": {"type": "token"},
+        },
+    }
+}
+
+
+def search_index_models() -> List[SearchIndexModel]:
+    """Atlas Search index definitions used by movie search."""
+    return [
+        SearchIndexModel(
+            definition=PLOT_SEMANTIC_SEARCH,
+            name=settings.ATLAS_VECTOR_INDEX,
+            type="vectorSearch",
+        ),
+        SearchIndexModel(
+            definition=MOVIE_TEXT_SEARCH,
+            name=settings.ATLAS_SEARCH_INDEX,
+            type="search",
+        ),
+    ]
+
+
+def ensure_search_indexes(collection: Collection) -> List[str]:
+    """Create missing search indexes and update the existing ones.
+
+    Atlas builds indexes asynchronously, so they may take a while to become
+    queryable after this returns.
+    """
+    existing = {index["name"] for index in collection.list_search_indexes()}
+    names = []
+    for model in search_index_models():
+        name, definition = model.document["name"], model.document["definition"]
+        if name in existing:
+            collection.update_search_index(name, definition)
+        else:
+            collection.create_search_index(model)
+        logger.info("%s - %s", name, "Search index definition submitted")
+        names.append(name)
+    return names
@@ -4,19 +4,26 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from .views import auth, movies
+from .views import admin, auth, movies
 from .middleware.limiters import RateLimitMiddleware
 from .schemas.requests import get_code_samples
 from .core.config import settings
+import asyncio
 import functools
 import io
 import yaml
 from contextlib import asynccontextmanager
-from .controllers.misc_services import SlidingWindowRateLimiter, Rate
-from .core.enums import RatePeriod
+from .controllers.ratelimit_services import rate_limit_registry
 from .core.exceptions import BackendError
-from .controllers.movies_services import persist_vectors_to_db
+from .controllers.jobs_services import ingestion_job
+from .controllers.auth0_services import auth0_client
+from .controllers.idempotency_services import idempotency_store
+from .controllers.session_services import session_store
+from .controllers.token_services import jwks_cache, token_denylist
+from .core.enums import AuthMode
 from .middleware.csrf import CSRFMiddleware
+from .middleware.idempotency import IdempotencyMiddleware
+from .database.connect import async_client, async_redis_client, http_client
 
 description = """
 Application of RAG (GenAI)
@@ -31,8 +38,25 @@ tags_metadata = [
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    persist_vectors_to_db()
+    ingestion = None
+    if settings.INGESTION_ON_STARTUP:
+        ingestion = asyncio.create_task(asyncio.to_thread(ingestion_job.run))
+    if settings.AUTH_MODE == AuthMode.JWT:
+        background = [jwks_cache.run(), token_denylist.listen()]
+    else:
+        background = [session_store.listen()]
+    tasks = [asyncio.create_task(job) for job in background]
     yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if ingestion:
+        ingestion_job.stop()
+        await asyncio.gather(ingestion, return_exceptions=True)
+    await http_client.aclose()
+    await auth0_client.aclose()
+    await async_redis_client.aclose()
+    async_client.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -43,6 +67,12 @@ origins = [
     "http://localhost:8000",
 ]
 
+# innermost: only requests past CSRF and rate limits claim a request ID
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    max_body=settings.IDEMPOTENCY_MAX_BODY,
+)
 # cross origin
 app.add_middleware(
     CORSMiddleware,
@@ -51,17 +81,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(
-    RateLimitMiddleware,
-    rate_limiter=SlidingWindowRateLimiter(
-        rate=Rate(number=60, period=RatePeriod.MINUTE)
-    ),
-)
+app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limit_registry)
 app.add_middleware(CSRFMiddleware)
 
 
 app.include_router(auth.router)
 app.include_router(movies.router)
+app.include_router(admin.router)
 
 
 @app.exception_handler(RequestValidationError)
@@ -80,7 +106,7 @@ def custom_form_validation_error(request: Request, exc: RequestValidationError):
 @app.exception_handler(BackendError)
 def custom_backend_exception(request: Request, exc: BackendError):
     return JSONResponse(
-        status_code=status.HTTP_400_BAD_REQUEST,
+        status_code=exc.code,
         content={"message": exc.message},
         headers=exc.headers,
     )
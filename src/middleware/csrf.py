@@ -1,10 +1,28 @@
 import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from ..core.enums import CSRFConstants
 
 
-class CSRFMiddleware(BaseHTTPMiddleware):
+def csrf_cookie(token: str) -> str:
+    """``Set-Cookie`` value handing ``token`` to the browser."""
+    response = Response()
+    response.set_cookie(
+        CSRFConstants.CSRF_TOKEN_NAME.value,
+        token,
+        int(CSRFConstants.CSRF_TOKEN_EXPIRY.value),
+        path="/",
+        secure=True,
+        domain="localhost",
+        httponly=True,
+        samesite="strict",
+    )
+    return response.headers["set-cookie"]
+
+
+class CSRFMiddleware:
     """
     CSRF / Cross Site Request Forgery Security Middleware for Starlette and FastAPI.
             1. request.state.csrftoken will now be available.
@@ -14,11 +32,19 @@ class CSRFMiddleware(BaseHTTPMiddleware):
             Users must should start on a "safe page" (a typical GET request) to generate the initial CSRF cookie.
             Uses session level CSRF so you can use frameworks such as htmx, without issues. (https://htmx.org/)
             Token is stored in request.state.csrftoken for use in templates.
+            Pure ASGI, so streamed responses pass through untouched.
     Reference
             https://cheatsheetseries.owasp.org/cheatsheets/Cross-Site_Request_Forgery_Prevention_Cheat_Sheet.html
     """
 
-    async def dispatch(self, request, call_next):
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope, receive)
         request.state.csrftoken = (
             ""  # Always available even if we don't get it from cookie.
         )
@@ -31,21 +57,24 @@ class CSRFMiddleware(BaseHTTPMiddleware):
                 CSRFConstants.CSRF_TOKEN_NAME, None
             )
         else:
-            token_from_post = token_from_cookie
+            # the cookie alone is sent by any site: a token must come with it
+            token_from_post = None
         # 🍪 Fetch the cookie only if we're using an appropriate request method (like Django does).
         if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
             if (
                 not token_from_cookie or len(token_from_cookie) < 30
             ):  # Sanity check. UUID always > 30.
-                return PlainTextResponse(
-                    "No CSRF cookie set!", status_code=403
-                )  # 🔴 Fail check.
+                response = PlainTextResponse("No CSRF cookie set!", status_code=403)
+                await response(scope, receive, send)  # 🔴 Fail check.
+                return
             if (str(token_from_cookie) != str(token_from_post)) and (
                 str(token_from_cookie) != str(token_from_header)
             ):
-                return PlainTextResponse(
+                response = PlainTextResponse(
                     "CSRF cookie does not match!", status_code=403
-                )  # 🔴 Fail check.
+                )
+                await response(scope, receive, send)  # 🔴 Fail check.
+                return
         else:
             # 🍪 Generates the cookie if one does not exist.
             # Has to be the same token throughout session! NOT a nonce.
@@ -57,20 +86,17 @@ class CSRFMiddleware(BaseHTTPMiddleware):
         # 🟢 All good. Pass csrftoken up to controllers, templates.
         request.state.csrftoken = token_from_cookie
 
-        # ⏰ Wait for response to happen.
-        response = await call_next(request)
+        if not token_new_cookie:
+            await self.app(scope, receive, send)
+            return
 
         # 🍪 Set CSRF cookie on the response.
-        if token_new_cookie and token_from_cookie:
-            response.set_cookie(
-                CSRFConstants.CSRF_TOKEN_NAME,
-                token_from_cookie,
-                CSRFConstants.CSRF_TOKEN_EXPIRY,
-                path="/",
-                secure=True,
-                domain="localhost",
-                httponly=True,
-                samesite="strict",
-            )
+        cookie = csrf_cookie(token_from_cookie)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("set-cookie", cookie)
+            await send(message)
 
-        return response
+        # ⏰ Wait for response to happen.
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,177 @@
+import hashlib
+import time
+from typing import Optional
+from fastapi.responses import JSONResponse
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..controllers.idempotency_services import (
+    IdempotencyRecord,
+    IdempotencyStore,
+    request_fingerprint,
+)
+
+MUTATING_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+REQUEST_ID_HEADER = "X-Request-ID"
+# client errors a retry would get again; others (401, 403, 408, 409, 425,
+# 429...) depend on when the request is made and must not be replayed
+FINAL_CLIENT_ERRORS = frozenset({400, 404, 405, 410, 413, 422})
+
+
+def token_identity(connection: HTTPConnection) -> str:
+    """Digest of the session token; the middleware runs before it is verified.
+
+    Keys of a forged token are never reached by the app, which rejects it.
+    """
+    _, _, token = connection.cookies["Authorization"].partition(" ")
+    return "user:" + hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def is_final(status: int) -> bool:
+    """Whether a response is the outcome of the request, fit for replay."""
+    return 200 <= status < 300 or status in FINAL_CLIENT_ERRORS
+
+
+class IdempotencyMiddleware:
+    """Run each authenticated mutating request once per ``X-Request-ID``.
+
+    Retries get the stored response back with ``Idempotent-Replayed: true``,
+    and duplicates arriving while the first request runs wait for its
+    response. Reusing an id for a different request is answered with 422, a
+    duplicate still waiting after the timeout with 409. Only final outcomes
+    are stored (see :func:`is_final`): after a 429, a 5xx or a response over
+    ``max_body`` bytes the request can be retried. Request bodies over
+    ``max_body`` bytes are refused with 413. Pure ASGI: the first response
+    streams to its client as it is recorded.
+    """
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore, max_body: int) -> None:
+        self.app = app
+        self.store = store
+        self.max_body = max_body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        connection = HTTPConnection(scope)
+        request_id = connection.headers.get(REQUEST_ID_HEADER)
+        if not request_id or "Authorization" not in connection.cookies:
+            await self.app(scope, receive, send)
+            return
+
+        body, receive = await buffer_body(receive, self.max_body)
+        if body is None:
+            response = JSONResponse(
+                status_code=413,
+                content={"message": "Request body too large"},
+            )
+            await response(scope, receive, send)
+            return
+        fingerprint = request_fingerprint(
+            scope["method"], scope["path"], scope["query_string"], body
+        )
+        key = self.store.key(token_identity(connection), request_id)
+        # one deadline for both attempts below
+        deadline = time.monotonic() + self.store.wait_timeout
+        for _ in range(2):
+            claimed, record = await self.store.claim(key, fingerprint)
+            if claimed:
+                await self.run(key, fingerprint, scope, receive, send)
+                return
+            if record is not None and record.fingerprint != fingerprint:
+                response = JSONResponse(
+                    status_code=422,
+                    content={
+                        "message": "X-Request-ID was already used for another request"
+                    },
+                )
+                await response(scope, receive, send)
+                return
+            if record is not None and not record.completed:
+                record = await self.store.wait(key, deadline)
+            if record is not None:
+                await replay(record, send)
+                return
+            if time.monotonic() >= deadline:
+                break
+            # the first request gave up its claim: run this one
+        response = JSONResponse(
+            status_code=409,
+            content={"message": "A request with this X-Request-ID is in progress"},
+            headers={"Retry-After": "1"},
+        )
+        await response(scope, receive, send)
+
+    async def run(
+        self, key: str, fingerprint: bytes, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        """Run the request, forwarding and recording its response."""
+        record = IdempotencyRecord(fingerprint)
+        chunks = []
+        size = 0
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal size
+            if message["type"] == "http.response.start":
+                record.status = message["status"]
+                record.headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if size <= self.max_body:
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        if not is_final(record.status) or size > self.max_body:
+            await self.store.release(key)
+            return
+        record.body = b"".join(chunks)
+        await self.store.complete(key, record)
+
+
+async def buffer_body(
+    receive: Receive, max_body: int
+) -> tuple[Optional[bytes], Receive]:
+    """Read the whole request body; return it and a ``receive`` replaying it.
+
+    The body is ``None`` if it is longer than ``max_body`` bytes.
+    """
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > max_body:
+            return None, receive
+        more_body = message.get("more_body", False)
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay_receive() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay_receive
+
+
+async def replay(record: IdempotencyRecord, send: Send) -> None:
+    """Send a stored response again."""
+    await send(
+        {
+            "type": "http.response.start",
+            "status": record.status,
+            "headers": record.headers + [(b"idempotent-replayed", b"true")],
+        }
+    )
+    await send({"type": "http.response.body", "body": record.body})
@@ -17,9 +17,19 @@ from starlette.status import (
 from starlette.requests import Request
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
-from ..database.connect import redis_client
+from ..controllers.session_services import session_store
+from ..controllers.token_services import token_verifier
 from ..core.config import settings
-import pickle
+from ..core.enums import AuthMode
+
+
+def session_from_claims(claims: dict) -> dict:
+    """Session shaped view of verified token claims."""
+    return {
+        "email": claims.get("email", claims["sub"]),
+        "sub": claims["sub"],
+        "exp": claims["exp"],
+    }
 
 
 class OAuth2PasswordBearerCookie(OAuth2):
@@ -54,9 +64,13 @@ class OAuth2PasswordBearerCookie(OAuth2):
             param = cookie_param
 
             try:
-                data = redis_client.get(param)
-                cache = pickle.loads(data)
+                if settings.AUTH_MODE == AuthMode.JWT:
+                    cache = session_from_claims(await token_verifier.verify(param))
+                else:
+                    cache = await session_store.get(param)
             except Exception:
+                cache = None
+            if cache is None:
                 raise HTTPException(
                     status_code=HTTP_401_UNAUTHORIZED, detail="Token expired"
                 )
@@ -72,25 +86,15 @@ class OAuth2PasswordBearerCookie(OAuth2):
                 )
             else:
                 return None
-        # Idempotency
+        # Idempotency: IdempotencyMiddleware runs each request ID once
         if request.method in ["POST", "PUT", "PATCH", "DELETE"]:
-            requestID = request.headers.get("X-Request-ID", None)
-            p_requestID = cache.get("requestID", None)
-            if not requestID:
-                if self.auto_error:
-                    raise HTTPException(
-                        status_code=HTTP_403_FORBIDDEN,
-                        detail="Request ID must be provided for Idempotency",
-                    )
-            if requestID == p_requestID:
-                if self.auto_error:
-                    raise HTTPException(
-                        status_code=HTTP_403_FORBIDDEN,
-                        detail="Duplicate Request has been made. Please renew the request token for Idempotency",
-                    )
-            if not p_requestID or requestID != p_requestID:
-                cache["requestID"] = requestID
-                redis_client.set(param, pickle.dumps([cache]))
+            if not request.headers.get("X-Request-ID") and self.auto_error:
+                raise HTTPException(
+                    status_code=HTTP_403_FORBIDDEN,
+                    detail="Request ID must be provided for Idempotency",
+                )
+        # verified identity the per-user rate limits count requests for
+        request.state.user = cache.get("sub") or cache["email"]
         return [param, cache]
 
 
@@ -133,7 +137,7 @@ class MockOauth(OAuth2):
                 raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE)
             elif flow == "504":
                 raise HTTPException(status_code=HTTP_504_GATEWAY_TIMEOUT)
-        cache = {"email": settings.TEST_LOGIN, "requestID": None}
+        cache = {"email": settings.TEST_LOGIN}
         return ["token", cache]
 
 
@@ -1,25 +1,59 @@
-from fastapi import Request, Response
+from typing import Dict, List, Union
+from fastapi import Depends, Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from ..controllers.ratelimit_services import rate_limit_registry
 from ..core.exceptions import BackendError
+from .islogin import oauth2_scheme
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, rate_limiter):
-        super().__init__(app)
+class RateLimitMiddleware:
+    """Count every HTTP request with ``rate_limiter`` before it reaches the app.
+
+    Pure ASGI: the rate limit headers are added to the response start message,
+    so response bodies, streamed or not, pass through untouched. Headers of a
+    per-user limit counted by the route replace those of the IP limit.
+    """
+
+    def __init__(self, app: ASGIApp, rate_limiter) -> None:
+        self.app = app
         self.rate_limiter = rate_limiter
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         try:
             rate_limit_headers = await self.rate_limiter(
-                request=request, response=Response()
+                request=Request(scope, receive), response=Response()
             )
-            response = await call_next(request)
-            response.headers.update(rate_limit_headers)
-            return response
         except BackendError as exc:
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=exc.code,
                 content={"message": exc.message},
                 headers=exc.headers,
             )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                user_headers = scope.get("state", {}).get("rate_limit_headers", {})
+                MutableHeaders(scope=message).update(rate_limit_headers | user_headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def limit_user(
+    request: Request,
+    response: Response,
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> None:
+    """Count the request against the per-user policy of its route.
+
+    Depends on the token, so only verified users are counted, under the
+    identity the auth dependency resolved.
+    """
+    await rate_limit_registry.charge_user(request=request, response=response)
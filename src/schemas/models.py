@@ -1,6 +1,9 @@
-from fastapi import Query, Form
-from pydantic import EmailStr, SecretStr, BaseModel
+from fastapi import Depends, Query, Form
+from pydantic import EmailStr, SecretStr, BaseModel, ConfigDict, Field, RootModel
 from enum import Enum
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..core.enums import SearchMode
 
 
 class Exception500(BaseModel):
@@ -38,6 +41,13 @@ class Default(BaseModel):
     message: str
 
 
+class Movie(BaseModel):
+    id: str = Field(..., alias="_id", description="MongoDB ObjectId of the movie")
+    title: str
+    plot: str
+    score: float = Field(..., description="Vector search score, higher is closer")
+
+
 class Home200(BaseModel):
     message: str = "This is initial route of Windvista Project MS"
 
@@ -64,9 +74,116 @@ class Login:
         self.password = password
 
 
+class SearchFilters:
+    def __init__(
+        self,
+        year_from: Optional[int] = Query(
+            None, alias="yearFrom", description="Released in or after this year"
+        ),
+        year_to: Optional[int] = Query(
+            None, alias="yearTo", description="Released in or before this year"
+        ),
+        genres: Optional[List[str]] = Query(
+            None, description="Any of these genres, repeat the parameter for more"
+        ),
+        min_rating: Optional[float] = Query(
+            None, ge=0, le=10, alias="minRating", description="Minimum IMDb rating"
+        ),
+        languages: Optional[List[str]] = Query(
+            None, description="Any of these languages, repeat the parameter for more"
+        ),
+    ):
+        filters = {
+            "year_from": year_from,
+            "year_to": year_to,
+            "genres": sorted(set(genres)) if genres else None,
+            "min_rating": min_rating,
+            "languages": sorted(set(languages)) if languages else None,
+        }
+        self.filters = {
+            name: value for name, value in filters.items() if value is not None
+        }
+
+
 class GetMovies:
     def __init__(
         self,
         query: str = Query(..., description="Query for prompts"),
+        k: int = Query(4, ge=1, le=100, description="Number of movies per page"),
+        num_candidates: int = Query(
+            100,
+            ge=1,
+            le=10000,
+            alias="numCandidates",
+            description="Nearest neighbours considered by the search (at least k)",
+        ),
+        cursor: Optional[str] = Query(
+            None, description="Pagination cursor from the X-Next-Cursor header"
+        ),
+        stream: bool = Query(False, description="Stream hits as NDJSON"),
+        mode: SearchMode = Query(
+            SearchMode.VECTOR,
+            description="vector, or hybrid keyword + vector search fused with RRF",
+        ),
+        rerank: bool = Query(
+            False, description="Rerank the top candidates with a second-stage scorer"
+        ),
+        search_filters: SearchFilters = Depends(),
+    ):
+        self.query = query
+        self.k = k
+        self.num_candidates = max(num_candidates, k)
+        self.cursor = cursor
+        self.stream = stream
+        self.mode = mode
+        self.rerank = rerank
+        self.filters = search_filters.filters
+
+
+class GetAnswer:
+    def __init__(
+        self,
+        query: str = Query(..., description="Question about movies"),
+        k: int = Query(4, ge=1, le=20, description="Number of plots to retrieve"),
+        mode: SearchMode = Query(
+            SearchMode.VECTOR,
+            description="vector, or hybrid keyword + vector search fused with RRF",
+        ),
+        search_filters: SearchFilters = Depends(),
     ):
         self.query = query
+        self.k = k
+        self.mode = mode
+        self.filters = search_filters.filters
+
+
+class BatchMovies(BaseModel):
+    model_config = ConfigDict(
+        populate_by_name=True,
+        json_schema_extra={
+            "example": {
+                "queries": ["characters from Multiverse", "reincarnated characters"],
+                "k": 4,
+                "numCandidates": 100,
+            }
+        },
+    )
+
+    queries: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.BATCH_SEARCH_MAX_QUERIES,
+        description="Queries for prompts",
+    )
+    k: int = Field(4, ge=1, le=100, description="Number of movies per query")
+    num_candidates: int = Field(
+        100,
+        ge=1,
+        le=10000,
+        alias="numCandidates",
+        description="Nearest neighbours considered by the search (at least k)",
+    )
+
+
+class BatchMovies200(RootModel[Dict[str, List[Movie]]]):
+    """Movies of every query, keyed by query."""
@@ -1,3 +1,4 @@
+from typing import List
 from ..schemas.models import (
     Login200,
     Login401,
@@ -8,6 +9,8 @@ from ..schemas.models import (
     Unauthorized401,
     Forbidden403,
     Default,
+    Movie,
+    BatchMovies200,
 )
 
 LOGIN_RESPONSE_MODEL = {
@@ -33,3 +36,31 @@ API_RESPONSE_MODEL = {
     404: {"model": NotFound404},
     500: {"model": Exception500},
 }
+
+MOVIES_RESPONSE_MODEL = {
+    200: {"model": List[Movie]},
+    401: {"model": Unauthorized401},
+    403: {"model": Forbidden403},
+    404: {"model": NotFound404},
+    500: {"model": Exception500},
+}
+
+BATCH_MOVIES_RESPONSE_MODEL = {
+    200: {"model": BatchMovies200},
+    401: {"model": Unauthorized401},
+    403: {"model": Forbidden403},
+    404: {"model": NotFound404},
+    429: {"model": Default},
+    500: {"model": Exception500},
+}
+
+ANSWER_RESPONSE_MODEL = {
+    200: {
+        "content": {"text/event-stream": {}},
+        "description": "sources, token, done (or error) Server-Sent Events",
+    },
+    401: {"model": Unauthorized401},
+    403: {"model": Forbidden403},
+    404: {"model": NotFound404},
+    500: {"model": Exception500},
+}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends
+from ..schemas.responses import API_RESPONSE_MODEL
+from ..middleware.logging import logger
+from ..controllers.cache_services import embedding_cache, result_cache
+from ..controllers.jobs_services import ingestion_job
+from typing import Dict, List, Union
+from ..middleware.islogin import oauth2_scheme
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get(
+    "/cache",
+    responses=API_RESPONSE_MODEL,
+    tags=["Admin"],
+    operation_id="get_cache_stats",
+)
+def get_cache_stats(
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> Dict[str, Dict[str, Union[int, float]]]:
+    """
+    ```
+    Hit/miss counters of the embedding and search result caches, per worker
+    ```
+    """
+    logger.info("%s - %s", token[1]["email"], "GET Cache Stats API is being called")
+    return {
+        "embeddings": embedding_cache.stats.dict(),
+        "results": result_cache.stats.dict(),
+    }
+
+
+@router.get(
+    "/ingestion",
+    responses=API_RESPONSE_MODEL,
+    tags=["Admin"],
+    operation_id="get_ingestion_progress",
+)
+def get_ingestion_progress(
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> Dict[str, Union[str, int, float]]:
+    """
+    ```
+    Progress of the current or last vector ingestion run (docs/sec, remaining)
+    ```
+    """
+    logger.info(
+        "%s - %s", token[1]["email"], "GET Ingestion Progress API is being called"
+    )
+    return ingestion_job.progress()
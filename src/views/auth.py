@@ -5,6 +5,7 @@ from ..controllers.authentication_services import (
 )
 from ..middleware.logging import logger
 from ..middleware.islogin import oauth2_scheme
+from ..middleware.limiters import limit_user
 from ..schemas.models import Login
 from fastapi.responses import JSONResponse
 from typing import List
@@ -14,7 +15,7 @@ router = APIRouter()
 
 
 @router.post("/login", responses=LOGIN_RESPONSE_MODEL, tags=["Authentication"])
-def login(creds: Login = Depends()) -> JSONResponse:
+async def login(creds: Login = Depends()) -> JSONResponse:
     """
     ```
     Auth0 is an third party service by Okta, which we use for
@@ -22,15 +23,20 @@ def login(creds: Login = Depends()) -> JSONResponse:
     ```
     """
     logger.info("%s - %s", creds.username, "Login API is being called")
-    return login_api(creds.username, creds.password.get_secret_value())
+    return await login_api(creds.username, creds.password.get_secret_value())
 
 
-@router.get("/logout", responses=LOGOUT_RESPONSE_MODEL, tags=["Authentication"])
-def logout(token: List = Depends(oauth2_scheme)) -> JSONResponse:
+@router.get(
+    "/logout",
+    responses=LOGOUT_RESPONSE_MODEL,
+    tags=["Authentication"],
+    dependencies=[Depends(limit_user)],
+)
+async def logout(token: List = Depends(oauth2_scheme)) -> JSONResponse:
     """
     ```
     This API will revoke the access of an authenticated user
     ```
     """
     logger.info("%s - %s", token[1]["email"], "Logout API is being called")
-    return logout_api(token)
+    return await logout_api(token)
@@ -1,24 +1,182 @@
-from fastapi import APIRouter, Depends
-from ..schemas.responses import API_RESPONSE_MODEL
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Request
+from ..schemas.responses import (
+    ANSWER_RESPONSE_MODEL,
+    BATCH_MOVIES_RESPONSE_MODEL,
+    MOVIES_RESPONSE_MODEL,
+)
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from ..middleware.logging import logger
-from ..controllers.movies_services import perform_vector_search
+from ..controllers.movies_services import (
+    decode_cursor,
+    encode_cursor,
+    search_movies,
+    search_movies_batch,
+    stream_movies,
+)
+from ..controllers.answer_services import answer_question
+from ..controllers.ratelimit_services import rate_limit_registry
 from typing import List, Union, Dict
 from ..middleware.islogin import oauth2_scheme
-from ..schemas.models import GetMovies
+from ..middleware.limiters import limit_user
+from ..schemas.models import BatchMovies, GetAnswer, GetMovies
 
 router = APIRouter()
 
 
+def server_timing(timings: Dict[str, Union[float, str]]) -> Dict[str, str]:
+    """``Server-Timing`` header for the rerank stage, when it ran."""
+    if "rerank_ms" not in timings:
+        return {}
+    return {
+        "Server-Timing": (
+            f'rerank;dur={timings["rerank_ms"]};desc="{timings["rerank_status"]}"'
+        )
+    }
+
+
 @router.get(
     "/movies",
-    responses=API_RESPONSE_MODEL,
+    responses=MOVIES_RESPONSE_MODEL,
+    response_class=ORJSONResponse,
     tags=["Movies"],
     operation_id="get_movies",
+    dependencies=[Depends(limit_user)],
 )
-def get_movies(
+async def get_movies(
     payload: GetMovies = Depends(),
     token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
-) -> JSONResponse:
+) -> Response:
+    """
+    ```
+    Semantic search over movie plots. Pages hold k movies; while the page is
+    full and more of the numCandidates neighbours remain, the X-Next-Cursor
+    header carries the cursor of the next page (streamed pages carry it before
+    their hits are known, a short one is the last). With stream=true hits are sent as NDJSON lines
+    as soon as they come off the database cursor. mode=hybrid adds a keyword
+    search (better on exact titles and names) fused with reciprocal rank fusion.
+    rerank=true rescores the top candidates with a second-stage reranker within
+    a latency budget, reported in the Server-Timing header. yearFrom, yearTo,
+    genres, minRating and languages restrict the search to matching movies
+    before the nearest neighbours are picked.
+    ```
+    """
     logger.info("%s - %s", token[1]["email"], "GET Movies API is being called")
-    return perform_vector_search(query=payload.query)
+    offset = decode_cursor(payload.query, payload.cursor, payload.num_candidates)
+    # the last page stops at the numCandidates-th neighbour
+    limit = min(payload.k, payload.num_candidates - offset)
+    next_cursor = {}
+    timings: Dict[str, Union[float, str]] = {}
+    if offset + limit < payload.num_candidates:
+        next_cursor["X-Next-Cursor"] = encode_cursor(payload.query, offset + limit)
+
+    if payload.stream:
+        # sent before the hits, so a short page is how a stream ends early
+        lines = await stream_movies(
+            query=payload.query,
+            limit=limit,
+            num_candidates=payload.num_candidates,
+            offset=offset,
+            mode=payload.mode,
+            rerank=payload.rerank,
+            timings=timings,
+            filters=payload.filters,
+        )
+        return StreamingResponse(
+            lines,
+            media_type="application/x-ndjson",
+            headers={**next_cursor, **server_timing(timings)},
+        )
+
+    body, count = await search_movies(
+        query=payload.query,
+        limit=limit,
+        num_candidates=payload.num_candidates,
+        offset=offset,
+        mode=payload.mode,
+        rerank=payload.rerank,
+        timings=timings,
+        filters=payload.filters,
+    )
+    if count < limit:
+        # fewer hits than asked for: there is no next page
+        next_cursor = {}
+    return Response(
+        content=body,
+        media_type=ORJSONResponse.media_type,
+        headers={**next_cursor, **server_timing(timings)},
+    )
+
+
+async def charge_batch(
+    request: Request,
+    response: Response,
+    payload: BatchMovies,
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> None:
+    """Charge the user one request per query of the batch.
+
+    Depends on the token so that rejected requests are not charged.
+    """
+    await rate_limit_registry.charge_user(
+        request=request, response=response, cost=len(payload.queries)
+    )
+
+
+@router.post(
+    "/movies/batch",
+    responses=BATCH_MOVIES_RESPONSE_MODEL,
+    response_class=ORJSONResponse,
+    tags=["Movies"],
+    operation_id="get_movies_batch",
+    dependencies=[Depends(charge_batch)],
+)
+async def get_movies_batch(
+    payload: BatchMovies,
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> Response:
+    """
+    ```
+    Semantic search for many queries at once. All queries are embedded in one
+    call and searched concurrently; results are keyed by query. Counts as one
+    request per query against the rate limit.
+    ```
+    """
+    logger.info("%s - %s", token[1]["email"], "POST Movies Batch API is being called")
+    body = await search_movies_batch(
+        queries=payload.queries,
+        limit=payload.k,
+        num_candidates=max(payload.num_candidates, payload.k),
+    )
+    return Response(content=body, media_type=ORJSONResponse.media_type)
+
+
+@router.get(
+    "/movies/answer",
+    responses=ANSWER_RESPONSE_MODEL,
+    response_class=StreamingResponse,
+    tags=["Movies"],
+    operation_id="get_movies_answer",
+    dependencies=[Depends(limit_user)],
+)
+async def get_movies_answer(
+    payload: GetAnswer = Depends(),
+    token: List[Union[str, Dict[str, str]]] = Depends(oauth2_scheme),
+) -> StreamingResponse:
+    """
+    ```
+    Answer a question from the k most relevant movie plots. The answer is
+    streamed as Server-Sent Events: a sources event with the cited movies, one
+    token event per generated token, then a done event with the retrieval
+    time, time to first token and total time. yearFrom, yearTo, genres,
+    minRating and languages restrict the plots retrieved, as in /movies.
+    ```
+    """
+    logger.info("%s - %s", token[1]["email"], "GET Movies Answer API is being called")
+    events = await answer_question(
+        question=payload.query, k=payload.k, mode=payload.mode, filters=payload.filters
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,58 @@
 import sys
 import os
+import asyncio
+import uuid
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeAuth0:
+    """Local stand-in for the Auth0 ``/oauth/token`` endpoint.
+
+    Set ``delay`` to make it slow and ``status_code`` to make it fail.
+    """
+
+    def __init__(self, users):
+        self.users = users
+        self.delay = 0.0
+        self.status_code = 200
+        self.calls = 0
+        self.app = Starlette(
+            routes=[Route("/oauth/token", self.token, methods=["POST"])]
+        )
+
+    async def token(self, request: Request) -> JSONResponse:
+        self.calls += 1
+        form = await request.form()
+        await asyncio.sleep(self.delay)
+        if self.status_code != 200:
+            return JSONResponse({"error": "unavailable"}, self.status_code)
+        if self.users.get(form.get("username")) != form.get("password"):
+            return JSONResponse(
+                {
+                    "error": "invalid_grant",
+                    "error_description": "Wrong email or password.",
+                },
+                403,
+            )
+        return JSONResponse(
+            {
+                "access_token": f"token-{uuid.uuid4().hex}",
+                "token_type": "Bearer",
+                "expires_in": 86400,
+            }
+        )
+
+    def transport(self) -> httpx.AsyncBaseTransport:
+        return httpx.ASGITransport(app=self.app)
+
+
+@pytest.fixture
+def fake_auth0():
+    return FakeAuth0(users={"user@example.com": "secret"})
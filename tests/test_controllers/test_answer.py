@@ -0,0 +1,114 @@
+import asyncio
+import time
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI
+from src.controllers import answer_services, generation_services
+from src.controllers.answer_services import answer_question, build_context
+from src.controllers.generation_services import (
+    HuggingFaceGenerator,
+    LocalStandInGenerator,
+)
+from src.middleware.islogin import oauth2_scheme
+from src.middleware.limiters import limit_user
+from src.views import movies
+
+HITS = [
+    {
+        "_id": "1",
+        "title": "Alien",
+        "plot": "A crew meets a deadly creature.",
+        "score": 0.9,
+    },
+    {"_id": "2", "title": "Arrival", "plot": " ".join(["word"] * 400), "score": 0.8},
+    {"_id": "3", "title": "Solaris", "plot": "A planet-sized ocean.", "score": 0.7},
+]
+
+
+def parse_events(body: bytes):
+    events = []
+    for block in body.decode().strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: ") :], orjson.loads(data[len("data: ") :])))
+    return events
+
+
+def test_build_context_respects_the_token_budget():
+    context, sources = build_context(HITS, budget=60)
+    assert answer_services.approx_tokens(context) <= 60
+    assert [source["_id"] for source in sources] == ["1", "2"]
+    assert context.startswith("[1] Alien: A crew meets a deadly creature.\n[2] ")
+    assert context.endswith("...")
+
+
+@pytest.mark.asyncio
+async def test_answer_streams_sources_tokens_and_timings(monkeypatch):
+    generator = LocalStandInGenerator(warmup_delay=0.1)
+
+    async def search(*args):
+        await asyncio.sleep(0.1)
+        return HITS[:1]
+
+    monkeypatch.setattr(answer_services, "get_generator", lambda: generator)
+    monkeypatch.setattr(answer_services, "perform_search_async", search)
+
+    started = time.perf_counter()
+    events = await answer_question("space monsters")
+    # warmup overlaps retrieval instead of adding to it
+    assert time.perf_counter() - started < 0.18
+    events = parse_events(b"".join([event async for event in events]))
+
+    assert events[0] == ("sources", [{"_id": "1", "title": "Alien", "score": 0.9}])
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert "".join(tokens) == "[1] Alien: A crew meets a deadly creature."
+    name, done = events[-1]
+    assert name == "done" and done["tokens"] == len(tokens)
+    assert done["retrieval_ms"] <= done["ttft_ms"] <= done["total_ms"]
+
+
+@pytest.mark.asyncio
+async def test_answer_route_passes_search_filters(monkeypatch):
+    calls = []
+
+    async def answer(**kwargs):
+        calls.append(kwargs)
+
+        async def events():
+            yield b""
+
+        return events()
+
+    monkeypatch.setattr(movies, "answer_question", answer)
+    app = FastAPI()
+    app.include_router(movies.router)
+    app.dependency_overrides[oauth2_scheme] = lambda: ["token", {"email": "a@b.c"}]
+    app.dependency_overrides[limit_user] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get(
+            "/movies/answer",
+            params={"query": "space", "yearFrom": 1990, "genres": ["Horror", "Drama"]},
+        )
+
+    assert response.status_code == 200
+    assert calls[0]["filters"] == {"year_from": 1990, "genres": ["Drama", "Horror"]}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_warmup(monkeypatch):
+    posts = []
+
+    class SlowClient:
+        async def post(self, url, **kwargs):
+            posts.append(url)
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json=[])
+
+    monkeypatch.setattr(generation_services, "http_client", SlowClient())
+    generator = HuggingFaceGenerator(model_id="m", api_key="key", warmup_ttl=60)
+
+    await asyncio.gather(*(generator.warmup() for _ in range(5)))
+    assert len(posts) == 1
+    await generator.warmup()
+    assert len(posts) == 1
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from src.controllers import authentication_services
+from src.controllers.auth0_services import Auth0Client, CircuitBreaker
+from src.core.exceptions import BackendError
+
+
+def make_client(fake_auth0, read_timeout=1.0, reset_timeout=30.0):
+    return Auth0Client(
+        base_url="http://auth0.test",
+        client_id="client",
+        client_secret="secret",
+        connect_timeout=0.05,
+        read_timeout=read_timeout,
+        max_concurrency=2,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout),
+        transport=fake_auth0.transport(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_password_grant_reuses_the_client(fake_auth0):
+    client = make_client(fake_auth0)
+    granted = await client.password_grant("user@example.com", "secret")
+    denied = await client.password_grant("user@example.com", "wrong")
+    await client.aclose()
+
+    assert granted.status_code == 200 and "access_token" in granted.json()
+    # wrong credentials are an answer, not an outage
+    assert denied.status_code == 403
+    assert client.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_auth0_opens_the_circuit_and_fails_fast(fake_auth0):
+    client = make_client(fake_auth0, read_timeout=0.05, reset_timeout=0.2)
+    fake_auth0.delay = 0.5
+    for _ in range(2):
+        with pytest.raises(BackendError) as err:
+            await client.password_grant("user@example.com", "secret")
+        assert err.value.code == 503
+
+    started = asyncio.get_running_loop().time()
+    with pytest.raises(BackendError) as err:
+        await client.password_grant("user@example.com", "secret")
+    assert asyncio.get_running_loop().time() - started < 0.05
+    assert fake_auth0.calls == 2
+    assert client.breaker.state == "open"
+    assert err.value.headers["Retry-After"] == "1"
+
+    # after the reset timeout one trial call closes the circuit again
+    fake_auth0.delay = 0.0
+    await asyncio.sleep(0.2)
+    response = await client.password_grant("user@example.com", "secret")
+    assert response.status_code == 200 and client.breaker.state == "closed"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_login_answers_503_while_auth0_is_down(fake_auth0, monkeypatch):
+    client = make_client(fake_auth0)
+    monkeypatch.setattr(authentication_services, "auth0_client", client)
+    fake_auth0.status_code = 502
+
+    responses = [
+        await authentication_services.login_api("user@example.com", "secret")
+        for _ in range(3)
+    ]
+    await client.aclose()
+
+    assert [response.status_code for response in responses] == [503, 503, 503]
+    assert "retry-after" in responses[-1].headers
+    assert fake_auth0.calls == 2
@@ -0,0 +1,71 @@
+import httpx
+import orjson
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from src.views import movies
+from src.middleware.islogin import oauth2_scheme
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.costs = []
+
+    async def charge_user(self, request, response, cost=1):
+        self.costs.append(cost)
+        return {}
+
+
+async def authenticated(request: Request):
+    if request.cookies.get("Authorization") != "Bearer token":
+        raise HTTPException(status_code=401, detail="Token expired")
+    return ["token", {"email": "user@example.com"}]
+
+
+@pytest.fixture
+def batch_app(monkeypatch):
+    limiter = RecordingLimiter()
+    searched = []
+
+    async def search_movies_batch(queries, limit, num_candidates):
+        searched.append(queries)
+        return orjson.dumps({query: [] for query in queries})
+
+    monkeypatch.setattr(movies, "rate_limit_registry", limiter)
+    monkeypatch.setattr(movies, "search_movies_batch", search_movies_batch)
+    app = FastAPI()
+    app.include_router(movies.router)
+    app.dependency_overrides[oauth2_scheme] = authenticated
+    return app, limiter, searched
+
+
+async def post_batch(app, queries, cookies=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", cookies=cookies
+    ) as client:
+        return await client.post("/movies/batch", json={"queries": queries})
+
+
+@pytest.mark.parametrize("size", [1, 2, 5])
+@pytest.mark.asyncio
+async def test_batches_are_charged_one_request_per_query(batch_app, size):
+    app, limiter, searched = batch_app
+    queries = [f"query {i}" for i in range(size)]
+
+    response = await post_batch(app, queries, cookies={"Authorization": "Bearer token"})
+
+    assert response.status_code == 200
+    assert list(response.json()) == queries
+    assert searched == [queries]
+    assert limiter.costs == [size]
+
+
+@pytest.mark.asyncio
+async def test_rejected_batches_are_not_charged(batch_app):
+    app, limiter, searched = batch_app
+
+    response = await post_batch(app, ["one", "two", "three"])
+
+    assert response.status_code == 401
+    assert limiter.costs == []
+    assert searched == []
@@ -0,0 +1,204 @@
+import asyncio
+import pytest
+from src.controllers.cache_services import (
+    EmbeddingCache,
+    IndexVersion,
+    SearchResultCache,
+    TTLCache,
+    normalize_query,
+    pack_vector,
+    unpack_vector,
+)
+from src.controllers.embedding_services import BaseEmbeddingBackend
+
+
+class CountingBackend(BaseEmbeddingBackend):
+    def __init__(self):
+        super().__init__(model_id="test-model")
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+class DictRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, name, value, ex=None, nx=False):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    def incr(self, name):
+        self.data[name] = int(self.data.get(name, 0)) + 1
+        return self.data[name]
+
+    def execute(self):
+        return []
+
+
+class AsyncDictRedis:
+    """Async client over the data of a :class:`DictRedis`."""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = 0
+
+    async def get(self, name):
+        self.calls += 1
+        return self.redis.get(name)
+
+    async def mget(self, keys):
+        self.calls += 1
+        return self.redis.mget(keys)
+
+    async def set(self, name, value, ex=None, nx=False):
+        self.calls += 1
+        return self.redis.set(name, value, ex=ex, nx=nx)
+
+    def pipeline(self, transaction=True):
+        return AsyncDictPipeline(self)
+
+
+class AsyncDictPipeline:
+    def __init__(self, client):
+        self.client = client
+
+    def set(self, name, value, ex=None):
+        self.client.redis.set(name, value, ex=ex)
+
+    async def execute(self):
+        self.client.calls += 1
+        return []
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_vector_packing_roundtrip():
+    vector = [0.25, -1.5, 3.0]
+    assert unpack_vector(pack_vector(vector)) == vector
+    assert len(pack_vector(vector)) == 12
+
+
+def test_normalize_query():
+    assert (
+        normalize_query("  Characters  from\tMultiverse ")
+        == "characters from multiverse"
+    )
+
+
+def test_embedding_cache_skips_backend_on_hits():
+    backend = CountingBackend()
+    redis = DictRedis()
+    cache = EmbeddingCache(
+        redis=redis, async_redis=AsyncDictRedis(redis), maxsize=8, ttl=60, redis_ttl=60
+    )
+
+    assert cache.embed(["space war"], backend) == [[9.0, 0.5]]
+    assert cache.embed(["Space  War"], backend) == [[9.0, 0.5]]
+    assert backend.calls == [["space war"]]
+
+    other_worker = EmbeddingCache(
+        redis=redis, async_redis=AsyncDictRedis(redis), maxsize=8, ttl=60, redis_ttl=60
+    )
+    assert other_worker.embed(["space war", "aliens"], backend) == [
+        [9.0, 0.5],
+        [6.0, 0.5],
+    ]
+    assert backend.calls[-1] == ["aliens"]
+    assert cache.stats.dict()["local_hits"] == 1
+    assert other_worker.stats.dict()["redis_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_embeddings_go_through_the_async_client():
+    backend = CountingBackend()
+    redis = DictRedis()
+    async_redis = AsyncDictRedis(redis)
+    cache = EmbeddingCache(
+        redis=redis, async_redis=async_redis, maxsize=8, ttl=60, redis_ttl=60
+    )
+
+    assert await cache.aembed(["space war"], backend) == [[9.0, 0.5]]
+    # a miss reads then stores through the pool, a local hit skips Redis
+    assert async_redis.calls == 2
+    assert await cache.aembed(["space war"], backend) == [[9.0, 0.5]]
+    assert async_redis.calls == 2
+
+    other_worker = EmbeddingCache(
+        redis=redis, async_redis=async_redis, maxsize=8, ttl=60, redis_ttl=60
+    )
+    assert await other_worker.aembed(["space war"], backend) == [[9.0, 0.5]]
+    assert backend.calls == [["space war"]]
+    assert other_worker.stats.redis_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_result_cache_is_invalidated_by_version_bump():
+    redis = DictRedis()
+    async_redis = AsyncDictRedis(redis)
+    version = IndexVersion(redis=redis, async_redis=async_redis, ttl=0)
+    cache = SearchResultCache(redis=async_redis, version=version, ttl=60, stale_ttl=60)
+    calls = []
+
+    async def search():
+        calls.append(1)
+        return f"Movie {len(calls)}".encode(), len(calls)
+
+    params = {"limit": 4}
+    assert await cache.get_or_search("space", params, search) == (b"Movie 1", 1)
+    assert await cache.get_or_search("Space ", params, search) == (b"Movie 1", 1)
+    version.bump()
+    assert await cache.get_or_search("space", params, search) == (b"Movie 2", 2)
+    assert cache.stats.dict()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_result_cache_serves_stale_while_revalidating():
+    redis = DictRedis()
+    async_redis = AsyncDictRedis(redis)
+    cache = SearchResultCache(
+        redis=async_redis,
+        version=IndexVersion(redis=redis, async_redis=async_redis, ttl=0),
+        ttl=-1,
+        stale_ttl=60,
+    )
+    calls = []
+
+    async def search():
+        calls.append(1)
+        return str(len(calls)).encode(), len(calls)
+
+    assert await cache.get_or_search("space", {}, search) == (b"1", 1)
+    assert await cache.get_or_search("space", {}, search) == (b"1", 1)
+    await asyncio.sleep(0.1)
+    assert len(calls) == 2
+    assert await cache.get_or_search("space", {}, search) == (b"2", 2)
+    assert cache.stats.stale_hits == 2
@@ -0,0 +1,19 @@
+import numpy as np
+from src.controllers.embedding_services import mean_pooling
+
+
+def test_mean_pooling_ignores_padding():
+    token_embeddings = np.array(
+        [[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32
+    )
+    attention_mask = np.array([[1, 1, 0]], dtype=np.int64)
+    pooled = mean_pooling(token_embeddings, attention_mask)
+    np.testing.assert_allclose(pooled, [[1.0, 0.0]], rtol=1e-6)
+
+
+def test_mean_pooling_is_unit_norm():
+    rng = np.random.default_rng(0)
+    token_embeddings = rng.normal(size=(3, 5, 384)).astype(np.float32)
+    attention_mask = np.ones((3, 5), dtype=np.int64)
+    pooled = mean_pooling(token_embeddings, attention_mask)
+    np.testing.assert_allclose(np.linalg.norm(pooled, axis=1), 1.0, rtol=1e-5)
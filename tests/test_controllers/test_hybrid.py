@@ -0,0 +1,28 @@
+from src.controllers.lexical_services import BM25Index, reciprocal_rank_fusion
+
+DOCS = [
+    {
+        "_id": "1",
+        "title": "Interstellar",
+        "plot": "Astronauts travel through a wormhole.",
+    },
+    {"_id": "2", "title": "Alien", "plot": "A crew meets a deadly creature in space."},
+    {"_id": "3", "title": "Arrival", "plot": "A linguist talks with alien visitors."},
+]
+
+
+def test_bm25_prefers_title_matches():
+    hits = BM25Index(DOCS).search("alien", limit=3)
+    assert [hit["_id"] for hit in hits] == ["2", "3"]
+    assert hits[0]["score"] > hits[1]["score"]
+
+
+def test_bm25_skips_documents_without_matches():
+    assert BM25Index(DOCS).search("romance", limit=3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    vector = [{"_id": "1"}, {"_id": "2"}, {"_id": "3"}]
+    lexical = [{"_id": "2"}, {"_id": "3"}]
+    fused = reciprocal_rank_fusion([vector, lexical], limit=2)
+    assert [hit["_id"] for hit in fused] == ["2", "3"]
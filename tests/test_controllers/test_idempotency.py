@@ -0,0 +1,193 @@
+import asyncio
+import time
+import pytest
+from starlette.responses import JSONResponse
+from src.controllers.idempotency_services import IdempotencyStore
+from src.middleware.idempotency import IdempotencyMiddleware
+
+COOKIE = ("cookie", "Authorization=Bearer token-1")
+
+
+class MemoryRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    async def get(self, name):
+        return self.data.get(name)
+
+    async def delete(self, name):
+        self.data.pop(name, None)
+
+
+class CountingApp:
+    """Slow endpoint answering with how many times it ran."""
+
+    def __init__(self, status_code=201, delay=0.0):
+        self.status_code = status_code
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        message = await receive()
+        await asyncio.sleep(self.delay)
+        response = JSONResponse(
+            {"calls": self.calls, "body": message["body"].decode()},
+            status_code=self.status_code,
+        )
+        await response(scope, receive, send)
+
+
+def make_middleware(app, wait_timeout=1.0):
+    store = IdempotencyStore(
+        MemoryRedis(),
+        ttl=60,
+        lock_ttl=10,
+        wait_timeout=wait_timeout,
+        poll_interval=0.01,
+    )
+    return IdempotencyMiddleware(app, store=store, max_body=1024)
+
+
+async def call(app, method="POST", body=b"{}", headers=(COOKIE,), request_id="r1"):
+    if request_id:
+        headers = (*headers, ("x-request-id", request_id))
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": "/movies/answer",
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "query_string": b"",
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, *body = messages
+    headers = dict((k.decode(), v.decode()) for k, v in start["headers"])
+    return start["status"], headers, b"".join(m.get("body", b"") for m in body)
+
+
+@pytest.mark.asyncio
+async def test_retries_replay_the_stored_response():
+    app = CountingApp()
+    middleware = make_middleware(app)
+
+    first = await call(middleware, body=b'{"q": 1}')
+    retry = await call(middleware, body=b'{"q": 1}')
+
+    assert app.calls == 1
+    assert retry[0] == first[0] == 201
+    assert retry[2] == first[2]
+    assert retry[1]["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first[1]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first_request():
+    app = CountingApp(delay=0.05)
+    middleware = make_middleware(app)
+
+    responses = await asyncio.gather(*(call(middleware) for _ in range(5)))
+
+    assert app.calls == 1
+    assert {body for _, _, body in responses} == {responses[0][2]}
+    assert sum("idempotent-replayed" in headers for _, headers, _ in responses) == 4
+
+
+@pytest.mark.asyncio
+async def test_request_id_reused_for_another_request_is_rejected():
+    app = CountingApp()
+    middleware = make_middleware(app)
+
+    await call(middleware, body=b'{"q": 1}')
+    status, _, _ = await call(middleware, body=b'{"q": 2}')
+
+    assert status == 422
+    assert app.calls == 1
+
+
+@pytest.mark.parametrize("status_code", [401, 403, 409, 429, 500, 503])
+@pytest.mark.asyncio
+async def test_transient_failures_are_not_stored(status_code):
+    app = CountingApp(status_code=status_code)
+    middleware = make_middleware(app)
+
+    await call(middleware)
+    status, headers, _ = await call(middleware)
+
+    assert app.calls == 2
+    assert status == status_code
+    assert "idempotent-replayed" not in headers
+    assert middleware.store._redis.data == {}
+
+
+@pytest.mark.parametrize("status_code", [400, 404, 422])
+@pytest.mark.asyncio
+async def test_final_client_errors_are_replayed(status_code):
+    app = CountingApp(status_code=status_code)
+    middleware = make_middleware(app)
+
+    await call(middleware)
+    status, headers, _ = await call(middleware)
+
+    assert app.calls == 1
+    assert status == status_code
+    assert headers["idempotent-replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_duplicates_wait_for_one_timeout_at_most():
+    app = CountingApp(delay=0.5)
+    middleware = make_middleware(app, wait_timeout=0.1)
+
+    first = asyncio.create_task(call(middleware))
+    await asyncio.sleep(0.01)
+    started = time.monotonic()
+    status, headers, _ = await call(middleware)
+
+    assert status == 409
+    assert headers["retry-after"] == "1"
+    assert time.monotonic() - started < 0.18
+    assert (await first)[0] == 201
+
+
+@pytest.mark.asyncio
+async def test_large_bodies_are_refused():
+    app = CountingApp()
+    middleware = make_middleware(app)
+
+    status, _, _ = await call(middleware, body=b"x" * 1025)
+
+    assert status == 413
+    assert app.calls == 0
+    assert middleware.store._redis.data == {}
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"method": "GET"}, {"headers": ()}, {"request_id": None}],
+)
+@pytest.mark.asyncio
+async def test_other_requests_pass_through(kwargs):
+    app = CountingApp()
+    middleware = make_middleware(app)
+
+    await call(middleware, **kwargs)
+    await call(middleware, **kwargs)
+
+    assert app.calls == 2
@@ -0,0 +1,191 @@
+import json
+import pytest
+from redis.exceptions import LockError
+from src.controllers import jobs_services, movies_services
+from src.controllers.jobs_services import IngestionJob
+from src.controllers.movies_services import (
+    count_pending_embeddings,
+    needs_embedding,
+    plot_hash,
+    stale_embeddings_filter,
+)
+
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+PLOT = "A group of astronauts travel through a wormhole."
+
+
+@pytest.mark.parametrize(
+    "doc, expected",
+    [
+        ({"plot": PLOT}, True),
+        (
+            {
+                "plot": PLOT,
+                "plot_embedding_hf": [0.1],
+                "plot_embedding_hash": plot_hash(PLOT),
+                "plot_embedding_model": MODEL_ID,
+            },
+            False,
+        ),
+        (
+            {
+                "plot": PLOT,
+                "plot_embedding_hf": [0.1],
+                "plot_embedding_hash": plot_hash("An older plot."),
+                "plot_embedding_model": MODEL_ID,
+            },
+            True,
+        ),
+        (
+            {
+                "plot": PLOT,
+                "plot_embedding_hf": [0.1],
+                "plot_embedding_hash": plot_hash(PLOT),
+                "plot_embedding_model": "another-model",
+            },
+            True,
+        ),
+    ],
+)
+def test_needs_embedding(doc, expected):
+    assert needs_embedding(doc, MODEL_ID) is expected
+
+
+def test_stale_embeddings_filter():
+    assert "$or" in stale_embeddings_filter(MODEL_ID, rehash=False)
+    assert stale_embeddings_filter(MODEL_ID, rehash=True) == {"plot": {"$exists": True}}
+
+
+class FakeLock:
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+        self.reacquired = 0
+
+    def acquire(self, blocking=True):
+        if self.name in self.redis.locks:
+            return False
+        self.redis.locks.add(self.name)
+        return True
+
+    def reacquire(self):
+        self.reacquired += 1
+
+    def release(self):
+        if self.name not in self.redis.locks:
+            raise LockError("not owned")
+        self.redis.locks.remove(self.name)
+
+
+class LockRedis:
+    def __init__(self):
+        self.locks = set()
+        self.data = {}
+        self.published = []
+        self.issued = []
+
+    def lock(self, name, timeout=None, blocking=True):
+        self.issued.append(FakeLock(self, name))
+        return self.issued[-1]
+
+    def set(self, name, value):
+        self.data[name] = value
+        self.published.append(json.loads(value))
+
+    def get(self, name):
+        return self.data.get(name)
+
+
+class FakeCollection:
+    def __init__(self, ids):
+        self.ids = ids
+        self.queries = []
+
+    def count_documents(self, query, limit=0):
+        self.queries.append(query)
+        after = query.get("_id", {}).get("$gt", -1)
+        matching = [i for i in self.ids if i > after]
+        return min(len(matching), limit) if limit else len(matching)
+
+
+class FakeCheckpoints:
+    def __init__(self, last_id=None):
+        self.last_id = last_id
+
+    def find_one(self, query):
+        if self.last_id is None:
+            return None
+        return {"_id": query["_id"], "last_id": self.last_id}
+
+
+class FakeBackend:
+    model_id = MODEL_ID
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    """Run :class:`IngestionJob` over fake batches of 10 out of 25 documents."""
+    batches = []
+
+    def persist(batch_size=None, limit=None, rehash=False, progress=None):
+        for scanned in (10, 20, 25):
+            batches.append(scanned)
+            progress(scanned, scanned // 2)
+        return ["id"]
+
+    monkeypatch.setattr(jobs_services, "persist_vectors_to_db", persist)
+    monkeypatch.setattr(jobs_services, "get_embedding_backend", FakeBackend)
+    monkeypatch.setattr(
+        jobs_services, "count_pending_embeddings", lambda *args, **kwargs: 25
+    )
+    return batches
+
+
+@pytest.mark.parametrize(
+    "last_id, limit, expected",
+    [(None, 0, 100), (None, 50, 50), (80, 50, 19), (80, 0, 19)],
+)
+def test_pending_embeddings_are_counted_from_the_checkpoint(
+    monkeypatch, last_id, limit, expected
+):
+    documents = FakeCollection(ids=list(range(100)))
+    monkeypatch.setattr(movies_services, "collection", documents)
+    monkeypatch.setattr(movies_services, "checkpoints", FakeCheckpoints(last_id))
+
+    assert count_pending_embeddings(MODEL_ID, limit=limit) == expected
+    assert "$or" in documents.queries[-1]
+
+
+def test_ingestion_job_publishes_progress_and_keeps_the_lock(ingestion):
+    redis = LockRedis()
+    job = IngestionJob(redis, lock_timeout=60)
+
+    assert job.run() == ["id"]
+
+    assert ingestion == [10, 20, 25]
+    assert redis.issued[0].reacquired == 3
+    assert redis.locks == set()
+    assert [p["remaining"] for p in redis.published] == [25, 15, 5, 0, 0]
+    assert job.progress()["status"] == "completed"
+    assert job.progress()["embedded"] == 12
+
+
+def test_only_one_worker_runs_the_ingestion_job(ingestion):
+    redis = LockRedis()
+    redis.locks.add("lock:ingestion")
+
+    assert IngestionJob(redis, lock_timeout=60).run() is None
+    assert ingestion == []
+    assert redis.published == []
+
+
+def test_stopped_ingestion_job_ends_after_the_current_batch(ingestion):
+    redis = LockRedis()
+    job = IngestionJob(redis, lock_timeout=60)
+    job.stop()
+
+    assert job.run() is None
+
+    assert ingestion == [10]
+    assert redis.locks == set()
+    assert job.progress()["status"] == "cancelled"
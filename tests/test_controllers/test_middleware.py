@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from starlette.responses import PlainTextResponse, StreamingResponse
+from src.core.exceptions import BackendError
+from src.middleware.csrf import CSRFMiddleware
+from src.middleware.limiters import RateLimitMiddleware
+
+CSRF_TOKEN = "0f3b6f6c-9a3e-4f44-9d3a-3a5e0f7c1d2b"
+
+
+async def streaming_app(scope, receive, send):
+    async def chunks():
+        for chunk in (b"one\n", b"two\n", b"three\n"):
+            yield chunk
+
+    await StreamingResponse(chunks(), media_type="application/x-ndjson")(
+        scope, receive, send
+    )
+
+
+class CountingLimiter:
+    def __init__(self, limit):
+        self.limit = limit
+        self.calls = 0
+
+    async def __call__(self, request, response, cost=1):
+        self.calls += 1
+        headers = {"RateLimit-Limit": str(self.limit)}
+        if self.calls > self.limit:
+            raise BackendError(
+                message="Request limit exceeded", code=429, headers=headers
+            )
+        return headers
+
+
+async def call(app, method="GET", headers=()):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": "/movies",
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "query_string": b"",
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # the client stays connected
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, *body = messages
+    return start, dict((k.decode(), v.decode()) for k, v in start["headers"]), body
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_middleware_adds_headers_and_rejects_over_limit():
+    app = RateLimitMiddleware(streaming_app, rate_limiter=CountingLimiter(limit=1))
+
+    start, headers, body = await call(app)
+    rejected, rejected_headers, rejected_body = await call(app)
+
+    assert start["status"] == 200 and headers["ratelimit-limit"] == "1"
+    # the stream passes through chunk by chunk
+    assert [message["body"] for message in body] == [
+        b"one\n",
+        b"two\n",
+        b"three\n",
+        b"",
+    ]
+    assert rejected["status"] == 429
+    assert rejected_headers["ratelimit-limit"] == "1"
+    assert rejected_body[0]["body"] == b'{"message":"Request limit exceeded"}'
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_middleware_sends_the_per_user_limit_headers():
+    async def user_limited_app(scope, receive, send):
+        scope.setdefault("state", {})["rate_limit_headers"] = {"RateLimit-Limit": "5"}
+        await streaming_app(scope, receive, send)
+
+    app = RateLimitMiddleware(user_limited_app, rate_limiter=CountingLimiter(limit=1))
+
+    _, headers, _ = await call(app)
+
+    assert headers["ratelimit-limit"] == "5"
+
+
+@pytest.mark.asyncio
+async def test_csrf_middleware_sets_the_cookie_on_safe_requests():
+    app = CSRFMiddleware(streaming_app)
+
+    start, headers, body = await call(app)
+    _, kept_headers, _ = await call(
+        app, headers=[("cookie", f"csrftoken={CSRF_TOKEN}")]
+    )
+
+    assert start["status"] == 200 and len(body) == 4
+    assert headers["set-cookie"].startswith("csrftoken=")
+    assert "Max-Age=5000" in headers["set-cookie"]
+    assert "set-cookie" not in kept_headers
+
+
+@pytest.mark.parametrize(
+    "headers, message",
+    [
+        ([], b"No CSRF cookie set!"),
+        (
+            [("cookie", "csrftoken=short"), ("csrftoken", "short")],
+            b"No CSRF cookie set!",
+        ),
+        (
+            [("cookie", f"csrftoken={CSRF_TOKEN}"), ("csrftoken", CSRF_TOKEN[::-1])],
+            b"CSRF cookie does not match!",
+        ),
+        ([("cookie", f"csrftoken={CSRF_TOKEN}")], b"CSRF cookie does not match!"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_csrf_middleware_rejects_unsafe_requests(headers, message):
+    start, _, body = await call(
+        CSRFMiddleware(PlainTextResponse("ok")), method="POST", headers=headers
+    )
+    assert start["status"] == 403
+    assert body[0]["body"] == message
+
+
+@pytest.mark.asyncio
+async def test_csrf_middleware_accepts_the_token_header():
+    start, _, body = await call(
+        CSRFMiddleware(PlainTextResponse("ok")),
+        method="POST",
+        headers=[("cookie", f"csrftoken={CSRF_TOKEN}"), ("csrftoken", CSRF_TOKEN)],
+    )
+    assert start["status"] == 200 and body[0]["body"] == b"ok"
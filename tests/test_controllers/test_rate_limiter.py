@@ -0,0 +1,267 @@
+import fakeredis
+import pytest
+from redis.exceptions import NoScriptError
+from starlette.requests import Request
+from starlette.responses import Response
+from src.controllers.misc_services import (
+    HybridSlidingWindowRateLimiter,
+    LuaSlidingWindowRateLimiter,
+    Rate,
+)
+from src.controllers.ratelimit_services import (
+    GCRARateLimiter,
+    HybridPolicyRateLimiter,
+    RateLimitPolicy,
+    RateLimitRegistry,
+    TokenBucketRateLimiter,
+    build_policy_limiter,
+    rate_limit_registry,
+    user_identity,
+)
+from src.core.config import settings
+from src.core.enums import (
+    RateLimitAlgorithm,
+    RateLimitMode,
+    RateLimitScope,
+    RatePeriod,
+)
+from src.core.exceptions import BackendError
+
+
+class ScriptRedis:
+    """Replays canned script results and records SCRIPT LOAD / EVALSHA calls."""
+
+    def __init__(self, results, lose_script=False):
+        self.results = list(results)
+        self.lose_script = lose_script
+        self.loads = 0
+        self.calls = []
+
+    async def script_load(self, script):
+        self.loads += 1
+        return f"sha{self.loads}"
+
+    async def evalsha(self, sha, numkeys, *keys_and_args):
+        if self.lose_script:
+            self.lose_script = False
+            raise NoScriptError("NOSCRIPT")
+        self.calls.append((sha, keys_and_args[:numkeys], keys_and_args[numkeys:]))
+        return self.results.pop(0)
+
+
+class WindowRedis(ScriptRedis):
+    """Applies the script's count rule for a single window, without decay."""
+
+    def __init__(self):
+        super().__init__([])
+        self.counts = {}
+
+    async def evalsha(self, sha, numkeys, key, previous, limit, cost, weight, ttl):
+        self.calls.append(cost)
+        count = self.counts.get(key, 0)
+        if count + cost - 1 >= limit:
+            return [0, count, str(count), ttl]
+        self.counts[key] = count + cost
+        return [1, count + cost, str(count), ttl]
+
+
+def make_request(path="/movies", headers=(), user=None):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "headers": list(headers),
+            "query_string": b"",
+            "client": ("127.0.0.1", 5000),
+            "server": ("testserver", 80),
+            "scheme": "http",
+            "state": {"user": user} if user else {},
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_lua_limiter_loads_the_script_once_and_reloads_when_lost():
+    redis = ScriptRedis([[1, 3, "2.5", 120], [1, 4, "3.5", 120]], lose_script=True)
+    limiter = LuaSlidingWindowRateLimiter(
+        rate=Rate(number=10, period=RatePeriod.MINUTE), redis=redis
+    )
+    headers = await limiter(request=make_request(), response=Response())
+    await limiter(request=make_request(), response=Response(), cost=2)
+
+    assert redis.loads == 2
+    assert [call[0] for call in redis.calls] == ["sha2", "sha2"]
+    current, previous = redis.calls[0][1]
+    assert current.startswith("limiter:/movies:127.0.0.1:")
+    assert previous != current
+    assert redis.calls[1][2][:2] == (10, 2)
+    assert headers["RateLimit-Remaining"].startswith("7;")
+
+
+@pytest.mark.parametrize("decision", [0, -1])
+@pytest.mark.asyncio
+async def test_lua_limiter_rejects_over_quota(decision):
+    redis = ScriptRedis([[decision, 10, "10.0", 30]])
+    limiter = LuaSlidingWindowRateLimiter(
+        rate=Rate(number=10, period=RatePeriod.MINUTE), redis=redis
+    )
+    with pytest.raises(BackendError) as err:
+        await limiter(request=make_request(), response=Response())
+    assert err.value.code == 429
+    assert err.value.headers["RateLimit-Limit"] == "10"
+
+
+@pytest.mark.asyncio
+async def test_hybrid_limiter_leases_blocks_then_turns_strict_near_the_limit():
+    redis = WindowRedis()
+    limiter = HybridSlidingWindowRateLimiter(
+        rate=Rate(number=25, period=RatePeriod.HOUR), redis=redis, lease_size=10
+    )
+    admitted = []
+    for _ in range(30):
+        try:
+            headers = await limiter(request=make_request(), response=Response())
+            admitted.append(headers["RateLimit-Remaining"].split(";")[0])
+        except BackendError:
+            pass
+
+    assert len(admitted) == 25
+    assert admitted[:3] == ["25", "24", "23"] and admitted[-1] == "1"
+    # two leases of 10, then one call per request
+    assert redis.calls == [10, 10] + [1] * 10
+    assert limiter.stats() == {"local_hits": 18, "redis_calls": 12}
+
+
+@pytest.mark.asyncio
+async def test_registry_counts_ips_first_then_verified_users():
+    redis = ScriptRedis([[1, 4, 0, 2_500_000], [0, 0, 1_200_000, 6_000_000]])
+    default = LuaSlidingWindowRateLimiter(
+        rate=Rate(number=60, period=RatePeriod.MINUTE),
+        redis=ScriptRedis([[1, 1, "0.0", 120]]),
+    )
+    registry = RateLimitRegistry(default=default)
+    registry.register(
+        "/login",
+        RateLimitPolicy("login", Rate(number=10, period=RatePeriod.MINUTE), burst=5),
+    )
+    registry.register(
+        "/logout",
+        RateLimitPolicy(
+            "logout",
+            Rate(number=120, period=RatePeriod.MINUTE),
+            burst=5,
+            algorithm=RateLimitAlgorithm.TOKEN_BUCKET,
+            scope=RateLimitScope.USER,
+        ),
+    )
+    assert isinstance(registry.limiter_for("/login"), GCRARateLimiter)
+    assert registry.user_limiter_for("/login") is None
+    # routes limited per user keep the default limiter as a floor per IP
+    assert registry.limiter_for("/logout") is default
+    limiter = registry.user_limiter_for("/logout")
+    limiter._redis = redis
+    assert isinstance(limiter, TokenBucketRateLimiter)
+
+    forged = make_request("/logout", [(b"cookie", b"Authorization=Bearer abc")])
+    await registry(request=forged, response=Response())
+    assert user_identity(forged) == "ip:127.0.0.1"
+
+    verified = make_request("/logout", user="user@example.com")
+    headers = await registry.charge_user(request=verified, response=Response())
+    with pytest.raises(BackendError) as err:
+        await registry.charge_user(request=verified, response=Response())
+
+    (user_key,), args = redis.calls[0][1:]
+    assert user_key == "limiter:/logout:logout:user:user@example.com"
+    # 500 ms between requests, a burst of 5, cost 1
+    assert args == (500_000, 5, 1)
+    assert headers["RateLimit-Remaining"] == "4"
+    assert headers["RateLimit-Reset"] == "3"
+    assert verified.state.rate_limit_headers == headers
+    assert err.value.code == 429
+    assert err.value.headers["Retry-After"] == "2"
+    login = make_request("/login", user="user@example.com")
+    assert await registry.charge_user(request=login, response=Response()) == {}
+
+
+@pytest.mark.parametrize("limiter_class", [GCRARateLimiter, TokenBucketRateLimiter])
+@pytest.mark.asyncio
+async def test_policy_scripts_admit_the_burst_then_ask_to_retry(limiter_class):
+    policy = RateLimitPolicy("search", Rate(number=60, period=RatePeriod.MINUTE), 5)
+    limiter = limiter_class(policy, redis=fakeredis.FakeAsyncRedis())
+    remaining = []
+    rejected = []
+    for _ in range(8):
+        try:
+            headers = await limiter(request=make_request(), response=Response())
+            remaining.append(headers["RateLimit-Remaining"])
+        except BackendError as err:
+            rejected.append(err)
+
+    assert remaining == ["4", "3", "2", "1", "0"]
+    assert len(rejected) == 3
+    assert {err.code for err in rejected} == {429}
+    # one request per second: the next one is allowed within a second
+    assert {err.headers["Retry-After"] for err in rejected} == {"1"}
+    assert rejected[0].headers["RateLimit-Reset"] == "5"
+
+
+@pytest.mark.parametrize("limiter_class", [GCRARateLimiter, TokenBucketRateLimiter])
+@pytest.mark.asyncio
+async def test_policy_scripts_charge_the_cost_and_refuse_more_than_the_burst(
+    limiter_class,
+):
+    policy = RateLimitPolicy("batch", Rate(number=60, period=RatePeriod.MINUTE), 10)
+    limiter = limiter_class(policy, redis=fakeredis.FakeAsyncRedis())
+
+    headers = await limiter(request=make_request(), response=Response(), cost=10)
+    assert headers["RateLimit-Remaining"] == "0"
+    with pytest.raises(BackendError) as err:
+        await limiter(request=make_request(), response=Response(), cost=2)
+    assert err.value.code == 429
+    assert err.value.headers["Retry-After"] == "2"
+
+    with pytest.raises(BackendError) as err:
+        await limiter(request=make_request(), response=Response(), cost=11)
+    assert err.value.code == 400
+    assert "Retry-After" not in err.value.headers
+
+
+@pytest.mark.parametrize("limiter_class", [GCRARateLimiter, TokenBucketRateLimiter])
+@pytest.mark.asyncio
+async def test_hybrid_policy_limiter_leases_blocks_then_turns_strict(limiter_class):
+    policy = RateLimitPolicy("search", Rate(number=60, period=RatePeriod.MINUTE), 25)
+    limiter = HybridPolicyRateLimiter(
+        limiter_class(policy, redis=fakeredis.FakeAsyncRedis()), lease_size=10
+    )
+    admitted = []
+    for _ in range(30):
+        try:
+            headers = await limiter(request=make_request(), response=Response())
+            admitted.append(headers["RateLimit-Remaining"])
+        except BackendError as err:
+            assert err.code == 429
+
+    assert len(admitted) == 25
+    assert admitted[:3] == ["24", "23", "22"] and admitted[-1] == "0"
+    # two leases of 10, then one call per request
+    assert limiter.stats() == {"local_hits": 18, "redis_calls": 12}
+
+
+def test_policy_limiters_follow_the_rate_limit_mode(monkeypatch):
+    policy = RateLimitPolicy("search", Rate(number=60, period=RatePeriod.MINUTE), 20)
+    assert isinstance(build_policy_limiter(policy), GCRARateLimiter)
+    monkeypatch.setattr(settings, "RATE_LIMIT_MODE", RateLimitMode.HYBRID)
+    assert isinstance(build_policy_limiter(policy), HybridPolicyRateLimiter)
+
+
+@pytest.mark.asyncio
+async def test_largest_batch_fits_the_batch_quota(monkeypatch):
+    limiter = rate_limit_registry.user_limiter_for("/movies/batch")
+    monkeypatch.setattr(limiter, "_redis", fakeredis.FakeAsyncRedis())
+    request = make_request("/movies/batch", user="user@example.com")
+
+    await rate_limit_registry.charge_user(
+        request=request, response=Response(), cost=settings.BATCH_SEARCH_MAX_QUERIES
+    )
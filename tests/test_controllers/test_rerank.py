@@ -0,0 +1,39 @@
+import time
+import numpy as np
+import pytest
+from src.controllers.rerank_services import BaseReranker, CosineReranker, rerank_hits
+
+HITS = [
+    {"_id": "1", "score": 0.9},
+    {"_id": "2", "score": 0.8},
+    {"_id": "3", "score": 0.7},
+]
+VECTORS = np.array([[0.0, 1.0], [1.0, 0.0], [0.6, 0.8]], dtype=np.float32)
+
+
+async def load_vectors(hits):
+    return np.array([1.0, 0.0], dtype=np.float32), VECTORS
+
+
+class SlowReranker(BaseReranker):
+    def score(self, query, hits, query_vector=None, vectors=None):
+        time.sleep(0.2)
+        return np.arange(len(hits), dtype=np.float32)
+
+
+@pytest.mark.asyncio
+async def test_cosine_rerank_reorders_by_full_precision_similarity():
+    hits, report = await rerank_hits(
+        CosineReranker(), "space", HITS, budget_ms=1000, load_vectors=load_vectors
+    )
+    assert [hit["_id"] for hit in hits] == ["2", "3", "1"]
+    assert hits[0]["score"] == pytest.approx(1.0)
+    assert report["rerank_status"] == "applied"
+
+
+@pytest.mark.asyncio
+async def test_rerank_keeps_first_stage_order_past_the_budget():
+    hits, report = await rerank_hits(SlowReranker(), "space", HITS, budget_ms=10)
+    assert hits == HITS
+    assert report["rerank_status"] == "timeout"
+    assert report["rerank_ms"] < 200
@@ -0,0 +1,106 @@
+import orjson
+import pytest
+from src.controllers.movies_services import (
+    decode_cursor,
+    encode_cursor,
+    text_search_pipeline,
+    vector_search_pipeline,
+)
+from src.core.enums import SearchMode
+from src.core.exceptions import BackendError
+from src.schemas.models import GetMovies, SearchFilters
+from src.views import movies
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor("characters from Multiverse", 8)
+    assert decode_cursor("Characters  from multiverse", cursor) == 8
+    assert decode_cursor("characters from Multiverse", None) == 0
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not-a-cursor",
+        encode_cursor("another query", 4),
+        encode_cursor("characters from Multiverse", -4),
+        encode_cursor("characters from Multiverse", 100),
+        encode_cursor("characters from Multiverse", 10**6),
+    ],
+)
+def test_invalid_cursor(cursor):
+    with pytest.raises(BackendError):
+        decode_cursor("characters from Multiverse", cursor, num_candidates=100)
+
+
+def movies_page(k, num_candidates, cursor=None):
+    return GetMovies(
+        query="characters from Multiverse",
+        k=k,
+        num_candidates=num_candidates,
+        cursor=cursor,
+        stream=False,
+        mode=SearchMode.VECTOR,
+        rerank=False,
+        search_filters=SearchFilters(
+            year_from=None, year_to=None, genres=None, min_rating=None, languages=None
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_next_cursor_only_follows_full_pages(monkeypatch):
+    found = 10
+    limits = []
+
+    async def search_movies(query, limit, offset, **kwargs):
+        limits.append(limit)
+        hits = [{"rank": i} for i in range(offset, found)][:limit]
+        return orjson.dumps(hits), len(hits)
+
+    monkeypatch.setattr(movies, "search_movies", search_movies)
+    token = ["token", {"email": "user@example.com"}]
+    pages, cursor = [], None
+    while True:
+        response = await movies.get_movies(movies_page(4, 11, cursor), token)
+        pages.append(len(orjson.loads(response.body)))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert pages == [4, 4, 2]
+
+    # the last page stops at numCandidates
+    found = 100
+    limits.clear()
+    cursor = encode_cursor("characters from Multiverse", 8)
+    response = await movies.get_movies(movies_page(4, 11, cursor), token)
+    assert limits == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_pipeline_pages_with_skip():
+    pipeline = vector_search_pipeline([0.1], limit=4, num_candidates=6, offset=4)
+    assert pipeline[0]["$vectorSearch"]["limit"] == 8
+    assert pipeline[0]["$vectorSearch"]["numCandidates"] == 8
+    assert pipeline[1] == {"$skip": 4}
+
+
+def test_pipeline_pushes_filters_into_vector_search():
+    filters = {"year_to": 1999, "min_rating": 7.5, "languages": ["French"]}
+    stage = vector_search_pipeline([0.1], limit=4, filters=filters)[0]["$vectorSearch"]
+    assert stage["filter"] == {
+        "$and": [
+            {"year": {"$lte": 1999}},
+            {"imdb.rating": {"$gte": 7.5}},
+            {"languages": {"$in": ["French"]}},
+        ]
+    }
+    assert "filter" not in vector_search_pipeline([0.1])[0]["$vectorSearch"]
+
+
+def test_text_search_filters_require_a_text_match():
+    compound = text_search_pipeline("alien", 4, {"genres": ["Horror"]})[0]["$search"][
+        "compound"
+    ]
+    assert compound["filter"] == [{"in": {"path": "genres", "value": ["Horror"]}}]
+    assert compound["minimumShouldMatch"] == 1
@@ -0,0 +1,122 @@
+import asyncio
+import pickle
+import pytest
+from starlette.requests import Request
+from src.controllers.session_services import (
+    SessionStore,
+    decode_session,
+    encode_session,
+)
+from src.middleware import islogin
+from src.middleware.islogin import oauth2_scheme
+
+
+class SlowRedis:
+    """Async Redis answering after a delay, like one under load."""
+
+    def __init__(self, data, delay):
+        self.data = data
+        self.delay = delay
+        self.gets = 0
+
+    async def get(self, name):
+        self.gets += 1
+        await asyncio.sleep(self.delay)
+        return self.data.get(name)
+
+
+class PubSubRedis(SlowRedis):
+    """Key-value store with a single-process publish/subscribe."""
+
+    def __init__(self, data):
+        super().__init__(data, 0)
+        self.subscribers = []
+
+    async def delete(self, name):
+        self.data.pop(name, None)
+
+    async def publish(self, channel, message):
+        for queue in self.subscribers:
+            queue.put_nowait(
+                {"type": "message", "channel": channel, "data": message.encode()}
+            )
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        redis = self
+
+        class PubSub:
+            async def subscribe(self, channel):
+                self.queue = asyncio.Queue()
+                redis.subscribers.append(self.queue)
+
+            async def listen(self):
+                while True:
+                    yield await self.queue.get()
+
+            async def aclose(self):
+                redis.subscribers.remove(self.queue)
+
+        return PubSub()
+
+
+def make_request(token):
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/movies",
+            "headers": [(b"cookie", f"Authorization=Bearer {token}".encode())],
+            "query_string": b"",
+        }
+    )
+
+
+def make_store(redis):
+    return SessionStore(redis=redis, ttl=60, local_size=10, local_ttl=30)
+
+
+@pytest.mark.asyncio
+async def test_slow_session_lookup_does_not_block_other_requests(monkeypatch):
+    redis = SlowRedis(
+        {"session:token": encode_session({"email": "user@example.com"})}, 0.2
+    )
+    monkeypatch.setattr(islogin, "session_store", make_store(redis))
+
+    request = make_request("token")
+    lookup = asyncio.create_task(oauth2_scheme(request))
+    started = asyncio.get_running_loop().time()
+    await asyncio.sleep(0.01)
+    # the event loop kept serving while the lookup waited on Redis
+    assert asyncio.get_running_loop().time() - started < 0.1
+    assert not lookup.done()
+    assert await lookup == ["token", {"email": "user@example.com"}]
+    # the per-user rate limits count the verified user
+    assert request.state.user == "user@example.com"
+
+
+def test_pickled_sessions_are_rejected():
+    with pytest.raises(ValueError):
+        decode_session(pickle.dumps({"email": "user@example.com"}))
+    assert decode_session(encode_session({"email": "a"})) == {"email": "a"}
+
+
+@pytest.mark.asyncio
+async def test_hot_sessions_are_served_locally_until_revoked():
+    redis = PubSubRedis({"session:token": encode_session({"email": "a"})})
+    store, other = make_store(redis), make_store(redis)
+    listeners = [asyncio.create_task(s.listen()) for s in (store, other)]
+    await asyncio.sleep(0)
+
+    for _ in range(3):
+        assert await store.get("token") == {"email": "a"}
+    assert await other.get("token") == {"email": "a"}
+    assert redis.gets == 2
+    assert store.stats()["local_hits"] == 2
+
+    await store.revoke("token")
+    await asyncio.sleep(0)
+    # the other worker dropped its copy and sees the deletion
+    assert await other.get("token") is None
+    for listener in listeners:
+        listener.cancel()
+    await asyncio.gather(*listeners, return_exceptions=True)
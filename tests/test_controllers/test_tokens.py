@@ -0,0 +1,178 @@
+import asyncio
+import json
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from pydantic import ValidationError
+from src.core.config import Settings
+from src.core.enums import AuthMode
+from src.controllers.token_services import JWKSCache, TokenDenylist, TokenVerifier
+
+ISSUER = "https://tenant.example.com/"
+AUDIENCE = "https://movies.example.com/api"
+
+
+class LocalJWKS:
+    """Stand-in identity provider: signs tokens and serves its JWKS."""
+
+    def __init__(self):
+        self.keys = {}
+        self.loads = 0
+        self.rotate("key-1")
+
+    def rotate(self, kid):
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.current = kid
+
+    async def load(self):
+        self.loads += 1
+        keys = []
+        for kid, private_key in self.keys.items():
+            public_key = private_key.public_key()
+            jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(public_key))
+            keys.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    def token(self, expires_in=3600, **claims):
+        now = int(time.time())
+        payload = {
+            "iss": ISSUER,
+            "aud": AUDIENCE,
+            "sub": "auth0|user",
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        return jwt.encode(
+            payload | claims,
+            self.keys[self.current],
+            algorithm="RS256",
+            headers={"kid": self.current},
+        )
+
+
+class DenylistRedis:
+    def __init__(self):
+        self.data = {}
+        self.published = []
+        self.reads = 0
+
+    async def get(self, name):
+        self.reads += 1
+        return self.data.get(name)
+
+    async def set(self, name, value, ex=None):
+        self.data[name] = value
+
+    async def publish(self, channel, message):
+        self.published.append(message)
+
+
+@pytest.fixture
+def provider():
+    return LocalJWKS()
+
+
+def make_verifier(provider, cooldown=30.0, leeway=0):
+    jwks = JWKSCache(provider.load, refresh_interval=3600, cooldown=cooldown)
+    denylist = TokenDenylist(redis=DenylistRedis(), leeway=leeway)
+    return TokenVerifier(
+        jwks, denylist, audience=AUDIENCE, issuer=ISSUER, leeway=leeway
+    )
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_verified_against_the_cached_jwks(provider):
+    verifier = make_verifier(provider)
+    for _ in range(3):
+        claims = await verifier.verify(provider.token(email="user@example.com"))
+        assert claims["email"] == "user@example.com"
+    assert provider.loads == 1
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [{"expires_in": -120}, {"aud": "https://other.example.com"}, {"iss": "x"}],
+)
+@pytest.mark.asyncio
+async def test_expired_or_foreign_tokens_are_rejected(provider, claims):
+    with pytest.raises(jwt.InvalidTokenError):
+        await make_verifier(provider).verify(provider.token(**claims))
+
+
+@pytest.mark.asyncio
+async def test_rotated_keys_are_fetched_once_per_cooldown(provider):
+    verifier = make_verifier(provider, cooldown=0.05)
+    await verifier.verify(provider.token())
+    provider.rotate("key-2")
+    await asyncio.sleep(0.05)
+
+    # unknown key id: one early refresh picks up the new key
+    await verifier.verify(provider.token())
+    assert provider.loads == 2
+
+    forged = jwt.encode(
+        {"sub": "x"},
+        provider.keys["key-2"],
+        algorithm="RS256",
+        headers={"kid": "made-up"},
+    )
+    for _ in range(3):
+        with pytest.raises(jwt.InvalidTokenError):
+            await verifier.verify(forged)
+    assert provider.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_revoked_tokens_are_denied_until_they_expire(provider):
+    verifier = make_verifier(provider)
+    token = provider.token()
+    claims = await verifier.verify(token)
+
+    await verifier._denylist.revoke(token, claims["exp"])
+
+    with pytest.raises(jwt.InvalidTokenError, match="revoked"):
+        await verifier.verify(token)
+    assert await verifier.verify(provider.token(sub="other"))
+    assert verifier._denylist._redis.published
+
+
+@pytest.mark.asyncio
+async def test_revoked_tokens_stay_denied_within_the_leeway(provider):
+    verifier = make_verifier(provider, leeway=30)
+    token = provider.token(expires_in=-10)
+    claims = await verifier.verify(token)
+
+    await verifier._denylist.revoke(token, claims["exp"])
+
+    with pytest.raises(jwt.InvalidTokenError, match="revoked"):
+        await verifier.verify(token)
+    assert verifier._denylist._redis.data
+
+
+@pytest.mark.asyncio
+async def test_denylist_reads_redis_until_the_listener_is_subscribed(provider):
+    verifier = make_verifier(provider)
+    denylist = verifier._denylist
+    token = provider.token()
+    claims = await verifier.verify(token)
+
+    # revoked by another worker while this one's listener is disconnected
+    other_worker = TokenDenylist(redis=denylist._redis)
+    await other_worker.revoke(token, claims["exp"])
+    with pytest.raises(jwt.InvalidTokenError, match="revoked"):
+        await verifier.verify(token)
+    assert denylist._redis.reads == 2
+
+    denylist.listening = True
+    await verifier.verify(provider.token(sub="other"))
+    assert denylist._redis.reads == 2
+
+
+def test_jwt_mode_requires_an_audience(monkeypatch):
+    monkeypatch.setenv("AUTH_MODE", AuthMode.JWT.value)
+    monkeypatch.setenv("AUTH0_AUDIENCE", "")
+    with pytest.raises(ValidationError, match="AUTH0_AUDIENCE"):
+        Settings()
+    monkeypatch.setenv("AUTH0_AUDIENCE", AUDIENCE)
+    assert Settings().AUTH0_AUDIENCE == AUDIENCE
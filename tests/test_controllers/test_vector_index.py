@@ -0,0 +1,173 @@
+import os
+import numpy as np
+import pytest
+from bson import ObjectId
+from src.controllers.index_services import (
+    LocalIndexLoader,
+    LocalVectorIndex,
+    quantization_report,
+    quantize_int8,
+    top_k,
+    write_snapshot,
+)
+from src.core.enums import LocalIndexMode, Quantization
+from src.core.exceptions import BackendError
+
+DIM = 32
+GENRES = ["Drama", "Comedy", "Horror", "Drama"]
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(8, DIM))
+    vectors = centers[rng.integers(0, 8, size=500)] + 0.3 * rng.normal(size=(500, DIM))
+    docs = [
+        {
+            "_id": ObjectId(),
+            "title": f"Movie {i}",
+            "plot": f"Plot {i}",
+            "plot_embedding_hf": vector.tolist(),
+            "year": 1950 + i % 70,
+            "genres": GENRES[i % 3 : i % 3 + 2],
+        }
+        for i, vector in enumerate(vectors)
+    ]
+    path = str(tmp_path_factory.mktemp("index") / "snapshot")
+    write_snapshot(path, docs, model_id="test-model", nlist=8)
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return LocalVectorIndex(path), vectors, rng.normal(size=(20, DIM))
+
+
+def test_snapshots_are_swapped_behind_a_symlink(tmp_path):
+    path = tmp_path / "snapshot"
+    path.mkdir()
+    (path / "meta.json").write_text("{}")
+    doc = {"_id": ObjectId(), "title": "Movie", "plot": "Plot"}
+    for count in (1, 2):
+        docs = [doc | {"plot_embedding_hf": [1.0, 0.0]}] * count
+        assert write_snapshot(str(path), docs, model_id="test-model") == count
+        assert path.is_symlink()
+        assert len(LocalVectorIndex(str(path))) == count
+    # the snapshots replaced are deleted, the live one is all that is left
+    assert [p.name for p in tmp_path.iterdir() if p != path] == [path.resolve().name]
+
+
+def test_loader_follows_rebuilt_snapshots(tmp_path):
+    path = str(tmp_path / "snapshot")
+    loader = LocalIndexLoader(path, model_id=lambda: "test-model")
+    with pytest.raises(BackendError) as error:
+        loader.get()
+    assert error.value.code == 503
+
+    doc = {"_id": ObjectId(), "title": "Movie", "plot": "Plot"}
+    for count in (1, 2):
+        docs = [doc | {"plot_embedding_hf": [1.0, 0.0]}] * count
+        write_snapshot(path, docs, model_id="test-model")
+        assert len(loader.get()) == count
+    assert loader.get() is loader.get()
+
+    write_snapshot(path, docs, model_id="other-model")
+    with pytest.raises(BackendError) as error:
+        loader.get()
+    assert error.value.code == 503
+    assert "other-model" in error.value.message
+
+
+def test_top_k_orders_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k(scores, 2).tolist() == [1, 3]
+    assert top_k(scores, 10).tolist() == [1, 3, 2, 0]
+
+
+def test_exact_search_matches_brute_force(corpus):
+    index, vectors, queries = corpus
+    assert len(index) == 500
+    for query in queries:
+        expected = np.argsort(-(vectors @ query))[:4]
+        hits = index.search(query.tolist(), limit=4)
+        assert [hit["title"] for hit in hits] == [f"Movie {i}" for i in expected]
+        assert set(hits[0]) == {"_id", "title", "plot", "score"}
+        assert hits[0]["score"] >= hits[-1]["score"]
+
+
+def test_ivf_search_probing_every_list_is_exact(corpus):
+    index, _, queries = corpus
+    for query in queries:
+        exact = index.search(query.tolist(), limit=4)
+        ivf = index.search(query.tolist(), limit=4, mode=LocalIndexMode.IVF, nprobe=8)
+        assert [hit["_id"] for hit in ivf] == [hit["_id"] for hit in exact]
+
+
+def test_int8_quantization_roundtrip():
+    vectors = np.random.default_rng(0).normal(size=(50, DIM)).astype(np.float32)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(codes * scales, vectors, atol=scales.max())
+
+
+@pytest.mark.parametrize(
+    "quantization, rescore_factor, min_recall",
+    [(Quantization.INT8, 4, 1.0), (Quantization.BINARY, 10, 0.85)],
+)
+def test_quantized_search_with_rescoring(
+    corpus, quantization, rescore_factor, min_recall
+):
+    index, vectors, queries = corpus
+    # only a tenth of the rows is rescored, so the coarse scores must rank well
+    assert 4 * rescore_factor <= len(index) // 10
+    recalls = []
+    # queries close to some movies, as real ones are
+    for query in vectors[:20] + 0.05 * queries:
+        exact = index.search(query.tolist(), limit=4)
+        found = index.search(
+            query.tolist(),
+            limit=4,
+            quantization=quantization,
+            rescore_factor=rescore_factor,
+        )
+        recalls.append(len({h["_id"] for h in found} & {h["_id"] for h in exact}) / 4)
+    assert np.mean(recalls) >= min_recall
+
+
+def test_quantization_report(corpus):
+    index, _, _ = corpus
+    report = {row["quantization"]: row for row in quantization_report(index, k=4)}
+    assert report["none"]["recall@4"] == 1.0
+    assert report["int8"]["coarse_bytes"] * 4 == report["none"]["coarse_bytes"]
+    assert report["binary"]["bytes_per_vector"] == DIM // 8
+
+
+@pytest.mark.parametrize("mode", [LocalIndexMode.EXACT, LocalIndexMode.IVF])
+def test_filtered_search_only_scores_eligible_rows(corpus, mode):
+    index, vectors, queries = corpus
+    filters = {"year_from": 2000, "genres": ["Horror"]}
+    eligible = np.array(
+        [1950 + i % 70 >= 2000 and i % 3 >= 1 for i in range(len(vectors))]
+    )
+    for query in queries:
+        scores = np.where(eligible, vectors @ query, -np.inf)
+        expected = [f"Movie {i}" for i in np.argsort(-scores)[:4]]
+        hits = index.search(
+            query.tolist(), limit=4, mode=mode, nprobe=8, filters=filters
+        )
+        assert [hit["title"] for hit in hits] == expected
+
+
+def test_filter_mask_without_matches(corpus):
+    index, _, queries = corpus
+    hits = index.search(queries[0].tolist(), limit=4, filters={"genres": ["Western"]})
+    assert hits == []
+
+
+def test_filters_need_a_snapshot_with_attributes(tmp_path):
+    path = str(tmp_path / "snapshot")
+    doc = {"_id": ObjectId(), "title": "Movie", "plot": "Plot"}
+    write_snapshot(path, [doc | {"plot_embedding_hf": [1.0, 0.0]}], model_id="m")
+    os.remove(os.path.join(path, "attributes.json"))
+
+    index = LocalVectorIndex(path)
+    assert index.search([1.0, 0.0], limit=1)
+    with pytest.raises(BackendError) as error:
+        index.search([1.0, 0.0], limit=1, filters={"genres": ["Drama"]})
+    assert error.value.code == 503